@@ -1,18 +1,37 @@
 # app.py
 
-from flask import Flask
+from flask import Flask, Response, jsonify
 from routes.stock import stock_bp
 from routes.crypto import crypto_bp
-from routes.news import news_bp
+from routes.news import news_bp, news_index
 from routes.indicators import indicators_bp
-from dotenv import load_dotenv
-from routes.search import search_bp
+from routes.search import search_bp, search_index
+from routes.alerts import alerts_bp
+from routes.stream import stream_bp
+from routes.screener import screener_bp
 from flask_cors import CORS
+from utils.cache import cache
+from utils import http_cache
+from utils import http_client
+from utils import metrics
+from services.alerts import alert_engine
+from routes.crypto import coin_index
+from services.snapshots import snapshots
+from services.metadata import metadata_store
+from services.news_store import news_store
+from config import ALERTS_ENABLED, BACKGROUND_JOBS, LEADER_LOCK_FILE, NEWS_INGEST_ENABLED, SNAPSHOTS_ENABLED
+from utils.leader import LeaderLock
 import os
 app = Flask(__name__)
+leader = LeaderLock(LEADER_LOCK_FILE, BACKGROUND_JOBS)
 
-CORS(app)
-load_dotenv()
+# Gli header di paginazione delle notizie devono essere leggibili dal frontend
+CORS(app, expose_headers=['X-Total-Count', 'X-Page', 'X-Page-Size'])
+# Latenza per route e tempo di serializzazione; registrato prima di http_cache
+# così la latenza misurata include anche ETag e compressione
+metrics.init_app(app)
+# ETag, Cache-Control, 304 e compressione gzip/brotli delle risposte
+http_cache.init_app(app)
 
 # Routes
 app.register_blueprint(stock_bp)
@@ -20,11 +39,66 @@ app.register_blueprint(crypto_bp)
 app.register_blueprint(news_bp)
 app.register_blueprint(indicators_bp)
 app.register_blueprint(search_bp)
+app.register_blueprint(alerts_bp)
+app.register_blueprint(stream_bp)
+app.register_blueprint(screener_bp)
+
+def start_background_jobs(app):
+    """
+    Starts warm-ups, schedulers and pollers. Called by wsgi.py (and at
+    ASGI startup), not on import, so that tools importing the app start
+    nothing; with several workers only the leader (see utils/leader.py)
+    runs them, the others serve what it persists.
+
+    Returns:
+        True if this process runs the background jobs
+    """
+    # Ogni worker serve gli snapshot, anche quelli ricalcolati dal leader
+    if SNAPSHOTS_ENABLED:
+        snapshots.attach(app)
+    if not leader.acquire():
+        print(f"Job in background attivi in un altro processo (pid {os.getpid()})")
+        return False
+
+    # Costruisce o aggiorna l'indice delle crypto senza bloccare l'avvio
+    coin_index.warm_up()
+    search_index.warm_up()
+
+    # Aggiornamento notturno dei metadati dei ticker
+    metadata_store.start()
+
+    # Acquisizione periodica delle notizie da NewsAPI nell'archivio locale
+    if NEWS_INGEST_ENABLED:
+        news_store.start()
+
+    # Scheduler unico per la valutazione degli alert
+    if ALERTS_ENABLED:
+        alert_engine.start()
+
+    # Ricalcolo periodico delle panoramiche servite a tutti i visitatori
+    if SNAPSHOTS_ENABLED:
+        snapshots.start(app)
+    return True
 
 @app.route('/')
 def home():
     return "Welcome to the Stock and Crypto Data API!"
 
+@app.route('/api/cache_stats')
+def cache_stats():
+    stats = cache.stats()
+    stats['upstreams'] = http_client.stats()
+    stats['snapshots'] = snapshots.stats()
+    stats['metadata'] = metadata_store.stats()
+    stats['news'] = news_store.stats()
+    stats['news_index'] = news_index.stats()
+    return jsonify(stats)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))
+    start_background_jobs(app)
     app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,27 @@
+# asgi.py
+#
+# Modalità di servizio asincrona, in alternativa a wsgi.py:
+#     uvicorn asgi:app --host 0.0.0.0 --port 5000
+#
+# Le view elencate in NATIVE_VIEWS attendono CoinGecko con httpx senza occupare
+# un thread; tutte le altre girano nel pool limitato del ponte WSGI.
+
+from app import app as flask_app, start_background_jobs
+from config import ASGI_STREAM_THREADS, ASGI_WSGI_THREADS
+from routes.crypto import get_crypto_batch_async, get_crypto_data_async, get_cryptos_by_category_async
+from utils.asgi import AsgiAdapter
+from utils.http_client import close_async_clients
+
+NATIVE_VIEWS = {
+    'crypto_bp.get_crypto_data': get_crypto_data_async,
+    'crypto_bp.get_crypto_batch': get_crypto_batch_async,
+    'crypto_bp.get_cryptos_by_category': get_cryptos_by_category_async,
+}
+
+
+async def start_jobs():
+    start_background_jobs(flask_app)
+
+
+app = AsgiAdapter(flask_app, NATIVE_VIEWS, wsgi_threads=ASGI_WSGI_THREADS, stream_threads=ASGI_STREAM_THREADS,
+                  on_startup=start_jobs, on_shutdown=close_async_clients)
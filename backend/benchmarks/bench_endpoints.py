@@ -0,0 +1,299 @@
+# benchmarks/bench_endpoints.py
+#
+# Benchmark offline degli endpoint di tutti i blueprint. yfinance, CoinGecko e NewsAPI
+# vengono sostituiti da risposte registrate (benchmarks/fixtures.py), con una latenza
+# simulata per chiamata, così i numeri sono ripetibili e confrontabili tra commit.
+#
+# Uso (dalla cartella backend):
+#     python -m benchmarks.bench_endpoints --record          # una volta, con la rete
+#     python -m benchmarks.bench_endpoints [--concurrency 8] [--requests 200] [--only stock_bp,search]
+#     python -m benchmarks.bench_endpoints --synthetic       # senza registrazioni: dati sintetici
+#
+# Per confrontare due versioni:
+#     python -m benchmarks.bench_endpoints --save before.json
+#     python -m benchmarks.bench_endpoints --baseline before.json
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from benchmarks.fixtures import FixtureServer, FixtureStore, YFinanceFixtures
+
+# (blueprint, URL) di ogni endpoint misurato; gli stream SSE sono esclusi perché non terminano
+ENDPOINTS = (
+    ('stock_bp', '/api/stock_data/AAPL'),
+    ('stock_bp', '/api/stock_data/MSFT?period=1y'),
+    ('stock_bp', '/api/top_stocks'),
+    ('stock_bp', '/api/market_overview'),
+    ('stock_bp', '/api/stocks_by_sector?sector=Financial'),
+    ('stock_bp', '/api/search_stock?query=NVDA'),
+    ('stock_bp', '/api/stock_batch?symbols=AAPL,MSFT,NVDA,JPM,V'),
+    ('crypto_bp', '/api/crypto_data/btc?period=1mo'),
+    ('crypto_bp', '/api/top_cryptos'),
+    ('crypto_bp', '/api/crypto_news'),
+    ('crypto_bp', '/api/crypto_market_overview'),
+    ('crypto_bp', '/api/cryptos_by_category?category=defi'),
+    ('crypto_bp', '/api/crypto_batch?symbols=btc,eth,sol'),
+    ('news_bp', '/api/economic_news'),
+    ('news_bp', '/api/financial_news'),
+    ('news_bp', '/api/market_news'),
+    ('news_bp', '/api/crypto_news'),
+    ('news_bp', '/api/news/search?q=stock+market+outlook'),
+    ('news_bp', '/api/news/search?symbol=BTC'),
+    ('indicators_bp', '/api/technical_indicators/AAPL'),
+    ('indicators_bp', '/api/technical_indicators/AAPL/latest'),
+    ('screener_bp', '/api/screener?sector=Technology&filters=RSI<70'),
+    ('search', '/api/search_symbol?query=app'),
+    ('search', '/api/unified_search?query=bitc'),
+    ('search', '/api/top_symbols'),
+    ('alerts_bp', '/api/alerts?client_id=benchmark'),
+)
+
+# Thread avviati dalle richieste per aggiornare dati o indici in background: le loro
+# chiamate upstream appartengono all'endpoint che li ha avviati
+BACKGROUND_THREADS = frozenset(('metadata-refresh', 'news-refresh', 'news-index-rebuild', 'search-index-rebuild',
+                                'coin-index-refresh'))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def configure_environment(args, data_dir):
+    """Settings read by config.py at import time: must run before the app is imported."""
+    os.environ['DATA_DIR'] = data_dir
+    os.environ['CACHE_BACKEND'] = 'memory'
+    os.environ['SNAPSHOTS_ENABLED'] = 'true' if args.snapshots else 'false'
+    os.environ['ALERTS_ENABLED'] = 'false'
+    # Senza poller le notizie vengono acquisite alla prima richiesta di ogni argomento
+    os.environ['NEWS_INGEST_ENABLED'] = 'false'
+    os.environ.setdefault('NEWS_API_KEY', 'benchmark')
+    if not args.record:
+        # In riproduzione i limiti di richieste non servono: la latenza è quella simulata
+        os.environ['COINGECKO_API_KEY'] = ''
+        for upstream in ('COINGECKO', 'NEWSAPI'):
+            os.environ[f'{upstream}_RATE_PER_MINUTE'] = '1000000'
+            os.environ[f'{upstream}_BURST'] = '1000000'
+
+
+def load_app(server, no_cache, snapshots):
+    import config
+    if no_cache:
+        for data_class in config.CACHE_TTLS:
+            config.CACHE_TTLS[data_class] = (0, 0)
+
+    # Gli URL upstream puntano al server delle registrazioni
+    from routes import crypto
+    from services import news_store
+    crypto.COINGECKO_API_BASE = crypto.COINGECKO_PRO_API_BASE = server.base_url('coingecko')
+    news_store.NEWSAPI_EVERYTHING_URL = f"{server.base_url('newsapi')}/everything"
+
+    # Nessun job in background (start_background_jobs): le chiamate upstream misurate
+    # sono solo quelle delle richieste
+    from app import app
+    if snapshots:
+        from services.snapshots import snapshots as snapshot_store
+        snapshot_store.attach(app)
+    return app
+
+
+def upstream_calls(yfinance, server):
+    calls = Counter({f"yfinance.{name}": count for name, count in yfinance.calls.items()})
+    calls.update(server.calls)
+    return calls
+
+
+def wait_for_background(timeout=30):
+    """
+    Waits until the background work started by the requests (index rebuilds,
+    metadata and news refreshes, cache revalidations) is over, so that its
+    upstream calls are not counted for the next endpoint.
+
+    Returns:
+        False if it was still running after timeout seconds
+    """
+    from utils.cache import cache
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        busy = any(thread.name in BACKGROUND_THREADS for thread in threading.enumerate())
+        if not busy and not cache.stats()['refreshing']:
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _drive(app, url, total, concurrency):
+    """Sends `total` GET requests with `concurrency` threads; returns (latencies, statuses, elapsed)."""
+    latencies = []
+    statuses = Counter()
+    remaining = [total]
+    lock = threading.Lock()
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            started = time.perf_counter()
+            response = client.get(url)
+            response.get_data()
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(min(concurrency, total))]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def bench_endpoint(app, url, args, yfinance, server):
+    """
+    Warm-up, timed run and a separate traced run for the memory peak
+    (tracemalloc slows Python down, so it is kept out of the latencies).
+    Upstream calls are counted once the background work started by the
+    timed run is over, and only that work.
+    """
+    if args.warmup:
+        _drive(app, url, args.warmup, 1)
+
+    settled = wait_for_background()
+    before = upstream_calls(yfinance, server)
+    latencies, statuses, elapsed = _drive(app, url, args.requests, args.concurrency)
+    settled = wait_for_background() and settled
+    calls = upstream_calls(yfinance, server)
+    calls.subtract(before)
+    if not settled:
+        print(f"Attenzione: lavoro in background ancora attivo per {url}, chiamate upstream approssimate",
+              file=sys.stderr)
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    _drive(app, url, min(args.requests, args.memory_requests), args.concurrency)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    return {
+        'requests': len(latencies),
+        'throughput': len(latencies) / elapsed,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'errors': sum(count for status, count in statuses.items() if status >= 400),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'memory_peak_kb': peak / 1024,
+        'upstream_calls': {name: count for name, count in sorted(calls.items()) if count},
+    }
+
+
+def _delta(value, base):
+    return f"{(value - base) / base * 100:+.0f}%" if base else ''
+
+
+def report(results, baseline=None):
+    header = f"{'endpoint':<48}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'err':>5}{'mem KB':>9}  upstream calls"
+    print(header)
+    print('-' * len(header))
+    for url, result in results.items():
+        calls = ', '.join(f"{name}={count}" for name, count in result['upstream_calls'].items()) or '-'
+        print(f"{url[:47]:<48}{result['throughput']:>9.1f}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}"
+              f"{result['p99_ms']:>9.1f}{result['errors']:>5}{result['memory_peak_kb']:>9.0f}  {calls}")
+        base = (baseline or {}).get(url)
+        if base:
+            print(f"{'  vs baseline':<48}{_delta(result['throughput'], base['throughput']):>9}"
+                  f"{_delta(result['p50_ms'], base['p50_ms']):>9}{_delta(result['p95_ms'], base['p95_ms']):>9}"
+                  f"{_delta(result['p99_ms'], base['p99_ms']):>9}{'':>5}"
+                  f"{_delta(result['memory_peak_kb'], base['memory_peak_kb']):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline degli endpoint con risposte upstream registrate")
+    parser.add_argument('--requests', type=int, default=100, help='Richieste misurate per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client simultanei')
+    parser.add_argument('--warmup', type=int, default=3, help='Richieste non misurate prima di ogni endpoint (0 = a freddo)')
+    parser.add_argument('--memory-requests', type=int, default=20, help='Richieste della passata per il picco di memoria')
+    parser.add_argument('--upstream-latency', type=float, default=0.05, help='Secondi simulati per ogni chiamata upstream')
+    parser.add_argument('--only', default='', help='Blueprint o URL da misurare, separati da virgola')
+    parser.add_argument('--no-cache', action='store_true', help='TTL a zero: ogni richiesta arriva agli upstream')
+    parser.add_argument('--snapshots', action='store_true', help='Serve le panoramiche dagli snapshot pre-calcolati')
+    parser.add_argument('--synthetic', action='store_true', help='Dati sintetici per le risposte non registrate')
+    parser.add_argument('--record', action='store_true', help='Registra le risposte reali (richiede la rete)')
+    parser.add_argument('--fixtures', default=None, help='Cartella delle registrazioni')
+    parser.add_argument('--verbose', action='store_true', help="Mostra l'output dell'app durante le misure")
+    parser.add_argument('--save', help='Salva i risultati in JSON')
+    parser.add_argument('--baseline', help='Confronta con risultati salvati in precedenza')
+    args = parser.parse_args()
+
+    store = FixtureStore(args.fixtures) if args.fixtures else FixtureStore()
+    store.load()
+    if not args.record and not args.synthetic and store.empty():
+        sys.exit(f"Nessuna registrazione in {store.directory}: eseguire prima con --record oppure usare --synthetic")
+
+    mode = 'record' if args.record else 'replay'
+    latency = 0.0 if args.record else args.upstream_latency
+    yfinance = YFinanceFixtures(store, mode, args.synthetic, latency)
+    server = FixtureServer(store, mode, args.synthetic, latency).start()
+    data_dir = tempfile.mkdtemp(prefix='bench-data-')
+    configure_environment(args, data_dir)
+    yfinance.install()
+
+    try:
+        app = load_app(server, args.no_cache, args.snapshots)
+        only = {item.strip() for item in args.only.split(',') if item.strip()}
+        endpoints = [url for blueprint, url in ENDPOINTS if not only or blueprint in only or url in only]
+
+        if args.record:
+            client = app.test_client()
+            for url in endpoints:
+                status = client.get(url).status_code
+                print(f"{status} {url}")
+            store.save()
+            print(f"Registrazioni salvate in {store.directory}")
+            return
+
+        print(f"{len(endpoints)} endpoint, {args.requests} richieste ciascuno, concorrenza {args.concurrency}, "
+              f"latenza upstream {latency * 1000:.0f} ms{', senza cache' if args.no_cache else ''}")
+        # I print delle view finirebbero in mezzo al report
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+        with quiet:
+            results = {url: bench_endpoint(app, url, args, yfinance, server) for url in endpoints}
+
+        baseline = None
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)['results']
+        report(results, baseline)
+
+        missing = dict(yfinance.missing + server.missing)
+        if missing:
+            note = 'sostituite da dati sintetici' if args.synthetic else 'risposte vuote o 404'
+            print(f"\nChiamate senza registrazione ({note}): {missing}")
+        if args.save:
+            with open(args.save, 'w') as f:
+                json.dump({'settings': {k: v for k, v in vars(args).items() if k not in ('save', 'baseline')},
+                           'results': results}, f, indent=2)
+    finally:
+        server.stop()
+        yfinance.uninstall()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
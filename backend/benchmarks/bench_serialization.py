@@ -0,0 +1,88 @@
+# benchmarks/bench_serialization.py
+#
+# Micro-benchmark della serializzazione di /api/stock_data.
+# Confronta il vecchio ciclo iterrows + jsonify con la serializzazione per colonne.
+#
+# Uso (dalla cartella backend):
+#     python -m benchmarks.bench_serialization [--rows 20000] [--repeat 5]
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.serialization import dumps, frame_to_columns, frame_to_records, INTRADAY_TIMESTAMP_FORMAT
+
+
+def make_frame(rows):
+    """Builds a synthetic OHLCV+VWAP frame with a few missing values."""
+    index = pd.date_range('2020-01-01 09:30', periods=rows, freq='5min', tz='America/New_York')
+    rng = np.random.default_rng(42)
+    close = 100 + rng.standard_normal(rows).cumsum()
+    data = pd.DataFrame({
+        'Open': close + rng.standard_normal(rows) * 0.1,
+        'High': close + 0.5,
+        'Low': close - 0.5,
+        'Close': close,
+        'Volume': rng.integers(1_000, 1_000_000, rows).astype(float),
+    }, index=index)
+    data.iloc[::97, 0] = np.nan
+    data['VWAP'] = (data['Close'] * data['Volume']).cumsum() / data['Volume'].cumsum()
+    return data
+
+
+def legacy_rows(data, timestamp_format):
+    """The original per-row loop from get_stock_data."""
+    result = []
+    for index, row in data.iterrows():
+        entry = {
+            'timestamp': index.strftime(timestamp_format),
+            'open': float(row['Open']) if not pd.isna(row['Open']) else None,
+            'high': float(row['High']) if not pd.isna(row['High']) else None,
+            'low': float(row['Low']) if not pd.isna(row['Low']) else None,
+            'close': float(row['Close']) if not pd.isna(row['Close']) else None,
+            'volume': int(row['Volume']) if not pd.isna(row['Volume']) else None
+        }
+        if 'VWAP' in row and not pd.isna(row['VWAP']):
+            entry['vwap'] = float(row['VWAP'])
+        result.append(entry)
+    return result
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark della serializzazione di /api/stock_data")
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    data = make_frame(args.rows)
+    fmt = INTRADAY_TIMESTAMP_FORMAT
+
+    cases = [
+        ('legacy iterrows + json', lambda: json.dumps(legacy_rows(data, fmt)).encode('utf-8')),
+        ('records (vectorized)', lambda: dumps(frame_to_records(data, fmt))),
+        ('columnar (vectorized)', lambda: dumps(frame_to_columns(data, fmt))),
+    ]
+
+    print(f"{args.rows} barre, migliore di {args.repeat} ripetizioni")
+    print(f"{'caso':<26}{'tempo (ms)':>12}{'payload (KB)':>14}{'speedup':>10}")
+    baseline = None
+    for name, fn in cases:
+        elapsed, payload = best_of(fn, args.repeat)
+        baseline = baseline or elapsed
+        print(f"{name:<26}{elapsed * 1000:>12.1f}{len(payload) / 1024:>14.1f}{baseline / elapsed:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
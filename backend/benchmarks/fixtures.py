@@ -0,0 +1,299 @@
+# benchmarks/fixtures.py
+#
+# Registrazione e riproduzione delle risposte upstream per i benchmark offline:
+# yf.Ticker / yf.download vengono sostituiti da YFinanceFixtures, mentre CoinGecko e
+# NewsAPI vengono indirizzati a FixtureServer, un server HTTP locale.
+#
+# Le registrazioni stanno in benchmarks/fixtures/ (ignorata da git) e si creano con:
+#     python -m benchmarks.bench_endpoints --record
+
+import json
+import os
+import pickle
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import pandas as pd
+import requests
+import yfinance as yf
+
+from benchmarks import synthetic
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+UPSTREAM_BASES = {
+    'coingecko': 'https://api.coingecko.com/api/v3',
+    'newsapi': 'https://newsapi.org/v2',
+}
+# Parametri esclusi dalla chiave di una richiesta: credenziali e date relative a "oggi"
+IGNORED_PARAMS = frozenset({'apiKey', 'x_cg_demo_api_key', 'x_cg_pro_api_key', 'from', 'to'})
+
+
+def _http_key(upstream, path, params):
+    return upstream, path, tuple(sorted((k, v) for k, v in params.items() if k not in IGNORED_PARAMS))
+
+
+class FixtureStore:
+    """
+    Recorded upstream responses, kept in memory and pickled to `directory`.
+
+    yfinance histories are stored once per (symbol, interval), merged across
+    recordings, and sliced on replay like the local time series store does,
+    so replays do not depend on the period or start date a view asks for.
+    HTTP responses are keyed by upstream, path and query parameters.
+    """
+
+    def __init__(self, directory=FIXTURES_DIR):
+        self.directory = directory
+        self.histories = {}   # (simbolo, intervallo) -> DataFrame
+        self.tickers = {}     # (simbolo, attributo) -> info / news / bilanci
+        self.http = {}        # (upstream, path, parametri) -> (status, corpo, content type)
+        self._lock = threading.Lock()
+
+    def _path(self):
+        return os.path.join(self.directory, 'recorded.pkl')
+
+    def load(self):
+        try:
+            with open(self._path(), 'rb') as f:
+                self.histories, self.tickers, self.http = pickle.load(f)
+        except OSError:
+            pass
+        return self
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            payload = (self.histories, self.tickers, self.http)
+            with open(self._path(), 'wb') as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def empty(self):
+        return not (self.histories or self.tickers or self.http)
+
+    def add_history(self, symbol, interval, frame):
+        if frame is None or frame.empty:
+            return
+        with self._lock:
+            stored = self.histories.get((symbol, interval))
+            if stored is not None:
+                frame = pd.concat([stored, frame])
+                frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+            self.histories[(symbol, interval)] = frame
+
+    def http_response(self, upstream, path, params):
+        key = _http_key(upstream, path, params)
+        with self._lock:
+            if key in self.http:
+                return self.http[key]
+            # Stesso endpoint con parametri diversi: meglio una risposta plausibile che un errore
+            return next((value for stored, value in self.http.items() if stored[:2] == key[:2]), None)
+
+
+class YFinanceFixtures:
+    """
+    Stand-in for yf.Ticker and yf.download.
+
+    mode 'replay' serves the store (falling back to synthetic data when
+    `synthetic` is set, empty results otherwise, as yfinance does for
+    unknown symbols); mode 'record' calls the real yfinance and stores what
+    it returns. `latency` seconds are slept per call to mimic Yahoo.
+    """
+
+    def __init__(self, store, mode='replay', synthetic=False, latency=0.0):
+        self.store = store
+        self.mode = mode
+        self.synthetic = synthetic
+        self.latency = latency
+        self.calls = Counter()
+        self.missing = Counter()
+        self._lock = threading.Lock()
+        self._real_ticker = yf.Ticker
+        self._real_download = yf.download
+
+    def install(self):
+        fixtures = self
+
+        class FixtureTicker:
+            def __init__(self, symbol, *args, **kwargs):
+                self.ticker = symbol.upper()
+
+            def history(self, period=None, interval='1d', start=None, end=None, **kwargs):
+                return fixtures.history(self.ticker, period, interval, start)
+
+            def __getattr__(self, name):
+                if name in ('info', 'news', 'financials', 'balance_sheet', 'cashflow'):
+                    return fixtures.attribute(self.ticker, name)
+                raise AttributeError(name)
+
+        yf.Ticker = FixtureTicker
+        yf.download = self.download
+
+    def uninstall(self):
+        yf.Ticker = self._real_ticker
+        yf.download = self._real_download
+
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _miss(self, name):
+        with self._lock:
+            self.missing[name] += 1
+
+    def _sliced(self, symbol, period, interval, start):
+        """Stored (or synthetic) bars for a history request, or None."""
+        from services.timeseries_store import slice_period
+
+        frame = self.store.histories.get((symbol, interval))
+        if frame is None:
+            self._miss('history')
+            if not self.synthetic:
+                return None
+            frame = synthetic.history(symbol, interval)
+        if start is not None:
+            return frame[frame.index >= pd.Timestamp(start, tz=frame.index.tz)].copy()
+        return slice_period(frame, period or '1mo').copy()
+
+    def history(self, symbol, period, interval, start=None):
+        self._count('history')
+        if self.mode == 'record':
+            kwargs = {'start': start} if start is not None else {'period': period}
+            frame = self._real_ticker(symbol).history(interval=interval, **kwargs)
+            self.store.add_history(symbol, interval, frame)
+            return frame
+        frame = self._sliced(symbol, period, interval, start)
+        return pd.DataFrame() if frame is None else frame
+
+    def attribute(self, symbol, name):
+        self._count(name)
+        if self.mode == 'record':
+            value = getattr(self._real_ticker(symbol), name)
+            with self.store._lock:
+                self.store.tickers[(symbol, name)] = value
+            return value
+
+        key = (symbol, name)
+        if key in self.store.tickers:
+            return self.store.tickers[key]
+        self._miss(name)
+        if not self.synthetic:
+            return {} if name == 'info' else [] if name == 'news' else pd.DataFrame()
+        if name in ('info', 'news'):
+            return getattr(synthetic, name)(symbol)
+        return synthetic.statement(symbol, name)
+
+    def download(self, tickers, period=None, interval='1d', start=None, **kwargs):
+        symbols = [tickers] if isinstance(tickers, str) else list(tickers)
+        symbols = [symbol.upper() for symbol in symbols]
+        self._count('download')
+        if self.mode == 'record':
+            data = self._real_download(symbols, period=period, interval=interval, start=start, **kwargs)
+            if isinstance(data.columns, pd.MultiIndex):
+                for symbol in data.columns.get_level_values(1).unique():
+                    frame = data.xs(symbol, axis=1, level=1).dropna(how='all')
+                    self.store.add_history(symbol, interval, frame.tz_localize('America/New_York')
+                                           if frame.index.tz is None else frame)
+            return data
+
+        frames = {}
+        for symbol in symbols:
+            frame = self._sliced(symbol, period, interval, start)
+            if frame is not None and not frame.empty:
+                frames[symbol] = frame[['Open', 'High', 'Low', 'Close', 'Volume']]
+        if not frames:
+            return pd.DataFrame()
+        data = pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1, level=0)
+        data.index = data.index.tz_localize(None).normalize()
+        return data
+
+
+class FixtureServer:
+    """
+    Local HTTP server standing in for CoinGecko (/coingecko/...) and NewsAPI
+    (/newsapi/...). In 'record' mode it proxies to the real APIs and stores
+    the responses; in 'replay' mode it serves them (or synthetic ones).
+    Every request sleeps `latency` seconds and is counted per upstream.
+    """
+
+    def __init__(self, store, mode='replay', synthetic=False, latency=0.0):
+        self.store = store
+        self.mode = mode
+        self.synthetic = synthetic
+        self.latency = latency
+        self.calls = Counter()
+        self.missing = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def base_url(self, upstream):
+        return f"http://127.0.0.1:{self.port}/{upstream}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fixture-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def respond(self, upstream, path, params):
+        """Returns (status, body bytes, content type) for one upstream request."""
+        with self._lock:
+            self.calls[upstream] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.mode == 'record':
+            response = requests.get(f"{UPSTREAM_BASES[upstream]}/{path}", params=params, timeout=30)
+            value = (response.status_code, response.content, response.headers.get('Content-Type', 'application/json'))
+            if response.status_code == 200:
+                with self.store._lock:
+                    self.store.http[_http_key(upstream, path, params)] = value
+            return value
+
+        value = self.store.http_response(upstream, path, params)
+        if value is not None:
+            return value
+        with self._lock:
+            self.missing[upstream] += 1
+        if not self.synthetic:
+            return 404, b'{"error": "no recorded response"}', 'application/json'
+        status, body = (synthetic.coingecko if upstream == 'coingecko' else synthetic.newsapi)(path, params)
+        return status, json.dumps(body).encode(), 'application/json'
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                upstream, _, path = parts.path.lstrip('/').partition('/')
+                if upstream not in UPSTREAM_BASES:
+                    self.send_error(404)
+                    return
+                status, body, content_type = server.respond(upstream, path, dict(parse_qsl(parts.query)))
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
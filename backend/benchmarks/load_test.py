@@ -0,0 +1,159 @@
+# benchmarks/load_test.py
+#
+# Generatore di carico HTTP per confrontare la modalità WSGI con quella ASGI
+# a parità di endpoint, concorrenza e durata. Usa solo la libreria standard.
+#
+# Uso (dalla cartella backend), con il server già avviato in un altro terminale:
+#     gunicorn -w 1 --threads 32 -b 127.0.0.1:5000 wsgi:app
+#     python -m benchmarks.load_test --url http://127.0.0.1:5000/api/crypto_data/btc --concurrency 200
+#
+#     uvicorn --workers 1 --port 5000 asgi:app
+#     python -m benchmarks.load_test --url http://127.0.0.1:5000/api/crypto_data/btc --concurrency 200
+#
+# Per misurare il tempo passato in attesa dell'upstream (e non la cache) lanciare
+# il server con CACHE_TTLS a zero, oppure usare più simboli: --url può essere ripetuto
+# e le richieste ruotano sugli URL indicati. Le view native di asgi.py coprono anche
+# gli endpoint interrogati di continuo da watchlist e alert:
+#     python -m benchmarks.load_test --concurrency 200 \
+#         --url 'http://127.0.0.1:5000/api/crypto_batch?symbols=btc,eth,sol' \
+#         --url 'http://127.0.0.1:5000/api/cryptos_by_category?category=defi'
+
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _read_response(reader):
+    """Reads one HTTP/1.1 response; returns (status, body length, connection closed)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed by the server")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+        return status, len(body), headers.get('connection') == 'close'
+    size = 0
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            chunk_size = int((await reader.readline()).split(b';')[0], 16)
+            if chunk_size == 0:
+                await reader.readline()
+                break
+            size += len(await reader.readexactly(chunk_size + 2)) - 2
+        return status, size, headers.get('connection') == 'close'
+    body = await reader.read()
+    return status, len(body), True
+
+
+async def _worker(targets, offset, deadline, results, timeout):
+    reader = writer = None
+    index = offset
+    while time.perf_counter() < deadline:
+        host, port, request = targets[index % len(targets)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            writer.write(request)
+            await writer.drain()
+            status, size, close = await asyncio.wait_for(_read_response(reader), timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+            results['errors'][type(e).__name__] = results['errors'].get(type(e).__name__, 0) + 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        results['latencies'].append(time.perf_counter() - started)
+        results['statuses'][status] = results['statuses'].get(status, 0) + 1
+        results['bytes'] += size
+        if close:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+def _targets(urls):
+    targets = []
+    for url in urls:
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        request = (f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+                   f"Accept: application/json\r\nConnection: keep-alive\r\n\r\n").encode('latin-1')
+        targets.append((parts.hostname, parts.port or 80, request))
+    return targets
+
+
+async def run(urls, concurrency, duration, warmup, timeout):
+    """
+    Keeps `concurrency` keep-alive connections busy for `duration` seconds
+    (after `warmup` seconds whose results are discarded).
+
+    Returns:
+        Dict with latencies (seconds), status counts, errors and bytes read
+    """
+    targets = _targets(urls)
+    if warmup > 0:
+        scratch = {'latencies': [], 'statuses': {}, 'errors': {}, 'bytes': 0}
+        deadline = time.perf_counter() + warmup
+        await asyncio.gather(*(_worker(targets, i, deadline, scratch, timeout) for i in range(concurrency)))
+
+    results = {'latencies': [], 'statuses': {}, 'errors': {}, 'bytes': 0}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(_worker(targets, i, deadline, results, timeout) for i in range(concurrency)))
+    results['elapsed'] = time.perf_counter() - started
+    return results
+
+
+def report(results):
+    latencies = results['latencies']
+    elapsed = results['elapsed']
+    print(f"requests:    {len(latencies)} in {elapsed:.1f}s")
+    print(f"throughput:  {len(latencies) / elapsed:.1f} req/s, {results['bytes'] / elapsed / 1024:.0f} KiB/s")
+    if latencies:
+        print(f"latency ms:  mean {statistics.fmean(latencies) * 1000:.1f}, "
+              f"p50 {percentile(latencies, 0.50) * 1000:.1f}, "
+              f"p95 {percentile(latencies, 0.95) * 1000:.1f}, "
+              f"p99 {percentile(latencies, 0.99) * 1000:.1f}, "
+              f"max {max(latencies) * 1000:.1f}")
+    print(f"statuses:    {dict(sorted(results['statuses'].items()))}")
+    if results['errors']:
+        print(f"errors:      {results['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test di carico HTTP (modalità WSGI contro ASGI)")
+    parser.add_argument('--url', action='append', required=True, help='Target URL (repeatable)')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+
+    print(f"{len(args.url)} url, {args.concurrency} connections, {args.duration:.0f}s")
+    report(asyncio.run(run(args.url, args.concurrency, args.duration, args.warmup, args.timeout)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+# benchmarks/synthetic.py
+#
+# Risposte upstream sintetiche e deterministiche (stesso input -> stessi dati),
+# usate dai benchmark al posto delle registrazioni mancanti con --synthetic.
+
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+# Istante fisso a cui sono ancorate tutte le serie, così le esecuzioni sono confrontabili
+ANCHOR = pd.Timestamp('2025-06-02 20:00', tz='UTC')
+
+# Intervallo yfinance -> (passo, storico massimo generato)
+HISTORY_SHAPES = {
+    '1m': ('1min', '7D'),
+    '2m': ('2min', '60D'),
+    '5m': ('5min', '60D'),
+    '15m': ('15min', '60D'),
+    '30m': ('30min', '60D'),
+    '60m': ('1h', '730D'),
+    '90m': ('90min', '60D'),
+    '1h': ('1h', '730D'),
+    '1d': ('1D', '3650D'),
+    '5d': ('5D', '3650D'),
+    '1wk': ('7D', '3650D'),
+    '1mo': ('30D', '3650D'),
+}
+
+SECTORS = ('Technology', 'Financial Services', 'Healthcare', 'Consumer Cyclical', 'Energy', 'Industrials')
+MAJOR_COINS = (
+    ('bitcoin', 'btc', 'Bitcoin'), ('ethereum', 'eth', 'Ethereum'), ('tether', 'usdt', 'Tether'),
+    ('binancecoin', 'bnb', 'BNB'), ('solana', 'sol', 'Solana'), ('ripple', 'xrp', 'XRP'),
+    ('usd-coin', 'usdc', 'USDC'), ('cardano', 'ada', 'Cardano'), ('dogecoin', 'doge', 'Dogecoin'),
+    ('tron', 'trx', 'TRON'), ('polkadot', 'dot', 'Polkadot'), ('chainlink', 'link', 'Chainlink'),
+    ('litecoin', 'ltc', 'Litecoin'), ('avalanche-2', 'avax', 'Avalanche'), ('uniswap', 'uni', 'Uniswap'),
+)
+COIN_COUNT = 1000
+
+
+def _rng(*parts):
+    return np.random.default_rng(zlib.crc32('|'.join(map(str, parts)).encode()))
+
+
+def _base_price(symbol):
+    return float(_rng('price', symbol).uniform(5, 500))
+
+
+def history(symbol, interval='1d'):
+    """Full OHLCV history of a symbol for an interval (random walk ending at ANCHOR)."""
+    step, span = HISTORY_SHAPES.get(interval, HISTORY_SHAPES['1d'])
+    index = pd.date_range(end=ANCHOR, start=ANCHOR - pd.Timedelta(span), freq=step)
+    if step.endswith('D'):
+        index = index[index.dayofweek < 5]
+    rng = _rng('history', symbol, interval)
+    returns = rng.normal(0, 0.01 if step.endswith('D') else 0.002, len(index))
+    close = _base_price(symbol) * np.exp(np.cumsum(returns - returns.mean()))
+    spread = np.abs(rng.normal(0, 0.004, len(index))) * close
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    frame = pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': rng.integers(100_000, 5_000_000, len(index)).astype(np.int64),
+        'Dividends': 0.0,
+        'Stock Splits': 0.0,
+    }, index=index.tz_convert('America/New_York'))
+    frame.index.name = 'Date' if step.endswith('D') else 'Datetime'
+    return frame
+
+
+def info(symbol):
+    rng = _rng('info', symbol)
+    price = _base_price(symbol)
+    return {
+        'symbol': symbol,
+        'longName': f"{symbol.title()} Holdings Inc.",
+        'shortName': f"{symbol.title()} Holdings",
+        'exchange': 'NMS',
+        'currency': 'USD',
+        'sector': SECTORS[int(rng.integers(len(SECTORS)))],
+        'industry': 'Software',
+        'country': 'United States',
+        'marketCap': int(rng.uniform(1e9, 3e12)),
+        'regularMarketPreviousClose': price,
+        'trailingPE': float(rng.uniform(8, 60)),
+        'dividendYield': float(rng.uniform(0, 0.04)),
+        'beta': float(rng.uniform(0.5, 2)),
+        'targetHighPrice': price * 1.3,
+        'targetLowPrice': price * 0.8,
+        'targetMeanPrice': price * 1.1,
+        'recommendationKey': 'buy',
+        'website': f"https://www.{symbol.lower()}.example.com",
+        'longBusinessSummary': f"{symbol} designs, manufactures and sells products worldwide. " * 8,
+    }
+
+
+def news(symbol):
+    published = int(ANCHOR.timestamp())
+    return [{
+        'uuid': f"{symbol}-{i}",
+        'title': f"{symbol} shares move as analysts update their outlook ({i + 1})",
+        'publisher': 'Example Wire',
+        'link': f"https://news.example.com/{symbol.lower()}/{i}",
+        'providerPublishTime': published - i * 3600,
+        'type': 'STORY',
+    } for i in range(8)]
+
+
+def statement(symbol, name):
+    rows = {
+        'financials': ('Total Revenue', 'Gross Profit', 'Operating Income', 'Net Income', 'EBITDA'),
+        'balance_sheet': ('Total Assets', 'Total Liabilities Net Minority Interest', 'Stockholders Equity',
+                          'Cash And Cash Equivalents', 'Total Debt'),
+        'cashflow': ('Operating Cash Flow', 'Capital Expenditure', 'Free Cash Flow', 'Repurchase Of Capital Stock'),
+    }[name]
+    columns = pd.to_datetime(['2024-12-31', '2023-12-31', '2022-12-31', '2021-12-31'])
+    values = _rng('statement', symbol, name).uniform(1e8, 1e11, (len(rows), len(columns)))
+    return pd.DataFrame(values, index=list(rows), columns=columns)
+
+
+# CoinGecko
+
+def _coins():
+    coins = [{'id': coin_id, 'symbol': symbol, 'name': name} for coin_id, symbol, name in MAJOR_COINS]
+    for i in range(COIN_COUNT - len(coins)):
+        coins.append({'id': f"coin-{i}", 'symbol': f"c{i}", 'name': f"Coin {i}"})
+    return coins
+
+
+def _market(coin, rank):
+    rng = _rng('market', coin['id'])
+    price = _base_price(coin['id'])
+    change = float(rng.normal(0, 4))
+    return {
+        'id': coin['id'],
+        'symbol': coin['symbol'],
+        'name': coin['name'],
+        'image': f"https://assets.example.com/coins/{coin['id']}.png",
+        'current_price': price,
+        'market_cap': int(3e12 / rank),
+        'market_cap_rank': rank,
+        'total_volume': int(1e11 / rank),
+        'high_24h': price * 1.03,
+        'low_24h': price * 0.97,
+        'price_change_24h': price * change / 100,
+        'price_change_percentage_24h': change,
+        'circulating_supply': float(rng.uniform(1e6, 1e10)),
+        'last_updated': ANCHOR.isoformat(),
+    }
+
+
+def coingecko(path, params):
+    """
+    Synthetic CoinGecko v3 response for an API path (e.g. 'coins/markets').
+
+    Returns:
+        Tuple (status_code, JSON-serializable body)
+    """
+    coins = _coins()
+    if path == 'coins/list':
+        return 200, coins
+    if path == 'coins/markets':
+        ranked = [_market(coin, rank) for rank, coin in enumerate(coins, 1)]
+        if params.get('ids'):
+            wanted = set(params['ids'].split(','))
+            return 200, [coin for coin in ranked if coin['id'] in wanted]
+        if params.get('category'):
+            ranked = ranked[int(_rng('category', params['category']).integers(0, 50))::7]
+        per_page = int(params.get('per_page', 100))
+        page = int(params.get('page', 1))
+        return 200, ranked[(page - 1) * per_page:page * per_page]
+    if path == 'global':
+        return 200, {'data': {
+            'total_market_cap': {'usd': 3.4e12},
+            'total_volume': {'usd': 1.1e11},
+            'market_cap_percentage': {'btc': 58.1, 'eth': 9.2},
+            'market_cap_change_percentage_24h_usd': 1.4,
+            'active_cryptocurrencies': len(coins),
+        }}
+    if path == 'search/trending':
+        return 200, {'coins': [{'item': {'id': coin['id'], 'symbol': coin['symbol'], 'name': coin['name'],
+                                         'market_cap_rank': rank, 'large': ''}}
+                               for rank, coin in enumerate(coins[:7], 1)]}
+    if path == 'search':
+        query = params.get('query', '').lower()
+        return 200, {'coins': [coin for coin in coins if coin['symbol'] == query or query in coin['name'].lower()][:25]}
+
+    parts = path.split('/')
+    by_id = {coin['id']: (rank, coin) for rank, coin in enumerate(coins, 1)}
+    if len(parts) >= 2 and parts[0] == 'coins' and parts[1] in by_id:
+        rank, coin = by_id[parts[1]]
+        if len(parts) == 3 and parts[2] == 'market_chart':
+            return 200, _market_chart(coin['id'], float(params.get('days', 1)))
+        if len(parts) == 2:
+            market = _market(coin, rank)
+            return 200, {
+                'id': coin['id'], 'symbol': coin['symbol'], 'name': coin['name'],
+                'image': {'large': market['image']},
+                'market_cap_rank': rank,
+                'market_data': {
+                    'current_price': {'usd': market['current_price'], 'eur': market['current_price'] * 0.92},
+                    'market_cap': {'usd': market['market_cap']},
+                    'total_volume': {'usd': market['total_volume']},
+                    'high_24h': {'usd': market['high_24h']},
+                    'low_24h': {'usd': market['low_24h']},
+                    'price_change_percentage_24h': market['price_change_percentage_24h'],
+                    'price_change_percentage_7d': market['price_change_percentage_24h'] * 2,
+                    'circulating_supply': market['circulating_supply'],
+                    'max_supply': None,
+                },
+                'description': {'en': f"{coin['name']} is a decentralized digital asset. " * 40},
+                'links': {'homepage': [f"https://{coin['id']}.example.org"], 'twitter_screen_name': coin['id']},
+            }
+    return 404, {'error': 'coin not found'}
+
+
+def _market_chart(coin_id, days):
+    # Granularità di CoinGecko: 5 minuti fino a 1 giorno, oraria fino a 90, poi giornaliera
+    step = 300 if days <= 1 else 3600 if days <= 90 else 86400
+    end = int(ANCHOR.timestamp())
+    timestamps = np.arange(end - int(days * 86400), end + 1, step) * 1000
+    rng = _rng('chart', coin_id, days)
+    prices = _base_price(coin_id) * np.exp(np.cumsum(rng.normal(0, 0.003, len(timestamps))))
+    volumes = rng.uniform(1e8, 5e9, len(timestamps))
+    return {
+        'prices': [[int(t), float(p)] for t, p in zip(timestamps, prices)],
+        'market_caps': [[int(t), float(p) * 1.9e7] for t, p in zip(timestamps, prices)],
+        'total_volumes': [[int(t), float(v)] for t, v in zip(timestamps, volumes)],
+    }
+
+
+# NewsAPI
+
+def newsapi(path, params):
+    """Synthetic NewsAPI v2 response (status_code, body) for 'everything' or 'top-headlines'."""
+    query = params.get('q', 'markets')
+    # Ancorate all'ora corrente: l'archivio delle notizie scarta gli articoli troppo vecchi
+    published = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    articles = [{
+        'source': {'id': None, 'name': f"Source {i % 7}"},
+        'author': f"Reporter {i % 11}",
+        'title': f"{query[:40]}: story {i + 1}",
+        'description': f"What investors need to know about {query[:40]} today, part {i + 1}.",
+        'url': f"https://news.example.com/{zlib.crc32(query.encode())}/{i}",
+        'urlToImage': f"https://news.example.com/img/{i}.jpg",
+        'publishedAt': (published - timedelta(minutes=37 * i)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'content': "Markets moved as traders weighed new data. " * 5,
+    } for i in range(int(params.get('pageSize', 100)))]
+    return 200, {'status': 'ok', 'totalResults': len(articles), 'articles': articles}
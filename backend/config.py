@@ -2,7 +2,171 @@
 
 import os
 
+from dotenv import load_dotenv
+
+# Le impostazioni sono lette all'import: il file .env va caricato prima di tutto il resto
+load_dotenv()
+
 # Configura le chiavi API
 
 NEWS_API_KEY = os.getenv("NEWS_API_KEY", "")
-COINGECKO_API_KEY = os.getenv("COINGECKO_API_KEY", "")
\ No newline at end of file
+COINGECKO_API_KEY = os.getenv("COINGECKO_API_KEY", "")
+
+# Cache delle risposte upstream (yfinance, CoinGecko, NewsAPI)
+
+# 'memory' = solo LRU in-process, 'disk' = LRU in-process + cache su disco condivisa tra i worker
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# TTL in secondi per classe di dato: (fresco, stale).
+# Entro 'fresco' il dato viene servito direttamente; entro 'stale' viene servito
+# subito e rivalidato in background (stale-while-revalidate).
+CACHE_TTLS = {
+    'quote': (60, 300),
+    'history': (60, 600),
+    'history_daily': (900, 3600),
+    'financials': (86400, 604800),
+    'ticker_news': (900, 3600),
+    'coingecko_markets': (60, 300),
+    'coingecko_chart': (120, 600),
+    'coingecko_coin': (300, 1800),
+    'coingecko_search': (86400, 172800),
+    'coingecko_list': (86400, 172800),
+    'coingecko_global': (300, 900),
+    'coingecko_trending': (600, 1800),
+}
+
+# Fan-out concorrente delle chiamate upstream
+
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", 32))
+# Deadline (secondi) di ogni singola chiamata in un fan-out
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", 10))
+# Numero massimo di chiamate simultanee verso ciascun upstream
+UPSTREAM_CONCURRENCY = {
+    'yfinance': int(os.getenv("YFINANCE_CONCURRENCY", 8)),
+    'coingecko': int(os.getenv("COINGECKO_CONCURRENCY", 4)),
+    'newsapi': int(os.getenv("NEWSAPI_CONCURRENCY", 2)),
+}
+
+# Client HTTP verso le API esterne (CoinGecko, NewsAPI)
+
+# Limite di richieste al minuto per upstream (token bucket): (richieste/minuto, burst)
+UPSTREAM_RATE_LIMITS = {
+    'coingecko': (float(os.getenv("COINGECKO_RATE_PER_MINUTE", 30)), int(os.getenv("COINGECKO_BURST", 5))),
+    'newsapi': (float(os.getenv("NEWSAPI_RATE_PER_MINUTE", 30)), int(os.getenv("NEWSAPI_BURST", 5))),
+}
+# Timeout (secondi) di connessione e di lettura di ogni richiesta
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.05))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 10))
+# Tentativi aggiuntivi su 429/5xx ed errori di rete, con backoff esponenziale
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", 0.5))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", 8))
+# Attesa massima (secondi) di un token prima di rinunciare alla richiesta
+HTTP_MAX_QUEUE_WAIT = float(os.getenv("HTTP_MAX_QUEUE_WAIT", 10))
+
+# Dati persistiti localmente (alert, indici, snapshot)
+
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+# Job in background (scheduler, poller, warm-up): con più worker li esegue uno solo.
+# 'auto' = il primo worker che ottiene il lock su LEADER_LOCK_FILE, 'true' = sempre, 'false' = mai
+BACKGROUND_JOBS = os.getenv("BACKGROUND_JOBS", "auto").lower()
+LEADER_LOCK_FILE = os.getenv("LEADER_LOCK_FILE", os.path.join(DATA_DIR, "background.lock"))
+
+# Storico OHLCV locale, aggiornato scaricando solo le barre mancanti
+TIMESERIES_DIR = os.getenv("TIMESERIES_DIR", os.path.join(DATA_DIR, "timeseries"))
+# Barre già salvate che vengono riscaricate ad ogni aggiornamento
+TIMESERIES_OVERLAP_BARS = int(os.getenv("TIMESERIES_OVERLAP_BARS", 3))
+
+# Stato degli indicatori aggiornati in modo incrementale, uno per simbolo
+INDICATOR_STATE_DIR = os.getenv("INDICATOR_STATE_DIR", os.path.join(DATA_DIR, "indicator_state"))
+
+# Snapshot pre-calcolati delle pagine principali (panoramiche, top, notizie)
+SNAPSHOTS_ENABLED = os.getenv("SNAPSHOTS_ENABLED", "true").lower() == "true"
+SNAPSHOTS_DIR = os.getenv("SNAPSHOTS_DIR", os.path.join(DATA_DIR, "snapshots"))
+# Intervallo (secondi) di ricalcolo per tipo di mercato; le azioni rallentano a mercato chiuso
+SNAPSHOT_INTERVALS = {
+    'equity': int(os.getenv("SNAPSHOT_EQUITY_INTERVAL", 60)),
+    'equity_closed': int(os.getenv("SNAPSHOT_EQUITY_CLOSED_INTERVAL", 1800)),
+    'crypto': int(os.getenv("SNAPSHOT_CRYPTO_INTERVAL", 60)),
+}
+# Oltre questa età (secondi) lo snapshot non viene servito e la richiesta lo ricalcola
+SNAPSHOT_MAX_AGE = int(os.getenv("SNAPSHOT_MAX_AGE", 3600))
+
+# Server-Sent Events: intervallo dei messaggi di keep-alive
+SSE_HEARTBEAT_SECONDS = int(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+
+# Valutazione degli alert lato server
+ALERTS_ENABLED = os.getenv("ALERTS_ENABLED", "true").lower() == "true"
+# Database condiviso dai worker: lo scheduler gira in un solo processo, le notifiche partono da tutti
+ALERTS_DB_FILE = os.getenv("ALERTS_DB_FILE", os.path.join(DATA_DIR, "alerts.sqlite3"))
+ALERTS_POLL_INTERVAL = int(os.getenv("ALERTS_POLL_INTERVAL", 30))
+ALERTS_HISTORY_SIZE = int(os.getenv("ALERTS_HISTORY_SIZE", 50))
+# Secondi tra due letture degli alert scattati da inoltrare agli stream SSE di ogni processo
+ALERTS_RELAY_INTERVAL = float(os.getenv("ALERTS_RELAY_INTERVAL", 1))
+
+# Feed in streaming delle quotazioni
+QUOTE_FEED_INTERVAL = int(os.getenv("QUOTE_FEED_INTERVAL", 15))
+
+# Indice locale simbolo -> id CoinGecko
+COIN_INDEX_FILE = os.getenv("COIN_INDEX_FILE", os.path.join(DATA_DIR, "coin_index.json"))
+COIN_INDEX_MAX_AGE = int(os.getenv("COIN_INDEX_MAX_AGE", 86400))
+
+# Metadati dei ticker (nome, settore, capitalizzazione...), separati dalle quotazioni
+METADATA_FILE = os.getenv("METADATA_FILE", os.path.join(DATA_DIR, "metadata.json"))
+METADATA_MAX_AGE = int(os.getenv("METADATA_MAX_AGE", 86400))
+METADATA_MISSING_TTL = int(os.getenv("METADATA_MISSING_TTL", 3600))
+METADATA_REFRESH_HOUR = int(os.getenv("METADATA_REFRESH_HOUR", 20))  # ora di New York
+
+# Archivio locale delle notizie, alimentato da NewsAPI a intervalli regolari
+NEWS_DB_FILE = os.getenv("NEWS_DB_FILE", os.path.join(DATA_DIR, "news.sqlite3"))
+NEWS_INGEST_ENABLED = os.getenv("NEWS_INGEST_ENABLED", "true").lower() == "true"
+# Intervallo (secondi) tra due interrogazioni dello stesso argomento; viene allungato
+# se necessario per restare nella quota giornaliera di NewsAPI (100 richieste nel piano gratuito)
+NEWS_POLL_INTERVAL = int(os.getenv("NEWS_POLL_INTERVAL", 900))
+NEWSAPI_DAILY_QUOTA = int(os.getenv("NEWSAPI_DAILY_QUOTA", 100))
+NEWS_RETENTION_DAYS = int(os.getenv("NEWS_RETENTION_DAYS", 30))
+NEWS_PAGE_SIZE_MAX = int(os.getenv("NEWS_PAGE_SIZE_MAX", 100))
+
+# Compressione e cache HTTP delle risposte
+HTTP_COMPRESSION_MIN_SIZE = int(os.getenv("HTTP_COMPRESSION_MIN_SIZE", 1024))  # byte
+HTTP_COMPRESSION_LEVEL = int(os.getenv("HTTP_COMPRESSION_LEVEL", 6))
+# Cache-Control max-age (secondi) per endpoint, allineato alla freschezza dei dati sottostanti.
+# Gli snapshot pre-calcolati usano invece il tempo mancante al prossimo ricalcolo;
+# gli endpoint non elencati vengono sempre rivalidati tramite ETag.
+HTTP_MAX_AGE = {
+    'stock_bp.get_stock_data': CACHE_TTLS['history'][0],
+    'stock_bp.get_top_stocks': SNAPSHOT_INTERVALS['equity'],
+    'stock_bp.get_market_overview': SNAPSHOT_INTERVALS['equity'],
+    'stock_bp.get_stocks_by_sector': CACHE_TTLS['quote'][0],
+    'stock_bp.search_stock': METADATA_MISSING_TTL,
+    'stock_bp.get_stock_batch': CACHE_TTLS['quote'][0],
+    'crypto_bp.get_crypto_data': CACHE_TTLS['coingecko_chart'][0],
+    'crypto_bp.get_top_cryptos': SNAPSHOT_INTERVALS['crypto'],
+    'crypto_bp.get_crypto_news': SNAPSHOT_INTERVALS['crypto'],
+    'crypto_bp.get_crypto_market_overview': SNAPSHOT_INTERVALS['crypto'],
+    'crypto_bp.get_cryptos_by_category': CACHE_TTLS['coingecko_markets'][0],
+    'crypto_bp.get_crypto_batch': CACHE_TTLS['coingecko_markets'][0],
+    'news_bp.get_economic_news': NEWS_POLL_INTERVAL,
+    'news_bp.get_financial_news': NEWS_POLL_INTERVAL,
+    'news_bp.get_market_news': NEWS_POLL_INTERVAL,
+    'news_bp.get_crypto_news': NEWS_POLL_INTERVAL,
+    'indicators_bp.technical_indicators': CACHE_TTLS['history'][0],
+    'indicators_bp.latest_indicators': CACHE_TTLS['quote'][0],
+    'search.search_symbol': 300,
+    'search.unified_search': 300,
+    'screener_bp.screener': CACHE_TTLS['history_daily'][0],
+}
+
+# Metriche Prometheus (/metrics)
+# Limiti (secondi) dei bucket degli istogrammi di latenza
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Intestazione Server-Timing con i tempi per fase (upstream, cache, serializzazione) di ogni risposta
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+# Modalità ASGI (asgi.py): thread del ponte verso le view sincrone (yfinance, snapshot...)
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", 64))
+# Thread dedicati alle risposte in streaming (SSE), uno per connessione aperta
+ASGI_STREAM_THREADS = int(os.getenv("ASGI_STREAM_THREADS", 256))
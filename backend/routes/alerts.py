@@ -0,0 +1,111 @@
+# routes/alerts.py
+
+from flask import Blueprint, Response, jsonify, request
+
+from services.alerts import alert_channel, alert_relay, alert_store, normalize_alert
+from utils.pubsub import broker, sse_stream
+
+alerts_bp = Blueprint('alerts_bp', __name__)
+
+
+def _client_id():
+    payload = request.get_json(silent=True) or {}
+    return request.args.get('client_id') or payload.get('client_id')
+
+
+@alerts_bp.route('/api/alerts', methods=['GET'])
+def list_alerts():
+    """
+    List the alerts registered by a client.
+
+    Query Parameters:
+        client_id: Identifier of the browser/client owning the alerts
+
+    Returns:
+        JSON with the client's alerts and its trigger history
+    """
+    client_id = _client_id()
+    if not client_id:
+        return jsonify({'error': 'client_id is required'}), 400
+    return jsonify({
+        'alerts': alert_store.list(client_id),
+        'history': alert_store.history(client_id),
+        'last_run': alert_store.last_run()
+    })
+
+
+@alerts_bp.route('/api/alerts', methods=['POST'])
+def create_alert():
+    """
+    Register a new alert evaluated by the server-side scheduler.
+
+    JSON Body:
+        client_id, symbol, asset_type ('stock'|'crypto'), condition ('above'|'below'),
+        threshold_type ('absolute'|'percent', default 'absolute'),
+        price_target (absolute) or percent [+ reference_price] (percent)
+
+    Returns:
+        JSON with the stored alert
+    """
+    client_id = _client_id()
+    if not client_id:
+        return jsonify({'error': 'client_id is required'}), 400
+    try:
+        alert = normalize_alert(client_id, request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(alert_store.add(alert)), 201
+
+
+@alerts_bp.route('/api/alerts', methods=['PUT'])
+def sync_alerts():
+    """
+    Replace all the alerts of a client (used by the frontend to sync the
+    alerts kept in localStorage).
+
+    JSON Body:
+        client_id and 'alerts', a list of alert objects as accepted by POST
+    """
+    client_id = _client_id()
+    if not client_id:
+        return jsonify({'error': 'client_id is required'}), 400
+    payload = request.get_json(silent=True) or {}
+    try:
+        alerts = [normalize_alert(client_id, item) for item in payload.get('alerts', [])]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'alerts': alert_store.replace(client_id, alerts)})
+
+
+@alerts_bp.route('/api/alerts/<string:alert_id>', methods=['DELETE'])
+def delete_alert(alert_id):
+    client_id = _client_id()
+    if not client_id:
+        return jsonify({'error': 'client_id is required'}), 400
+    if not alert_store.remove(client_id, alert_id):
+        return jsonify({'error': f'Alert not found: {alert_id}'}), 404
+    return jsonify({'deleted': alert_id})
+
+
+@alerts_bp.route('/api/alerts/stream', methods=['GET'])
+def stream_alerts():
+    """
+    Server-Sent Events stream of the alerts triggered for a client.
+
+    Query Parameters:
+        client_id: Identifier of the browser/client owning the alerts
+
+    Returns:
+        text/event-stream with one 'alert' event per triggered alert
+    """
+    client_id = _client_id()
+    if not client_id:
+        return jsonify({'error': 'client_id is required'}), 400
+    # Gli alert possono scattare nel processo leader: questo processo li legge dal database
+    alert_relay.start()
+    channel = alert_channel(client_id)
+    subscriber = broker.subscribe(channel)
+    response = Response(sse_stream(broker, channel, subscriber), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(lambda: broker.unsubscribe(channel, subscriber))
+    return response
@@ -1,7 +1,15 @@
+import asyncio
+
 from flask import Blueprint, jsonify, request
-import requests
 from datetime import datetime, timedelta
-from config import COINGECKO_API_KEY
+from config import COINGECKO_API_KEY, COIN_INDEX_FILE, COIN_INDEX_MAX_AGE
+from services.coin_index import CoinIndex, CoinIndexUnavailable
+from services.snapshots import snapshots
+from utils.cache import cache
+from utils.fanout import executor
+from utils.http_client import async_client, coingecko_client
+from utils.resample import lttb_series, resample_ohlcv
+from utils.serialization import INTRADAY_TIMESTAMP_FORMAT, column_to_list, frame_to_records
 
 crypto_bp = Blueprint('crypto_bp', __name__)
 
@@ -9,30 +17,316 @@ crypto_bp = Blueprint('crypto_bp', __name__)
 COINGECKO_API_BASE = "https://api.coingecko.com/api/v3"
 COINGECKO_PRO_API_BASE = "https://api.coingecko.com/api/v3"
 
+# Punti massimi del grafico storico per /api/crypto_data
+CHART_POINTS = 300
+MAX_CHART_POINTS = 1000
+
+def _coingecko_data_class(endpoint):
+    """
+    Maps a CoinGecko endpoint to its cache TTL class in config.CACHE_TTLS.
+    """
+    if endpoint.startswith('search/trending'):
+        return 'coingecko_trending'
+    if endpoint.startswith('search'):
+        return 'coingecko_search'
+    if endpoint.startswith('coins/list'):
+        return 'coingecko_list'
+    if endpoint.startswith('coins/markets'):
+        return 'coingecko_markets'
+    if endpoint.endswith('/market_chart'):
+        return 'coingecko_chart'
+    if endpoint.startswith('global'):
+        return 'coingecko_global'
+    return 'coingecko_coin'
+
+def _coingecko_operation(endpoint):
+    """Metrics label of a CoinGecko call (its cache class without the prefix)."""
+    return _coingecko_data_class(endpoint).replace('coingecko_', '', 1)
+
+def _coingecko_url(endpoint, params=None):
+    if COINGECKO_API_KEY:
+        url = f"{COINGECKO_PRO_API_BASE}/{endpoint}"
+        params = dict(params or {})
+        params['x_cg_demo_api_key'] = COINGECKO_API_KEY
+    else:
+        url = f"{COINGECKO_API_BASE}/{endpoint}"
+        print(f"Using public API: {url}")
+    return url, params
+
+class CoinGeckoResponse:
+    """
+    Status and parsed body of a CoinGecko call: what the cache keeps instead
+    of the requests/httpx response object, sized by the body length.
+    """
+
+    __slots__ = ('status_code', 'data', 'text', 'cache_size')
+
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.data = response.json() if response.status_code == 200 else None
+        # Il testo serve solo per i log degli errori, che non vengono messi in cache
+        self.text = '' if response.status_code == 200 else response.text[:500]
+        self.cache_size = len(response.content)
+
+    def json(self):
+        return self.data
+
+def _fetch_coingecko(endpoint, params=None):
+    url, params = _coingecko_url(endpoint, params)
+    return CoinGeckoResponse(coingecko_client.get(url, params=params, operation=_coingecko_operation(endpoint)))
+
+def _coingecko_key(endpoint, params):
+    return (endpoint, tuple(sorted((str(k), str(v)) for k, v in (params or {}).items())))
+
+def _is_ok_response(response):
+    return response.status_code == 200
+
 def make_coingecko_request(endpoint, params=None):
     """
     Makes a request to the CoinGecko API using the API key if available.
+    Successful responses are cached with the TTL of the endpoint's data class.
     
     Args:
         endpoint: API endpoint to call
         params: Optional query parameters
         
     Returns:
-        Response from the API
+        CoinGeckoResponse (status_code, json(), text) with the parsed body
     """
-    if COINGECKO_API_KEY:
-        url = f"{COINGECKO_PRO_API_BASE}/{endpoint}"
-        if params is None:
-            params = {}
-        params['x_cg_demo_api_key'] = COINGECKO_API_KEY
-        response = requests.get(url, params=params)
-        print(response.url)
+    return cache.get_or_load(_coingecko_data_class(endpoint), _coingecko_key(endpoint, params),
+                             lambda: _fetch_coingecko(endpoint, params), should_cache=_is_ok_response)
+
+async def make_coingecko_request_async(endpoint, params=None):
+    """make_coingecko_request() on the async CoinGecko client (same cache entries)."""
+    async def load():
+        url, query = _coingecko_url(endpoint, params)
+        return CoinGeckoResponse(await async_client(coingecko_client).get(url, params=query,
+                                                                          operation=_coingecko_operation(endpoint)))
+
+    return await cache.aget_or_load(_coingecko_data_class(endpoint), _coingecko_key(endpoint, params), load,
+                                    should_cache=_is_ok_response)
+
+# Indice locale simbolo -> id, così la risoluzione non passa dall'endpoint search
+coin_index = CoinIndex(COIN_INDEX_FILE, make_coingecko_request, COIN_INDEX_MAX_AGE)
+
+def resolve_coin_ids(symbols):
+    """
+    Resolves ticker-like symbols (e.g. 'btc', 'ETHUSDT') to CoinGecko coin ids
+    using the local coin index (no upstream call once the index is built).
+    
+    Args:
+        symbols: Iterable of cryptocurrency symbols
+        
+    Returns:
+        Dict mapping the upper-case symbol to {'id': coin_id, 'name': coin_name};
+        symbols that cannot be resolved are omitted
+    """
+    search_results = {}
+    for symbol in symbols:
+        coin = coin_index.lookup(symbol)
+        if coin:
+            search_results[symbol.upper()] = {
+                'id': coin['id'],
+                'name': coin['name']
+            }
+        else:
+            print(f"No coins found for symbol: {symbol}")
+    return search_results
+
+def _index_unavailable(error):
+    """503 for requests that need the coin index while it cannot be built."""
+    print(f"Error resolving crypto symbols: {error}")
+    response = jsonify({"error": str(error)})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+def _markets_params(ids):
+    return {
+        "vs_currency": "usd",
+        "ids": ",".join(ids),
+        "order": "market_cap_desc",
+        "per_page": 100,
+        "page": 1
+    }
+
+def fetch_coin_markets(ids):
+    """
+    Fetches market data for a list of CoinGecko ids with a single request.
+    
+    Args:
+        ids: List of CoinGecko coin ids (at most 100)
+        
+    Returns:
+        Response from the coins/markets endpoint
+    """
+    return make_coingecko_request("coins/markets", _markets_params(ids))
+
+async def fetch_coin_markets_async(ids):
+    """fetch_coin_markets() on the async CoinGecko client (same cache entry)."""
+    return await make_coingecko_request_async("coins/markets", _markets_params(ids))
+
+def _trim_coin_details(coin_data):
+    """
+    Keeps only the fields of a coins/{id} payload shown on the detail page
+    (the full body carries descriptions, links and market data in dozens of
+    currencies that would otherwise sit in the cache).
+    """
+    market_data = coin_data.get('market_data') or {}
+    links = coin_data.get('links') or {}
+    return {
+        'name': coin_data.get('name'),
+        'symbol': coin_data.get('symbol'),
+        'image': (coin_data.get('image') or {}).get('large', ''),
+        'market_cap_rank': coin_data.get('market_cap_rank'),
+        'current_price': (market_data.get('current_price') or {}).get('usd'),
+        'market_cap': (market_data.get('market_cap') or {}).get('usd'),
+        'total_volume': (market_data.get('total_volume') or {}).get('usd'),
+        'high_24h': (market_data.get('high_24h') or {}).get('usd'),
+        'low_24h': (market_data.get('low_24h') or {}).get('usd'),
+        'price_change_percentage_24h': market_data.get('price_change_percentage_24h'),
+        'price_change_percentage_7d': market_data.get('price_change_percentage_7d'),
+        'circulating_supply': market_data.get('circulating_supply'),
+        'max_supply': market_data.get('max_supply'),
+        'description': (coin_data.get('description') or {}).get('en', ''),
+        'links': {
+            'homepage': (links.get('homepage') or [''])[0],
+            'twitter_screen_name': links.get('twitter_screen_name', ''),
+            'facebook_username': links.get('facebook_username', ''),
+            'telegram_channel_identifier': links.get('telegram_channel_identifier', '')
+        }
+    }
+
+def _trim_coin_chart(chart_data):
+    return {'prices': chart_data.get('prices') or [],
+            'total_volumes': chart_data.get('total_volumes') or []}
+
+def _coin_details_call(coin_id):
+    """(cache class, cache key, endpoint, params, trim) of a coin's detail record."""
+    return 'coingecko_coin', ('details', coin_id), f"coins/{coin_id}", {
+        "localization": "false",
+        "tickers": "false",
+        "community_data": "false",
+        "developer_data": "false",
+        "sparkline": "false"
+    }, _trim_coin_details
+
+def _coin_chart_call(coin_id, days):
+    """(cache class, cache key, endpoint, params, trim) of a coin's chart ticks."""
+    return ('coingecko_chart', ('ticks', coin_id, days), f"coins/{coin_id}/market_chart",
+            {"vs_currency": "usd", "days": days}, _trim_coin_chart)
+
+def _is_ok(result):
+    return result[0] == 200
+
+def _load_trimmed(endpoint, params, trim):
+    response = _fetch_coingecko(endpoint, params)
+    if response.status_code != 200:
+        return response.status_code, None
+    return 200, trim(response.json())
+
+async def _load_trimmed_async(endpoint, params, trim):
+    url, params = _coingecko_url(endpoint, params)
+    response = await async_client(coingecko_client).get(url, params=params,
+                                                        operation=_coingecko_operation(endpoint))
+    if response.status_code != 200:
+        return response.status_code, None
+    return 200, trim(response.json())
+
+def _cached_trimmed(call):
+    data_class, key, endpoint, params, trim = call
+    return cache.get_or_load(data_class, key, lambda: _load_trimmed(endpoint, params, trim), should_cache=_is_ok)
+
+async def _cached_trimmed_async(call):
+    data_class, key, endpoint, params, trim = call
+    return await cache.aget_or_load(data_class, key, lambda: _load_trimmed_async(endpoint, params, trim),
+                                    should_cache=_is_ok)
+
+def fetch_coin_details(coin_id):
+    """
+    Fetches the trimmed detail record of a coin, cached on its own (slow) TTL.
+    
+    Returns:
+        Tuple (status_code, details); details is None unless status_code is 200
+    """
+    return _cached_trimmed(_coin_details_call(coin_id))
+
+def fetch_coin_chart(coin_id, days):
+    """
+    Fetches the raw price/volume ticks of a coin for a days bucket, cached per
+    (coin, days) on the chart TTL; market caps are dropped.
+    
+    Returns:
+        Tuple (status_code, {'prices': [...], 'total_volumes': [...]}); the
+        payload is None unless status_code is 200
+    """
+    return _cached_trimmed(_coin_chart_call(coin_id, days))
+
+async def fetch_coin_details_async(coin_id):
+    """fetch_coin_details() on the async CoinGecko client (same cache entries)."""
+    return await _cached_trimmed_async(_coin_details_call(coin_id))
+
+async def fetch_coin_chart_async(coin_id, days):
+    """fetch_coin_chart() on the async CoinGecko client (same cache entries)."""
+    return await _cached_trimmed_async(_coin_chart_call(coin_id, days))
+
+CHART_DAYS = {
+    '1d': 1, 
+    '5d': 5, 
+    '1mo': 30, 
+    '3mo': 90, 
+    '6mo': 180, 
+    '1y': 365, 
+    '5y': 1825
+}
+
+def _crypto_data_params(args):
+    """
+    Parses the query string of /api/crypto_data.
+    
+    Returns:
+        Tuple (days, points, downsample)
+        
+    Raises:
+        ValueError: if downsample is not 'ohlc' or 'lttb'
+    """
+    period = args.get('period', default='1d', type=str)
+    points = min(max(args.get('points', default=CHART_POINTS, type=int), 3), MAX_CHART_POINTS)
+    downsample = args.get('downsample', default='ohlc', type=str).lower()
+    if downsample not in ('ohlc', 'lttb'):
+        raise ValueError("downsample must be 'ohlc' or 'lttb'")
+    return CHART_DAYS.get(period, 1), points, downsample
+
+def _crypto_data_response(symbol, chart, details, points, downsample):
+    """Builds the /api/crypto_data response from the fetched chart and details."""
+    chart_status, chart_data = chart
+    if chart_status != 200:
+        return jsonify({"error": f"Failed to fetch market data: {chart_status}"}), chart_status
+    details_status, details = details
+    if details_status != 200:
+        return jsonify({"error": f"Failed to fetch coin details: {details_status}"}), details_status
+    
+    prices = chart_data['prices']
+    volumes = chart_data['total_volumes']
+
+    # Candele OHLC reali per bucket, oppure linea LTTB per i grafici a linea
+    if downsample == 'lttb':
+        line = lttb_series(prices, volumes, points)
+        timestamps = line.index.strftime(INTRADAY_TIMESTAMP_FORMAT).tolist()
+        closes = column_to_list(line['Close'])
+        line_volumes = column_to_list(line['Volume'])
+        historical_data = [
+            {'timestamp': timestamp, 'close': close, 'volume': volume}
+            for timestamp, close, volume in zip(timestamps, closes, line_volumes)
+        ]
     else:
-        url = f"{COINGECKO_API_BASE}/{endpoint}"
-        response = requests.get(url, params=params)
-        print(f"Using public API: {url}")
+        candles = resample_ohlcv(prices, volumes, points)
+        historical_data = frame_to_records(candles, INTRADAY_TIMESTAMP_FORMAT)
+
+    crypto = dict(details)
+    crypto['name'] = crypto['name'] or symbol
+    crypto['symbol'] = (crypto['symbol'] or symbol).upper()
     
-    return response
+    return jsonify({'historical_data': historical_data, 'crypto': crypto})
 
 @crypto_bp.route('/api/crypto_data/<string:symbol>', methods=['GET'])
 def get_crypto_data(symbol):
@@ -44,120 +338,72 @@ def get_crypto_data(symbol):
         
     Query Parameters:
         period: Time period for historical data (default: '1d')
+        points: Maximum number of chart points (default: 300, max: 1000)
+        downsample: 'ohlc' (default) aggregates the raw ticks into true OHLCV
+                    candles; 'lttb' keeps the most significant price points
+                    for line charts (timestamp, close and volume only)
         
     Returns:
         JSON with cryptocurrency data and historical price chart data
     """
-    period = request.args.get('period', default='1d', type=str)
-    
-    coingecko_symbol = symbol.lower().replace('usdt', '')
-    
-    days_map = {
-        '1d': 1, 
-        '5d': 5, 
-        '1mo': 30, 
-        '3mo': 90, 
-        '6mo': 180, 
-        '1y': 365, 
-        '5y': 1825
-    }
-    days = days_map.get(period, 1)
-    
-    crypto_data = {}
+    try:
+        days, points, downsample = _crypto_data_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     try:
-        search_response = make_coingecko_request(f"search", {"query": coingecko_symbol})
-        print(search_response)
-        
-        if search_response.status_code != 200 or not search_response.json().get('coins'):
-            return jsonify({"error": f"Symbol not found: {symbol}"}), 404
-        
-        coins = search_response.json().get('coins', [])
-        if not coins:
+        coin = coin_index.lookup(symbol)
+        if not coin:
             return jsonify({"error": f"Symbol not found: {symbol}"}), 404
             
-        coin_id = coins[0]['id']
-        
-        chart_response = make_coingecko_request(f"coins/{coin_id}/market_chart", {"vs_currency": "usd", "days": days})
+        coin_id = coin['id']
         
-        if (chart_response.status_code != 200):
-            return jsonify({"error": f"Failed to fetch market data: {chart_response.status_code}"}), chart_response.status_code
-        
-        chart_data = chart_response.json()
-        
-        prices = chart_data.get('prices', [])
-        volumes = chart_data.get('total_volumes', [])
+        # Grafico e dettagli in parallelo: un solo round trip upstream nel caso comune
+        fetched, errors = executor.fetch_all('coingecko', {
+            'chart': lambda: fetch_coin_chart(coin_id, days),
+            'details': lambda: fetch_coin_details(coin_id),
+        })
+        if errors:
+            raise next(iter(errors.values()))
         
-        data_points = min(300, len(prices))
-        step = max(1, len(prices) // data_points)
+        return _crypto_data_response(symbol, fetched['chart'], fetched['details'], points, downsample)
         
-        historical_data = []
-        for i in range(0, len(prices), step):
-            timestamp, price = prices[i]
-            volume = volumes[i][1] if i < len(volumes) else 0
-            
-            high = price
-            low = price
+    except CoinIndexUnavailable as e:
+        return _index_unavailable(e)
+    except Exception as e:
+        print(f"Error fetching crypto data: {e}")
+        return jsonify({"error": str(e)}), 500
+
+async def get_crypto_data_async(symbol):
+    """
+    get_crypto_data() for the ASGI serving mode (see asgi.py): the CoinGecko
+    calls run on the async client, so a request waiting on the upstream
+    holds no thread; coin lookup and chart resampling run in a worker thread.
+    """
+    try:
+        days, points, downsample = _crypto_data_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        coin = await asyncio.to_thread(coin_index.lookup, symbol)
+        if not coin:
+            return jsonify({"error": f"Symbol not found: {symbol}"}), 404
             
-            if i > 0:
-                open_price = prices[i-1][1]
-            else:
-                open_price = price
-                
-            historical_data.append({
-                'timestamp': datetime.fromtimestamp(timestamp/1000).strftime('%Y-%m-%d %H:%M:%S'),
-                'open': open_price,
-                'high': high,
-                'low': low,
-                'close': price,
-                'volume': volume
-            })
-        
-        crypto_data['historical_data'] = historical_data
+        coin_id = coin['id']
+        chart, details = await asyncio.gather(fetch_coin_chart_async(coin_id, days),
+                                              fetch_coin_details_async(coin_id))
         
-        coin_response = make_coingecko_request(f"coins/{coin_id}", {
-            "localization": "false", 
-            "tickers": "false", 
-            "community_data": "false", 
-            "developer_data": "false"
-        })
-        
-        if coin_response.status_code != 200:
-            return jsonify({"error": f"Failed to fetch coin details: {coin_response.status_code}"}), coin_response.status_code
-        
-        coin_data = coin_response.json()
-        market_data = coin_data.get('market_data', {})
-        
-        crypto_data['crypto'] = {
-            'name': coin_data.get('name', symbol),
-            'symbol': coin_data.get('symbol', symbol).upper(),
-            'image': coin_data.get('image', {}).get('large', ''),
-            'market_cap_rank': coin_data.get('market_cap_rank'),
-            'current_price': market_data.get('current_price', {}).get('usd'),
-            'market_cap': market_data.get('market_cap', {}).get('usd'),
-            'total_volume': market_data.get('total_volume', {}).get('usd'),
-            'high_24h': market_data.get('high_24h', {}).get('usd'),
-            'low_24h': market_data.get('low_24h', {}).get('usd'),
-            'price_change_percentage_24h': market_data.get('price_change_percentage_24h'),
-            'price_change_percentage_7d': market_data.get('price_change_percentage_7d'),
-            'circulating_supply': market_data.get('circulating_supply'),
-            'max_supply': market_data.get('max_supply'),
-            'description': coin_data.get('description', {}).get('en', ''),
-            'links': {
-                'homepage': coin_data.get('links', {}).get('homepage', [''])[0],
-                'twitter_screen_name': coin_data.get('links', {}).get('twitter_screen_name', ''),
-                'facebook_username': coin_data.get('links', {}).get('facebook_username', ''),
-                'telegram_channel_identifier': coin_data.get('links', {}).get('telegram_channel_identifier', '')
-            }
-        }
-        
-        return jsonify(crypto_data)
+        return await asyncio.to_thread(_crypto_data_response, symbol, chart, details, points, downsample)
         
+    except CoinIndexUnavailable as e:
+        return _index_unavailable(e)
     except Exception as e:
         print(f"Error fetching crypto data: {e}")
         return jsonify({"error": str(e)}), 500
 
 @crypto_bp.route('/api/top_cryptos', methods=['GET'])
+@snapshots.materialize('top_cryptos', schedule='crypto')
 def get_top_cryptos():
     """
     Get data for top cryptocurrencies by market capitalization.
@@ -193,6 +439,7 @@ def get_top_cryptos():
         return jsonify({"error": str(e)}), 500
 
 @crypto_bp.route('/api/crypto_news', methods=['GET'])
+@snapshots.materialize('crypto_trending', schedule='crypto')
 def get_crypto_news():
     """
     Get trending cryptocurrency news based on trending coins.
@@ -228,6 +475,7 @@ def get_crypto_news():
         return jsonify({"error": str(e), "news": []}), 500
 
 @crypto_bp.route('/api/crypto_market_overview', methods=['GET'])
+@snapshots.materialize('crypto_market_overview', schedule='crypto')
 def get_crypto_market_overview():
     """
     Provide a comprehensive cryptocurrency market overview.
@@ -337,6 +585,38 @@ def get_crypto_market_overview():
         print(f"Error fetching crypto market overview: {e}")
         return jsonify({"error": str(e)}), 500
     
+CATEGORY_IDS = {
+    'defi': 'decentralized-finance-defi',
+    'layer-1': 'layer-1',
+    'gaming': 'gaming',
+    'nft': 'non-fungible-tokens-nft',
+    'stablecoins': 'stablecoins',
+    'dex': 'decentralized-exchange'
+}
+
+def _category_params(category):
+    params = {"vs_currency": "usd", "order": "market_cap_desc", "per_page": 20, "page": 1}
+    if (category and category.lower() != 'all'):
+        params["category"] = CATEGORY_IDS.get(category.lower(), category.lower())
+    return params
+
+def _category_response(response):
+    if response.status_code != 200:
+        return jsonify({"error": f"Failed to fetch cryptocurrency data: {response.status_code}"}), 500
+        
+    category_coins = {}
+    for coin in response.json():
+        symbol = coin['symbol'].upper()
+        category_coins[symbol] = {
+            'name': coin['name'],
+            'price': coin['current_price'],
+            'change_percent': coin['price_change_percentage_24h'],
+            'market_cap': coin['market_cap'],
+            'image': coin['image']
+        }
+    
+    return jsonify({'coins': category_coins})
+
 @crypto_bp.route('/api/cryptos_by_category', methods=['GET'])
 def get_cryptos_by_category():
     """
@@ -351,45 +631,78 @@ def get_cryptos_by_category():
     category = request.args.get('category', default='', type=str)
     
     try:
-        if (category and category.lower() != 'all'):
-            category_map = {
-                'defi': 'decentralized-finance-defi',
-                'layer-1': 'layer-1',
-                'gaming': 'gaming',
-                'nft': 'non-fungible-tokens-nft',
-                'stablecoins': 'stablecoins',
-                'dex': 'decentralized-exchange'
-            }
-            
-            category_id = category_map.get(category.lower(), category.lower())
-            url = f"{COINGECKO_API_BASE}/coins/markets?vs_currency=usd&category={category_id}&order=market_cap_desc&per_page=20&page=1"
-        else:
-            url = f"{COINGECKO_API_BASE}/coins/markets?vs_currency=usd&order=market_cap_desc&per_page=20&page=1"
-            
-        response = requests.get(url)
+        response = make_coingecko_request("coins/markets", _category_params(category))
+        return _category_response(response)
         
-        if response.status_code != 200:
-            return jsonify({"error": f"Failed to fetch cryptocurrency data: {response.status_code}"}), 500
-            
-        data = response.json()
-        category_coins = {}
-        
-        for coin in data:
-            symbol = coin['symbol'].upper()
-            category_coins[symbol] = {
-                'name': coin['name'],
-                'price': coin['current_price'],
-                'change_percent': coin['price_change_percentage_24h'],
-                'market_cap': coin['market_cap'],
-                'image': coin['image']
-            }
-        
-        return jsonify({'coins': category_coins})
+    except Exception as e:
+        print(f"Error fetching cryptos by category: {e}")
+        return jsonify({"error": str(e), "coins": {}}), 500
+
+async def get_cryptos_by_category_async():
+    """get_cryptos_by_category() for the ASGI serving mode, on the async CoinGecko client."""
+    category = request.args.get('category', default='', type=str)
+    
+    try:
+        response = await make_coingecko_request_async("coins/markets", _category_params(category))
+        return _category_response(response)
         
     except Exception as e:
         print(f"Error fetching cryptos by category: {e}")
         return jsonify({"error": str(e), "coins": {}}), 500
 
+def _placeholder_coin(symbol, name):
+    return {
+        'symbol': symbol,
+        'current_price': 0,
+        'price_change_24h': 0,
+        'price_change_percentage_24h': 0,
+        'name': name
+    }
+
+def _crypto_batch_response(symbol_list, search_results, response):
+    """
+    Builds the /api/crypto_batch response from the resolved symbols and the
+    coins/markets response (None when no symbol could be resolved).
+    """
+    result = {}
+    if search_results:
+        if response.status_code != 200:
+            print(f"Markets API returned status code: {response.status_code}")
+            print(f"Response content: {response.text[:200]}...")
+            return jsonify({'error': f'Failed to fetch crypto data: {response.status_code}'}), 500
+            
+        coins_data = response.json()
+        print(f"Got data for {len(coins_data)} coins")
+        
+        id_to_symbol = {info['id']: symbol for symbol, info in search_results.items()}
+        
+        for coin in coins_data:
+            coin_id = coin.get('id')
+            if coin_id in id_to_symbol:
+                symbol = id_to_symbol[coin_id]
+                result[symbol] = {
+                    'symbol': symbol,
+                    'current_price': coin.get('current_price'),
+                    'price_change_24h': coin.get('price_change_24h'),
+                    'price_change_percentage_24h': coin.get('price_change_percentage_24h'),
+                    'name': coin.get('name')
+                }
+    else:
+        print("No valid search results found for any symbols")
+    
+    for symbol in symbol_list:
+        upper_symbol = symbol.upper()
+        if upper_symbol not in result:
+            result[upper_symbol] = _placeholder_coin(upper_symbol, f"Unknown ({upper_symbol})")
+    
+    print("Returning result:", result)
+    return jsonify(result)
+
+def _crypto_batch_error(symbol_list, error):
+    print(f"Error fetching crypto batch data: {error}")
+    result = {symbol.upper(): _placeholder_coin(symbol.upper(), f"Error: {symbol.upper()}") for symbol in symbol_list}
+    return jsonify(result)
+
 @crypto_bp.route('/api/crypto_batch', methods=['GET'])
 def get_crypto_batch():
     """
@@ -406,95 +719,34 @@ def get_crypto_batch():
         return jsonify({'error': 'No symbols provided'}), 400
     
     symbol_list = symbols.split(',')
-    result = {}
     
     try:
-        search_results = {}
-        for symbol in symbol_list:
-            clean_symbol = symbol.lower().replace('usdt', '')
-            
-            search_response = make_coingecko_request("search", {"query": clean_symbol})
-            
-            if search_response.status_code == 200:
-                data = search_response.json()
-                coins = data.get('coins', [])
-                if coins:
-                    search_results[symbol.upper()] = {
-                        'id': coins[0]['id'],
-                        'name': coins[0]['name']
-                    }
-                    print(f"Found ID for {symbol}: {coins[0]['id']}")
-                else:
-                    print(f"No coins found for symbol: {symbol}")
-            else:
-                print(f"Search API returned status code {search_response.status_code} for {symbol}")
-        
-        if search_results:
-            ids = [info['id'] for info in search_results.values()]
-            
-            response = make_coingecko_request("coins/markets", {
-                "vs_currency": "usd",
-                "ids": ",".join(ids),
-                "order": "market_cap_desc",
-                "per_page": 100,
-                "page": 1
-            })
-            
-            if response.status_code != 200:
-                print(f"Markets API returned status code: {response.status_code}")
-                print(f"Response content: {response.text[:200]}...")
-                return jsonify({'error': f'Failed to fetch crypto data: {response.status_code}'}), 500
-                
-            coins_data = response.json()
-            print(f"Got data for {len(coins_data)} coins")
-            
-            id_to_symbol = {info['id']: symbol for symbol, info in search_results.items()}
-            
-            for coin in coins_data:
-                coin_id = coin.get('id')
-                if coin_id in id_to_symbol:
-                    symbol = id_to_symbol[coin_id]
-                    result[symbol] = {
-                        'symbol': symbol,
-                        'current_price': coin.get('current_price'),
-                        'price_change_24h': coin.get('price_change_24h'),
-                        'price_change_percentage_24h': coin.get('price_change_percentage_24h'),
-                        'name': coin.get('name')
-                    }
-            
-            for symbol in symbol_list:
-                upper_symbol = symbol.upper()
-                if upper_symbol not in result:
-                    result[upper_symbol] = {
-                        'symbol': upper_symbol,
-                        'current_price': 0,
-                        'price_change_24h': 0,
-                        'price_change_percentage_24h': 0,
-                        'name': f"Unknown ({upper_symbol})"
-                    }
-        else:
-            print("No valid search results found for any symbols")
-            for symbol in symbol_list:
-                upper_symbol = symbol.upper()
-                result[upper_symbol] = {
-                    'symbol': upper_symbol,
-                    'current_price': 0,
-                    'price_change_24h': 0,
-                    'price_change_percentage_24h': 0,
-                    'name': f"Unknown ({upper_symbol})"
-                }
+        search_results = resolve_coin_ids(symbol_list)
+        response = fetch_coin_markets([info['id'] for info in search_results.values()]) if search_results else None
+        return _crypto_batch_response(symbol_list, search_results, response)
+    except CoinIndexUnavailable as e:
+        return _index_unavailable(e)
     except Exception as e:
-        print(f"Error fetching crypto batch data: {e}")
-        for symbol in symbol_list:
-            upper_symbol = symbol.upper()
-            if upper_symbol not in result:
-                result[upper_symbol] = {
-                    'symbol': upper_symbol,
-                    'current_price': 0,
-                    'price_change_24h': 0,
-                    'price_change_percentage_24h': 0,
-                    'name': f"Error: {upper_symbol}"
-                }
+        return _crypto_batch_error(symbol_list, e)
+
+async def get_crypto_batch_async():
+    """
+    get_crypto_batch() for the ASGI serving mode: the coins/markets call
+    runs on the async client; symbol resolution (local index) in a thread.
+    """
+    symbols = request.args.get('symbols', '')
+    if not symbols:
+        return jsonify({'error': 'No symbols provided'}), 400
     
-    print("Returning result:", result)
-    return jsonify(result)
\ No newline at end of file
+    symbol_list = symbols.split(',')
+    
+    try:
+        search_results = await asyncio.to_thread(resolve_coin_ids, symbol_list)
+        response = None
+        if search_results:
+            response = await fetch_coin_markets_async([info['id'] for info in search_results.values()])
+        return _crypto_batch_response(symbol_list, search_results, response)
+    except CoinIndexUnavailable as e:
+        return _index_unavailable(e)
+    except Exception as e:
+        return _crypto_batch_error(symbol_list, e)
@@ -1,153 +1,146 @@
 # routes/indicators.py
 
 from flask import Blueprint, jsonify, request
-import pandas_ta as ta
-import pandas as pd
-import yfinance as yf
-from datetime import datetime, timedelta
+import numpy as np
+from services.timeseries_store import timeseries_store
+from services.incremental import incremental_indicators
+from services.indicator_engine import (
+    CLOSE, ohlcv_buffer, parse_indicators, compute_indicators, evaluate_signals, signal_list, history_period
+)
+from services.quotes import fetch_stock_quotes
+from utils.serialization import column_to_list, json_response, DAILY_TIMESTAMP_FORMAT
 
 indicators_bp = Blueprint('indicators_bp', __name__)
 
+# Set calcolato quando il client non specifica ?indicators= (risposta storica)
+DEFAULT_INDICATORS = 'rsi:14,sma:50,ema:20,vwap:20,trend:5:10'
+# Chiavi della risposta storica -> colonne del motore
+LEGACY_VALUES = {'RSI': 'RSI_14', 'SMA_50': 'SMA_50', 'EMA_20': 'EMA_20', 'VWAP': 'VWAP_20'}
+LEGACY_HISTORY = {'rsi': 'RSI_14', 'sma50': 'SMA_50', 'ema20': 'EMA_20'}
+CHART_POINTS = 30
+
+
+def _last_value(series, digits):
+    value = series[-1]
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def _ratio(numerator, denominator):
+    if numerator is None or not denominator:
+        return np.array([np.nan])
+    return np.array([numerator / denominator])
+
+
 @indicators_bp.route('/api/technical_indicators/<symbol>', methods=['GET'])
 def technical_indicators(symbol):
+    """
+    Technical indicators and signals for a symbol.
+
+    Query Parameters:
+        indicators: Optional comma-separated list of indicators with positional
+                    lengths, e.g. 'rsi:14,macd:12:26:9,bbands:20:2.5'. Without
+                    it the default set (RSI, SMA 50, EMA 20, VWAP, trend) is
+                    returned in the original shape, with the last 30 points
+                    under 'historical'.
+
+    Returns:
+        JSON with the last value of every indicator, the triggered signals and,
+        when 'indicators' is given, the full series in columnar form
+    """
+    custom = request.args.get('indicators')
+    try:
+        requests = parse_indicators(custom if custom else DEFAULT_INDICATORS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     try:
-        # Get historical price data using yfinance instead of alpha_vantage
-        ticker = yf.Ticker(symbol)
-        df = ticker.history(period="60d")  # Get 60 days of data for technical indicators
-        
+        df = timeseries_store.history(symbol, history_period(requests, CHART_POINTS))
+
         if len(df) < 30:
             return jsonify({'error': 'Not enough data for calculation'}), 400
 
-        # Rename columns to match expected format for pandas_ta
-        df = df.rename(columns={
-            'Open': 'open',
-            'High': 'high',
-            'Low': 'low',
-            'Close': 'close',
-            'Volume': 'volume'
-        })
-        
-        # Calculate RSI (14-period)
-        rsi = ta.rsi(df['close'], length=14)
-        
-        # Calculate SMA (50-period)
-        sma = ta.sma(df['close'], length=50)
-        
-        # Calculate EMA (20-period)
-        ema = ta.ema(df['close'], length=20)
-        
-        # Calculate VWAP if volume is available
-        vwap = None
-        if 'volume' in df.columns:
-            #calculate a rolling VWAP over the last 20 days
-            df['vwap'] = (df['close'] * df['volume']).rolling(window=20).sum() / df['volume'].rolling(window=20).sum()
-            vwap = df['vwap'].iloc[-1]
-        
-        # Get the most recent price
-        current_price = df['close'].iloc[-1]
-        
-        # Format the result
+        # Un solo passaggio vettoriale su un buffer OHLCV condiviso
+        buffer, index = ohlcv_buffer(df)
+        columns, features = compute_indicators(buffer, requests)
+        rule_rows, matches = evaluate_signals(requests, features)
+        close = buffer[CLOSE]
+
         result = {
             'symbol': symbol.upper(),
-            'current_price': current_price,
-            'indicators': {
-                'RSI': round(float(rsi.iloc[-1]), 2) if not pd.isna(rsi.iloc[-1]) else None,
-                'SMA_50': round(float(sma.iloc[-1]), 2) if not pd.isna(sma.iloc[-1]) else None,
-                'EMA_20': round(float(ema.iloc[-1]), 2) if not pd.isna(ema.iloc[-1]) else None,
-                'VWAP': round(float(vwap), 2) if vwap is not None and not pd.isna(vwap) else None
-            }
+            'current_price': float(close[-1]),
+            'signals': signal_list(rule_rows, matches)
         }
-        
-        # Add simple signals based on indicators
-        signals = []
-        
-        # RSI signals
-        if result['indicators']['RSI'] is not None:
-            rsi_value = result['indicators']['RSI'] 
-            if rsi_value < 30:
-                signals.append({"indicator": "RSI", "signal": "Oversold", "strength": "Strong"})
-            elif rsi_value < 40:
-                signals.append({"indicator": "RSI", "signal": "Oversold", "strength": "Moderate"})
-            elif rsi_value > 70:
-                signals.append({"indicator": "RSI", "signal": "Overbought", "strength": "Strong"})
-            elif rsi_value > 60:
-                signals.append({"indicator": "RSI", "signal": "Overbought", "strength": "Moderate"})
-        
-        # Price vs SMA signal
-        if result['indicators']['SMA_50'] is not None:
-            sma_value = result['indicators']['SMA_50']
-            price_to_sma_ratio = current_price / sma_value
-            if price_to_sma_ratio > 1.05:
-                signals.append({"indicator": "SMA_50", "signal": "Above", "strength": "Strong"})
-            elif price_to_sma_ratio > 1:
-                signals.append({"indicator": "SMA_50", "signal": "Above", "strength": "Moderate"})
-            elif price_to_sma_ratio < 0.95:
-                signals.append({"indicator": "SMA_50", "signal": "Below", "strength": "Strong"})
-            elif price_to_sma_ratio < 1:
-                signals.append({"indicator": "SMA_50", "signal": "Below", "strength": "Moderate"})
-        
-        # Price vs EMA signal
-        if result['indicators']['EMA_20'] is not None:
-            ema_value = result['indicators']['EMA_20']
-            price_to_ema_ratio = current_price / ema_value
-            if price_to_ema_ratio > 1.03:
-                signals.append({"indicator": "EMA_20", "signal": "Above", "strength": "Strong"})
-            elif price_to_ema_ratio > 1:
-                signals.append({"indicator": "EMA_20", "signal": "Above", "strength": "Moderate"})
-            elif price_to_ema_ratio < 0.97:
-                signals.append({"indicator": "EMA_20", "signal": "Below", "strength": "Strong"})
-            elif price_to_ema_ratio < 1:
-                signals.append({"indicator": "EMA_20", "signal": "Below", "strength": "Moderate"})
-        
-        # Add VWAP signal
-        if result['indicators']['VWAP'] is not None:
-            vwap_value = result['indicators']['VWAP']
-            price_to_vwap_ratio = current_price / vwap_value
-            if price_to_vwap_ratio > 1.02:
-                signals.append({"indicator": "VWAP", "signal": "Above", "strength": "Strong"})
-            elif price_to_vwap_ratio > 1:
-                signals.append({"indicator": "VWAP", "signal": "Above", "strength": "Moderate"})
-            elif price_to_vwap_ratio < 0.98:
-                signals.append({"indicator": "VWAP", "signal": "Below", "strength": "Strong"})
-            elif price_to_vwap_ratio < 1:
-                signals.append({"indicator": "VWAP", "signal": "Below", "strength": "Moderate"})
-        
-        # Calculate simple trend based on recent price action
-        if len(df) >= 10:
-            short_trend = df['close'].iloc[-5:].mean()
-            long_trend = df['close'].iloc[-10:].mean()
-            
-            if short_trend > long_trend * 1.02:
-                signals.append({"indicator": "Trend", "signal": "Bullish", "strength": "Strong"})
-            elif short_trend > long_trend:
-                signals.append({"indicator": "Trend", "signal": "Bullish", "strength": "Moderate"})
-            elif short_trend < long_trend * 0.98:
-                signals.append({"indicator": "Trend", "signal": "Bearish", "strength": "Strong"})
-            elif short_trend < long_trend:
-                signals.append({"indicator": "Trend", "signal": "Bearish", "strength": "Moderate"})
-        
-        result['signals'] = signals
-        
-        # Add historical indicator data for charts (last 30 points)
-        chart_length = min(30, len(df))
-        historical = []
-        
-        for i in range(-chart_length, 0):
-            point = {
-                'date': df.index[i].strftime('%Y-%m-%d'),
-                'close': float(df['close'].iloc[i]),
-                'rsi': None if pd.isna(rsi.iloc[i]) else float(rsi.iloc[i]),
-                'sma50': None if pd.isna(sma.iloc[i]) else float(sma.iloc[i]),
-                'ema20': None if pd.isna(ema.iloc[i]) else float(ema.iloc[i]),
-            }
-            if 'vwap' in df.columns and not pd.isna(df['vwap'].iloc[i]):
-                point['vwap'] = float(df['vwap'].iloc[i])
-            
-            historical.append(point)
-        
+
+        if custom:
+            result['indicators'] = {name: _last_value(series, 4) for name, series in columns.items()}
+            series = {'timestamp': index.strftime(DAILY_TIMESTAMP_FORMAT).tolist(), 'close': column_to_list(close)}
+            series.update((name, column_to_list(values)) for name, values in columns.items())
+            result['series'] = series
+            return json_response(result)
+
+        result['indicators'] = {key: _last_value(columns[name], 2) for key, name in LEGACY_VALUES.items()}
+
+        # Serie storiche per i grafici (ultimi 30 punti), colonna per colonna
+        tail = slice(-min(CHART_POINTS, len(df)), None)
+        history = {'date': index[tail].strftime(DAILY_TIMESTAMP_FORMAT).tolist(), 'close': column_to_list(close[tail])}
+        history.update((key, column_to_list(columns[name][tail])) for key, name in LEGACY_HISTORY.items())
+        vwap = column_to_list(columns[LEGACY_VALUES['VWAP']][tail])
+        keys = list(history)
+        historical = [dict(zip(keys, row)) for row in zip(*history.values())]
+        for point, value in zip(historical, vwap):
+            if value is not None:
+                point['vwap'] = value
         result['historical'] = historical
-        
+
         return jsonify(result)
     except Exception as e:
         print(f"Error calculating technical indicators: {e}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+
+@indicators_bp.route('/api/technical_indicators/<symbol>/latest', methods=['GET'])
+def latest_indicators(symbol):
+    """
+    Latest RSI, SMA 50, EMA 20 and VWAP from the incrementally updated state.
+
+    Only the bars added since the previous call are applied and the live
+    price is evaluated against the forming bar, so the cost does not depend
+    on the indicator lookbacks.
+
+    Returns:
+        JSON with 'indicators' and 'signals' in the same shape as
+        /api/technical_indicators/<symbol>, plus the bar date 'as_of'
+    """
+    symbol = symbol.upper()
+    try:
+        quote = fetch_stock_quotes([symbol]).get(symbol)
+        price = quote['current_price'] if quote else None
+        values, bar = incremental_indicators.latest(symbol, price)
+        if not bar:
+            return jsonify({'error': f'No data available for {symbol}'}), 404
+        price = bar['close'] if price is None else price
+
+        # Stesse tabelle di regole del motore, applicate ai valori correnti
+        requests = parse_indicators(DEFAULT_INDICATORS)
+        features = [
+            _ratio(values['RSI_14'], 1),
+            _ratio(price, values['SMA_50']),
+            _ratio(price, values['EMA_20']),
+            _ratio(price, values['VWAP_20']),
+            _ratio(values['SMA_5'], values['SMA_10']),
+        ]
+        rule_rows, matches = evaluate_signals(requests, features)
+
+        return jsonify({
+            'symbol': symbol,
+            'current_price': price,
+            'as_of': bar['time'],
+            'indicators': {
+                key: None if values[name] is None else round(values[name], 2)
+                for key, name in LEGACY_VALUES.items()
+            },
+            'signals': signal_list(rule_rows, matches)
+        })
+    except Exception as e:
+        print(f"Error updating incremental indicators: {e}")
+        return jsonify({'error': str(e)}), 500
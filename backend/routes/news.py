@@ -1,24 +1,52 @@
 # routes/news.py
 
-import requests
-from flask import Blueprint, jsonify
-from config import NEWS_API_KEY
-from datetime import datetime, timedelta
+from flask import Blueprint, jsonify, request
+from config import NEWS_PAGE_SIZE_MAX
+from services.metadata import metadata_store
+from services.news_index import NewsIndex
+from services.news_store import news_store
+from routes.crypto import coin_index
+from routes.search import search_index
 
 news_bp = Blueprint('news_bp', __name__)
 
+# Ricerca full-text sulle notizie già acquisite: nessuna query NewsAPI per ricerca.
+# I simboli riconosciuti sono quelli dell'indice di ricerca (azioni) e le crypto principali
+news_index = NewsIndex(news_store, metadata_store, coin_index, search_index.stock_symbols)
+
+def _page_params(default_page_size):
+    """Parses ?page=&page_size= (1-based page, size capped at NEWS_PAGE_SIZE_MAX)."""
+    page = max(request.args.get('page', default=1, type=int), 1)
+    page_size = min(max(request.args.get('page_size', default=default_page_size, type=int), 1), NEWS_PAGE_SIZE_MAX)
+    return page, page_size
+
+def query_news(topic, default_page_size):
+    """
+    Una pagina di notizie di un argomento, servita dall'archivio locale.
+
+    Returns:
+        Tupla (articoli nel formato NewsAPI, page, page_size, totale)
+    """
+    page, page_size = _page_params(default_page_size)
+    news_store.ensure_fresh(topic)
+    articles, total = news_store.page(topic, page, page_size)
+    return articles, page, page_size, total
+
+def _format_article(article):
+    return {
+        'title': article.get('title', ''),
+        'description': article.get('description', ''),
+        'url': article.get('url', ''),
+        'urlToImage': article.get('urlToImage', ''),
+        'publishedAt': article.get('publishedAt', ''),
+        'source': article.get('source', {'name': 'Unknown'})
+    }
+
 @news_bp.route('/api/economic_news', methods=['GET'])
 def get_economic_news():
-    url = f'https://newsapi.org/v2/everything?q=economy&apiKey={NEWS_API_KEY}'
-
     try:
-        response = requests.get(url)
-        data = response.json()
-
-        if data['status'] != 'ok':
-            return jsonify({'error': 'Unable to fetch news'}), 500
+        articles, page, page_size, total = query_news('economy', NEWS_PAGE_SIZE_MAX)
 
-        articles = data['articles']
         result = []
         for article in articles:
             result.append({
@@ -28,7 +56,12 @@ def get_economic_news():
                 'publishedAt': article['publishedAt']
             })
 
-        return jsonify(result)
+        # La risposta resta una lista: la paginazione viaggia negli header
+        response = jsonify(result)
+        response.headers['X-Total-Count'] = str(total)
+        response.headers['X-Page'] = str(page)
+        response.headers['X-Page-Size'] = str(page_size)
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -37,36 +70,13 @@ def get_economic_news():
 def get_financial_news():
     """
     Endpoint per ottenere notizie finanziarie generali
-    Questa API recupera notizie su finanza, mercati finanziari e tendenze economiche
+    Questa API restituisce notizie su finanza, mercati finanziari e tendenze economiche
+    degli ultimi 7 giorni, paginate con ?page=&page_size= (15 articoli per pagina)
     """
-    # Calcola la data di 7 giorni fa per limitare i risultati recenti
-    week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-    
-    # Parametri per l'API: notizie finanziarie generali in inglese
-    url = f'https://newsapi.org/v2/everything?q=(finance OR economy OR "financial markets") AND (stocks OR investing)&language=en&from={week_ago}&sortBy=publishedAt&apiKey={NEWS_API_KEY}'
-
     try:
-        response = requests.get(url)
-        data = response.json()
-
-        if data['status'] != 'ok':
-            return jsonify({'error': 'Unable to fetch financial news'}), 500
-
-        articles = data['articles'][:15]  # Limitiamo a 15 articoli
-        
-        # Formattare gli articoli per la risposta
-        result = []
-        for article in articles:
-            result.append({
-                'title': article.get('title', ''),
-                'description': article.get('description', ''),
-                'url': article.get('url', ''),
-                'urlToImage': article.get('urlToImage', ''),
-                'publishedAt': article.get('publishedAt', ''),
-                'source': article.get('source', {'name': 'Unknown'})
-            })
-
-        return jsonify({'articles': result})
+        articles, page, page_size, total = query_news('finance', 15)
+        result = [_format_article(article) for article in articles]
+        return jsonify({'articles': result, 'page': page, 'page_size': page_size, 'total': total})
     except Exception as e:
         print(f"Error fetching financial news: {e}")
         return jsonify({'error': str(e), 'articles': []}), 500
@@ -76,36 +86,13 @@ def get_financial_news():
 def get_market_news():
     """
     Endpoint per ottenere notizie specifiche sui mercati azionari
-    Questa API recupera notizie su indici, azioni specifiche e analisi di mercato
+    Questa API restituisce notizie su indici, azioni specifiche e analisi di mercato
+    degli ultimi 4 giorni, paginate con ?page=&page_size= (15 articoli per pagina)
     """
-    # Calcola la data di 4 giorni fa per avere notizie più recenti
-    days_ago = (datetime.now() - timedelta(days=4)).strftime('%Y-%m-%d')
-    
-    # Parametri per l'API: notizie specifiche sui mercati azionari
-    url = f'https://newsapi.org/v2/everything?q=(stock market OR "wall street" OR "stock exchange" OR "stock trading" OR nasdaq OR dow OR "S&P 500")&language=en&from={days_ago}&sortBy=relevancy&apiKey={NEWS_API_KEY}'
-
     try:
-        response = requests.get(url)
-        data = response.json()
-
-        if data['status'] != 'ok':
-            return jsonify({'error': 'Unable to fetch market news'}), 500
-
-        articles = data['articles'][:15]  # Limitiamo a 15 articoli
-        
-        # Formattare gli articoli per la risposta
-        result = []
-        for article in articles:
-            result.append({
-                'title': article.get('title', ''),
-                'description': article.get('description', ''),
-                'url': article.get('url', ''),
-                'urlToImage': article.get('urlToImage', ''),
-                'publishedAt': article.get('publishedAt', ''),
-                'source': article.get('source', {'name': 'Unknown'})
-            })
-
-        return jsonify({'news': result})
+        articles, page, page_size, total = query_news('markets', 15)
+        result = [_format_article(article) for article in articles]
+        return jsonify({'news': result, 'page': page, 'page_size': page_size, 'total': total})
     except Exception as e:
         print(f"Error fetching market news: {e}")
         return jsonify({'error': str(e), 'news': []}), 500
@@ -115,36 +102,48 @@ def get_market_news():
 def get_crypto_news():
     """
     Endpoint per ottenere notizie sul mondo crypto
-    Questa API recupera notizie su Bitcoin, Ethereum e altre criptovalute
+    Questa API restituisce notizie su Bitcoin, Ethereum e altre criptovalute
+    degli ultimi 5 giorni, paginate con ?page=&page_size= (15 articoli per pagina)
     """
-    # Calcola la data di 5 giorni fa
-    days_ago = (datetime.now() - timedelta(days=5)).strftime('%Y-%m-%d')
-    
-    # Parametri per l'API: notizie sulle criptovalute
-    url = f'https://newsapi.org/v2/everything?q=(cryptocurrency OR bitcoin OR ethereum OR "crypto market" OR blockchain)&language=en&from={days_ago}&sortBy=publishedAt&apiKey={NEWS_API_KEY}'
-
     try:
-        response = requests.get(url)
-        data = response.json()
+        articles, page, page_size, total = query_news('crypto', 15)
+        result = [_format_article(article) for article in articles]
+        return jsonify({'news': result, 'page': page, 'page_size': page_size, 'total': total})
+    except Exception as e:
+        print(f"Error fetching crypto news: {e}")
+        return jsonify({'error': str(e), 'news': []}), 500
 
-        if data['status'] != 'ok':
-            return jsonify({'error': 'Unable to fetch crypto news'}), 500
 
-        articles = data['articles'][:15]  # Limitiamo a 15 articoli
-        
-        # Formattare gli articoli per la risposta
-        result = []
-        for article in articles:
-            result.append({
-                'title': article.get('title', ''),
-                'description': article.get('description', ''),
-                'url': article.get('url', ''),
-                'urlToImage': article.get('urlToImage', ''),
-                'publishedAt': article.get('publishedAt', ''),
-                'source': article.get('source', {'name': 'Unknown'})
-            })
+@news_bp.route('/api/news/search', methods=['GET'])
+def search_news():
+    """
+    Full-text search over the locally stored news (NewsAPI feeds and ticker news).
+
+    Query Parameters:
+        q: Free text, ranked with BM25 (optional if symbol is given)
+        symbol: Stock or coin symbol the articles must mention (e.g. AAPL, BTC)
+        page, page_size: Pagination (20 articles per page by default)
+
+    Returns:
+        JSON with the matching articles, their symbols and score, and the total
+    """
+    query = request.args.get('q', default='', type=str).strip()
+    symbol = request.args.get('symbol', default='', type=str).strip().upper()
+    if not query and not symbol:
+        return jsonify({'error': 'q or symbol is required', 'articles': []}), 400
 
-        return jsonify({'news': result})
+    page, page_size = _page_params(20)
+    try:
+        articles, total = news_index.search(query, symbol or None, page, page_size)
     except Exception as e:
-        print(f"Error fetching crypto news: {e}")
-        return jsonify({'error': str(e), 'news': []}), 500
\ No newline at end of file
+        print(f"Error searching news: {e}")
+        return jsonify({'error': str(e), 'articles': []}), 500
+
+    return jsonify({
+        'query': query,
+        'symbol': symbol or None,
+        'articles': articles,
+        'page': page,
+        'page_size': page_size,
+        'total': total
+    })
@@ -0,0 +1,148 @@
+# routes/screener.py
+
+import operator
+import re
+
+from flask import Blueprint, jsonify, request
+import numpy as np
+
+from routes.search import STOCK_SYMBOLS
+from routes.stock import SECTOR_STOCKS
+from services.indicator_engine import (
+    CLOSE, OHLCV_SOURCE_COLUMNS, buffer_from_fields, compute_indicators, history_period, resolve_column
+)
+from services.quotes import download_ohlcv
+from utils.serialization import json_response
+
+screener_bp = Blueprint('screener_bp', __name__)
+
+MAX_SCREEN_SYMBOLS = 500
+
+OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+FILTER_PATTERN = re.compile(r'^\s*([\w.\-]+)\s*(<=|>=|<|>)\s*([\w.\-]+)\s*$')
+# Campi di prezzo utilizzabili nei filtri, oltre alle colonne degli indicatori
+PRICE_FIELDS = {field.lower(): row for row, field in enumerate(OHLCV_SOURCE_COLUMNS)}
+PRICE_FIELDS['price'] = PRICE_FIELDS['close']
+
+
+def _universe():
+    """Symbols to screen: ?symbols= list, ?sector= list, or the search_symbol list."""
+    symbols = request.args.get('symbols', '')
+    if symbols:
+        return [s.strip().upper() for s in symbols.split(',') if s.strip()]
+    sector = request.args.get('sector')
+    if sector:
+        if sector not in SECTOR_STOCKS:
+            raise ValueError(f"Unknown sector '{sector}', available: {', '.join(SECTOR_STOCKS)}")
+        return list(SECTOR_STOCKS[sector])
+    return list(STOCK_SYMBOLS)
+
+
+def _parse_operand(text, requests, columns):
+    """Returns ('number', value), ('price', row) or ('column', name), registering indicator requests."""
+    try:
+        return ('number', float(text))
+    except ValueError:
+        pass
+    if text.lower() in PRICE_FIELDS:
+        return ('price', PRICE_FIELDS[text.lower()])
+    indicator, column = resolve_column(text)
+    if indicator not in requests:
+        requests.append(indicator)
+    columns.append(column)
+    return ('column', column)
+
+
+def parse_filters(text):
+    """
+    Parses filters like 'RSI<30,close>SMA_50'.
+
+    Returns:
+        Tuple (filters, requests, columns): filters as (lhs, op, rhs, source
+        text), the indicator requests they need and the columns they read
+
+    Raises:
+        ValueError: on malformed filters or unknown columns
+    """
+    filters, requests, columns = [], [], []
+    for item in (part for part in text.split(',') if part.strip()):
+        match = FILTER_PATTERN.match(item)
+        if not match:
+            raise ValueError(f"Invalid filter '{item}', expected e.g. RSI<30 or close>SMA_50")
+        lhs, op, rhs = match.groups()
+        filters.append((_parse_operand(lhs, requests, columns), op, _parse_operand(rhs, requests, columns), item.strip()))
+    if not filters:
+        raise ValueError("No filters provided")
+    return filters, requests, list(dict.fromkeys(columns))
+
+
+@screener_bp.route('/api/screener', methods=['GET'])
+def screener():
+    """
+    Screens a universe of stocks on indicator conditions, all symbols at once.
+
+    Query Parameters:
+        filters: Comma-separated conditions, all of which must hold on the last
+                 bar. Operands are numbers, price fields (open, high, low,
+                 close/price, volume) or indicator columns with optional
+                 lengths (RSI, RSI_7, SMA_50, MACDh_12_26_9, BBP_20_2, ...)
+        symbols: Optional comma-separated custom universe
+        sector: Optional sector universe (as in /api/stocks_by_sector)
+                Without symbols/sector, the search_symbol list is screened.
+
+    Returns:
+        JSON with the matching symbols and the last value of every column
+        referenced by the filters
+    """
+    try:
+        universe = _universe()
+        filters, requests, columns = parse_filters(request.args.get('filters', ''))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not universe:
+        return jsonify({'error': 'No symbols provided'}), 400
+    if len(universe) > MAX_SCREEN_SYMBOLS:
+        return jsonify({'error': f'At most {MAX_SCREEN_SYMBOLS} symbols per screen'}), 400
+
+    try:
+        symbols = sorted(set(universe))
+        # Un solo download per tutto l'universo, poi una matrice (simboli x tempo)
+        fields = download_ohlcv(symbols, period=history_period(requests) if requests else '5d')
+        if 'Close' not in fields:
+            return jsonify({'error': 'Market data unavailable'}), 502
+
+        buffer = buffer_from_fields(fields, symbols)
+        values, _ = compute_indicators(buffer, requests) if requests else ({}, [])
+        last = {name: series[:, -1] for name, series in values.items()}
+
+        def operand_values(operand):
+            kind, value = operand
+            if kind == 'number':
+                return value
+            if kind == 'price':
+                return buffer[value, :, -1]
+            return last[value]
+
+        close = buffer[CLOSE, :, -1]
+        matched = ~np.isnan(close)
+        with np.errstate(invalid='ignore'):
+            for lhs, op, rhs, _ in filters:
+                matched &= OPERATORS[op](operand_values(lhs), operand_values(rhs))
+
+        matches = []
+        for i in np.flatnonzero(matched).tolist():
+            row = {'symbol': symbols[i], 'close': round(float(close[i]), 4)}
+            for name in columns:
+                value = last[name][i]
+                row[name] = None if np.isnan(value) else round(float(value), 4)
+            matches.append(row)
+
+        return json_response({
+            'universe_size': len(symbols),
+            'filters': [text for _, _, _, text in filters],
+            'as_of': fields['Close'].index[-1].strftime('%Y-%m-%d'),
+            'matches': matches
+        })
+    except Exception as e:
+        print(f"Error running screener: {e}")
+        return jsonify({'error': str(e)}), 500
@@ -1,12 +1,124 @@
 # routes/stock.py
 from flask import Blueprint, jsonify, request
-import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
 import numpy as np
+from services.market_data import get_statement, get_ticker_news, INTRADAY_INTERVALS
+from services.metadata import metadata_store
+from services.timeseries_store import timeseries_store
+from services.snapshots import snapshots
+from services.quotes import download_closes, change_table, breadth, fetch_stock_quotes
+from utils.cache import cache
+from utils.fanout import executor
+from utils.serialization import frame_to_records, frame_to_columns, json_response, INTRADAY_TIMESTAMP_FORMAT, DAILY_TIMESTAMP_FORMAT
 
 stock_bp = Blueprint('stock_bp', __name__)
 
+STOCK_DATA_SECTIONS = ('history', 'company', 'financials', 'news')
+
+def _history_section(symbol, period, interval, response_format):
+    """
+    Storico dei prezzi (con VWAP) già serializzato; None se non ci sono dati.
+    """
+    def build():
+        # Ottieni dati storici con la granularità appropriata
+        data = timeseries_store.history(symbol, period, interval)
+        if data.empty:
+            return None
+
+        # Calcola VWAP se il volume è disponibile
+        if 'Volume' in data.columns and len(data) > 0:
+            data['VWAP'] = (data['Close'] * data['Volume']).cumsum() / data['Volume'].cumsum()
+        
+        # Serializza colonna per colonna (formato dei timestamp in base all'intervallo)
+        if interval in ['1m', '5m', '15m', '30m', '1h']:
+            timestamp_format = INTRADAY_TIMESTAMP_FORMAT
+        else:
+            timestamp_format = DAILY_TIMESTAMP_FORMAT
+        
+        if response_format == 'columnar':
+            return frame_to_columns(data, timestamp_format)
+        return frame_to_records(data, timestamp_format)
+
+    data_class = 'history' if interval in INTRADAY_INTERVALS else 'history_daily'
+    return cache.get_or_load(data_class, ('section.history', symbol.upper(), period, interval, response_format),
+                             build, should_cache=lambda result: result is not None)
+
+def _company_section(symbol):
+    """
+    Informazioni chiave dell'azienda dallo store dei metadati; solo il prezzo
+    corrente arriva dalle quotazioni.
+    """
+    company_info = metadata_store.get(symbol) or {}
+    quote = fetch_stock_quotes([symbol.upper()]).get(symbol.upper(), {})
+    return {
+        'name': company_info.get('name', 'N/A'),
+        'sector': company_info.get('sector', 'N/A'),
+        'industry': company_info.get('industry', 'N/A'),
+        'market_cap': company_info.get('market_cap', 'N/A'),
+        'pe_ratio': company_info.get('pe_ratio', 'N/A'),
+        'dividend_yield': company_info.get('dividend_yield', 'N/A'),
+        'beta': company_info.get('beta', 'N/A'),
+        'current_price': quote.get('current_price', 'N/A'),
+        'target_high_price': company_info.get('target_high_price', 'N/A'),
+        'target_low_price': company_info.get('target_low_price', 'N/A'),
+        'target_mean_price': company_info.get('target_mean_price', 'N/A'),
+        'recommendation': company_info.get('recommendation', 'N/A'),
+        'logo_url': company_info.get('logo_url', ''),
+        'website': company_info.get('website', ''),
+        'business_summary': company_info.get('business_summary', 'N/A')
+    }
+
+def _financials_section(symbol):
+    """
+    Metriche finanziarie chiave (conto economico e liquidità).
+    """
+    def build():
+        section = {}
+        financials = get_statement(symbol, 'financials')
+        balance_sheet = get_statement(symbol, 'balance_sheet')
+        
+        # Estrai le metriche finanziarie chiave (trimestre più recente)
+        if not financials.empty and len(financials.columns) > 0:
+            latest_quarter = financials.columns[0]
+            section['financials'] = {
+                'revenue': float(financials.loc['Total Revenue', latest_quarter]) if 'Total Revenue' in financials.index else None,
+                'net_income': float(financials.loc['Net Income', latest_quarter]) if 'Net Income' in financials.index else None,
+            }
+        
+        # Aggiungi dati sulla liquidità
+        if not balance_sheet.empty and len(balance_sheet.columns) > 0:
+            latest_bs = balance_sheet.columns[0]
+            section['cash'] = float(balance_sheet.loc['Cash', latest_bs]) if 'Cash' in balance_sheet.index else None
+        return section
+
+    try:
+        return cache.get_or_load('financials', ('section.financials', symbol.upper()), build)
+    except Exception as e:
+        print(f"Errore nel recupero dei dati finanziari: {e}")
+        return {'financials': {}}
+
+def _news_section(symbol):
+    """
+    Le ultime 5 notizie del ticker.
+    """
+    def build():
+        news_data = []
+        for item in get_ticker_news(symbol)[:5]:  # Limita a 5 notizie
+            news_data.append({
+                'title': item.get('title', ''),
+                'publisher': item.get('publisher', ''),
+                'link': item.get('link', ''),
+                'published': datetime.fromtimestamp(item.get('providerPublishTime', 0)).strftime('%Y-%m-%d %H:%M:%S')
+            })
+        return news_data
+
+    try:
+        return cache.get_or_load('ticker_news', ('section.news', symbol.upper()), build)
+    except Exception as e:
+        print(f"Errore nel recupero delle notizie: {e}")
+        return []
+
 # Endpoint per i dati azionari
 @stock_bp.route('/api/stock_data/<string:symbol>', methods=['GET'])
 def get_stock_data(symbol):
@@ -18,11 +130,22 @@ def get_stock_data(symbol):
         
     Query Parameters:
         period: Periodo di tempo per i dati storici (default: '1d')
+        format: 'records' (lista di oggetti, default) o 'columnar' (array paralleli)
+        include: Sezioni da restituire, separate da virgola, tra history, company,
+                 financials e news (default: tutte). Ogni sezione ha la sua cache, quindi
+                 un cambio di timeframe con include=history scarica solo lo storico.
         
     Returns:
-        JSON con informazioni sull'azienda e dati storici dei prezzi
+        JSON con informazioni sull'azienda e dati storici dei prezzi; una sezione
+        non disponibile resta vuota e il suo errore compare in 'errors' (solo un
+        errore dello storico rende la risposta un 500)
     """
     period = request.args.get('period', default='1d', type=str)
+    response_format = request.args.get('format', default='records', type=str)
+    include = request.args.get('include', default=','.join(STOCK_DATA_SECTIONS), type=str)
+    sections = {s.strip() for s in include.split(',') if s.strip() in STOCK_DATA_SECTIONS}
+    if not sections:
+        return jsonify({"error": f"Parametro include non valido, valori ammessi: {', '.join(STOCK_DATA_SECTIONS)}"}), 400
     
     # Seleziona l'intervallo appropriato in base al periodo richiesto
     if period == '1d':
@@ -43,106 +166,38 @@ def get_stock_data(symbol):
         interval = '1d'  # Default a 1 giorno
         
     try:
-        stock = yf.Ticker(symbol)
-        # Ottieni informazioni sull'azienda
-        company_info = stock.info
-        
-        # Ottieni dati storici con la granularità appropriata
-        data = stock.history(period=period, interval=interval)
-        
-        if data.empty:
-            return jsonify({"error": f"Nessun dato disponibile per {symbol}"}), 404
-
-        # Calcola VWAP se il volume è disponibile
-        if 'Volume' in data.columns and len(data) > 0:
-            data['VWAP'] = (data['Close'] * data['Volume']).cumsum() / data['Volume'].cumsum()
-        
-        # Converti in lista di dizionari per la risposta JSON
-        result = []
-        for index, row in data.iterrows():
-            # Formatta il timestamp in base all'intervallo
-            if interval in ['1m', '5m', '15m', '30m', '1h']:
-                timestamp_format = '%Y-%m-%d %H:%M:%S'
-            else:
-                timestamp_format = '%Y-%m-%d'
-                
-            entry = {
-                'timestamp': index.strftime(timestamp_format),
-                'open': float(row['Open']) if not pd.isna(row['Open']) else None,
-                'high': float(row['High']) if not pd.isna(row['High']) else None,
-                'low': float(row['Low']) if not pd.isna(row['Low']) else None,
-                'close': float(row['Close']) if not pd.isna(row['Close']) else None,
-                'volume': int(row['Volume']) if not pd.isna(row['Volume']) else None
-            }
-            if 'VWAP' in row and not pd.isna(row['VWAP']):
-                entry['vwap'] = float(row['VWAP'])
-            
-            result.append(entry)
-        
-        # Estrai le informazioni chiave dell'azienda
-        company_data = {
-            'symbol': symbol,
-            'name': company_info.get('longName', 'N/A'),
-            'sector': company_info.get('sector', 'N/A'),
-            'industry': company_info.get('industry', 'N/A'),
-            'market_cap': company_info.get('marketCap', 'N/A'),
-            'pe_ratio': company_info.get('trailingPE', 'N/A'),
-            'dividend_yield': company_info.get('dividendYield', 'N/A'),
-            'beta': company_info.get('beta', 'N/A'),
-            'current_price': company_info.get('currentPrice', company_info.get('regularMarketPrice', 'N/A')),
-            'target_high_price': company_info.get('targetHighPrice', 'N/A'),
-            'target_low_price': company_info.get('targetLowPrice', 'N/A'),
-            'target_mean_price': company_info.get('targetMeanPrice', 'N/A'),
-            'recommendation': company_info.get('recommendationKey', 'N/A'),
-            'logo_url': company_info.get('logo_url', ''),
-            'website': company_info.get('website', ''),
-            'business_summary': company_info.get('longBusinessSummary', 'N/A')
+        # Le sezioni richieste vengono recuperate in parallelo
+        builders = {
+            'history': lambda: _history_section(symbol, period, interval, response_format),
+            'company': lambda: _company_section(symbol),
+            'financials': lambda: _financials_section(symbol),
+            'news': lambda: _news_section(symbol),
         }
-
-        # Ottieni dati finanziari
-        try:
-            financials = stock.financials
-            balance_sheet = stock.balance_sheet
-            cash_flow = stock.cashflow
-            
-            # Estrai le metriche finanziarie chiave (trimestre più recente)
-            if not financials.empty and len(financials.columns) > 0:
-                latest_quarter = financials.columns[0]
-                financial_data = {
-                    'revenue': float(financials.loc['Total Revenue', latest_quarter]) if 'Total Revenue' in financials.index else None,
-                    'net_income': float(financials.loc['Net Income', latest_quarter]) if 'Net Income' in financials.index else None,
-                }
-                company_data['financials'] = financial_data
-            
-            # Aggiungi dati sulla liquidità
-            if not balance_sheet.empty and len(balance_sheet.columns) > 0:
-                latest_bs = balance_sheet.columns[0]
-                company_data['cash'] = float(balance_sheet.loc['Cash', latest_bs]) if 'Cash' in balance_sheet.index else None
-            
-        except Exception as e:
-            print(f"Errore nel recupero dei dati finanziari: {e}")
-            company_data['financials'] = {}
+        fetched, errors = executor.fetch_all('yfinance', {name: builders[name] for name in sections})
+        # Senza storico la richiesta fallisce; le altre sezioni restano vuote con il loro errore
+        if 'history' in errors:
+            raise errors['history']
+        for name, error in errors.items():
+            print(f"Errore nel recupero della sezione {name} di {symbol}: {error}")
         
-        # Ottieni notizie
-        try:
-            news = stock.news
-            news_data = []
-            for item in news[:5]:  # Limita a 5 notizie
-                news_data.append({
-                    'title': item.get('title', ''),
-                    'publisher': item.get('publisher', ''),
-                    'link': item.get('link', ''),
-                    'published': datetime.fromtimestamp(item.get('providerPublishTime', 0)).strftime('%Y-%m-%d %H:%M:%S')
-                })
-            company_data['news'] = news_data
-        except Exception as e:
-            print(f"Errore nel recupero delle notizie: {e}")
-            company_data['news'] = []
+        response = {}
+        if 'history' in sections:
+            if fetched['history'] is None:
+                return jsonify({"error": f"Nessun dato disponibile per {symbol}"}), 404
+            response['historical_data'] = fetched['history']
+        
+        if sections - {'history'}:
+            company_data = {'symbol': symbol}
+            company_data.update(fetched.get('company', {}))
+            if 'financials' in sections:
+                company_data.update(fetched.get('financials', {'financials': {}}))
+            if 'news' in sections:
+                company_data['news'] = fetched.get('news', [])
+            response['company'] = company_data
+        if errors:
+            response['errors'] = {name: str(error) for name, error in errors.items()}
 
-        return jsonify({
-            'company': company_data,
-            'historical_data': result
-        })
+        return json_response(response)
 
     except Exception as e:
         print(f"Errore nel recupero dei dati azionari: {e}")
@@ -151,6 +206,7 @@ def get_stock_data(symbol):
 
 # Endpoint per ottenere le azioni più scambiate con dati reali
 @stock_bp.route('/api/top_stocks', methods=['GET'])
+@snapshots.materialize('top_stocks', schedule='equity')
 def get_top_stocks():
     """
     Ottieni dati per una lista di azioni popolari/principali.
@@ -166,29 +222,23 @@ def get_top_stocks():
     
     top_stocks = {}
     
-    # Scarica i dati per ogni simbolo
-    for symbol in popular_symbols:
-
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        hist = ticker.history(period="2d")  # Ottieni 2 giorni per calcolare la variazione percentuale
-        
-        if not hist.empty and len(hist) > 0:
-            # Ottieni il prezzo attuale
-            current_price = float(hist['Close'].iloc[-1])
-            
-            # Calcola la variazione percentuale
-            if len(hist) > 1:
-                prev_close = float(hist['Close'].iloc[-2])
-                change_percent = ((current_price - prev_close) / prev_close) * 100
-            else:
-                change_percent = 0  # Se abbiamo solo un giorno di dati
-            
-            # Salva i dati
+    # Una sola chiamata batch per le chiusure (2 sedute per la variazione percentuale);
+    # i nomi arrivano dallo store dei metadati
+    try:
+        closes = download_closes(popular_symbols, period="5d")
+    except Exception as e:
+        print(f"Errore nel recupero delle chiusure: {e}")
+        closes = None
+    
+    if closes is not None:
+        quotes = change_table(closes, lookback=1)
+        records = metadata_store.get_many(popular_symbols)
+        for symbol, row in quotes.iterrows():
+            info = records.get(symbol, {})
             top_stocks[symbol] = {
-                'name': info.get('longName', symbol),
-                'current_price': current_price,
-                'change_percent': change_percent
+                'name': info.get('name', symbol),
+                'current_price': float(row['price']),
+                'change_percent': float(row['change_percent'])
             }
 
     # Converti in struttura top_stocks per compatibilità col frontend
@@ -197,6 +247,7 @@ def get_top_stocks():
 
 
 @stock_bp.route('/api/market_overview', methods=['GET'])
+@snapshots.materialize('market_overview', schedule='equity')
 def get_market_overview():
     """
     Fornisce una panoramica completa del mercato che include indici, settori e performance azionarie.
@@ -214,33 +265,6 @@ def get_market_overview():
             '^N225': 'Nikkei 225'
         }
         
-        indices_data = {}
-        for symbol, name in indices.items():
-            try:
-                ticker = yf.Ticker(symbol)
-                hist = ticker.history(period="1d") # Modificato da 2d a 1d per coerenza con altri endpoint e per evitare errori se ci sono meno di 2 giorni di dati disponibili
-                if not hist.empty:
-                    last_close = float(hist['Close'].iloc[-1])
-                    # Usa il prezzo di chiusura precedente da info se disponibile, altrimenti l'ultimo prezzo di chiusura se hist ha solo una riga
-                    prev_close_info = ticker.info.get('previousClose')
-                    if prev_close_info:
-                         prev_close = float(prev_close_info)
-                    elif len(hist) > 1:
-                        prev_close = float(hist['Close'].iloc[-2])
-                    else:
-                        prev_close = last_close # Se c'è solo un giorno, la variazione è 0
-
-                    change_percent = ((last_close - prev_close) / prev_close) * 100 if prev_close != 0 else 0
-                    
-                    indices_data[symbol] = {
-                        'name': name,
-                        'price': last_close,
-                        'change_percent': change_percent
-                    }
-            except Exception as e:
-                print(f"Errore nel recupero dell'indice {symbol}: {e}")
-        
-
         sectors = [
             'XLK', # Tecnologia
             'XLF', # Finanziario
@@ -254,7 +278,32 @@ def get_market_overview():
             'XLRE' # Immobiliare
         ]
         
-        sectors_data = {}
+        popular_stocks = [
+            'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'TSLA', 'NVDA', 'JPM', 
+            'V', 'PG', 'JNJ', 'WMT', 'MA', 'DIS', 'BAC', 'INTC', 'VZ', 'NFLX',
+            'PYPL', 'CSCO', 'ADBE', 'CRM', 'XOM', 'KO', 'T', 'PFE', 'CMCSA', 'PEP'
+        ]
+        
+        # Un'unica chiamata batch per le chiusure giornaliere di indici, settori e azioni;
+        # nome, settore e capitalizzazione delle azioni arrivano dallo store dei metadati
+        try:
+            closes = download_closes(list(indices) + sectors + popular_stocks, period="1mo")
+        except Exception as e:
+            print(f"Errore nel recupero delle chiusure: {e}")
+            return jsonify({"error": "Dati di mercato non disponibili"}), 502
+        records = metadata_store.get_many(popular_stocks)
+        
+        daily = change_table(closes, lookback=1)
+        weekly = change_table(closes[sectors], lookback=4) # Variazione su 5 sedute, come in precedenza
+        
+        indices_data = {}
+        for symbol, row in daily.loc[[s for s in indices if s in daily.index]].iterrows():
+            indices_data[symbol] = {
+                'name': indices[symbol],
+                'price': float(row['price']),
+                'change_percent': float(row['change_percent'])
+            }
+        
         sector_names = {
             'XLK': 'Tecnologia',
             'XLF': 'Finanziario',
@@ -268,51 +317,27 @@ def get_market_overview():
             'XLRE': 'Immobiliare'
         }
         
-        for symbol in sectors:
-            try:
-                ticker = yf.Ticker(symbol)
-                hist = ticker.history(period="5d")
-                if not hist.empty:
-                    last_close = float(hist['Close'].iloc[-1])
-                    prev_close = float(hist['Close'].iloc[-5]) if len(hist) >= 5 else float(hist['Close'].iloc[0])
-                    change_percent = ((last_close - prev_close) / prev_close) * 100 if prev_close != 0 else 0
-                    
-                    sectors_data[symbol] = {
-                        'name': sector_names.get(symbol, symbol),
-                        'price': last_close,
-                        'change_percent': change_percent
-                    }
-            except Exception as e:
-                print(f"Errore nel recupero del settore {symbol}: {e}")
+        sectors_data = {}
+        for symbol, row in weekly.iterrows():
+            sectors_data[symbol] = {
+                'name': sector_names.get(symbol, symbol),
+                'price': float(row['price']),
+                'change_percent': float(row['change_percent'])
+            }
         
         # Top gainers e losers
-        popular_stocks = [
-            'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'TSLA', 'NVDA', 'JPM', 
-            'V', 'PG', 'JNJ', 'WMT', 'MA', 'DIS', 'BAC', 'INTC', 'VZ', 'NFLX',
-            'PYPL', 'CSCO', 'ADBE', 'CRM', 'XOM', 'KO', 'T', 'PFE', 'CMCSA', 'PEP'
-        ]
-        
+        stock_symbols = [s for s in popular_stocks if s in daily.index and s in records]
+        stock_quotes = daily.loc[stock_symbols]
         stocks_data = {}
-        for symbol in popular_stocks:
-            try:
-                ticker = yf.Ticker(symbol)
-                info = ticker.info
-                hist = ticker.history(period="1d") # Coerenza con l'endpoint degli indici
-                
-                if not hist.empty and 'longName' in info:
-                    last_close = float(hist['Close'].iloc[-1])
-                    prev_close = info.get('previousClose', last_close) # Usa previousClose da info per maggiore accuratezza
-                    change_percent = ((last_close - prev_close) / prev_close) * 100 if prev_close != 0 else 0
-                    
-                    stocks_data[symbol] = {
-                        'name': info.get('longName', symbol),
-                        'sector': info.get('sector', 'Sconosciuto'),
-                        'price': last_close,
-                        'change_percent': change_percent,
-                        'market_cap': info.get('marketCap', None)
-                    }
-            except Exception as e:
-                print(f"Errore nel recupero dell'azione {symbol}: {e}")
+        for symbol, row in stock_quotes.iterrows():
+            info = records[symbol]
+            stocks_data[symbol] = {
+                'name': info.get('name', symbol),
+                'sector': info.get('sector', 'Sconosciuto'),
+                'price': float(row['price']),
+                'change_percent': float(row['change_percent']),
+                'market_cap': info.get('market_cap', None)
+            }
         
         gainers = {}
         losers = {}
@@ -331,11 +356,7 @@ def get_market_overview():
                 by_sector[sector][symbol] = data
         
         # Dati di mercato generali
-        market_data = {
-            'total_stocks': len(stocks_data),
-            'advancing': sum(1 for stock in stocks_data.values() if stock['change_percent'] > 0),
-            'declining': sum(1 for stock in stocks_data.values() if stock['change_percent'] < 0)
-        }
+        market_data = breadth(stock_quotes)
         
         return jsonify({
             'indices': indices_data,
@@ -351,6 +372,15 @@ def get_market_overview():
         print(f"Errore nel recupero della panoramica di mercato: {e}")
         return jsonify({"error": str(e)}), 500
 
+# Titoli monitorati per settore (aggiungere altri settori se necessario)
+SECTOR_STOCKS = {
+    'Technology': ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'NVDA', 'INTC', 'CSCO', 'ADBE', 'CRM'],
+    'Financial': ['JPM', 'BAC', 'WFC', 'C', 'GS', 'MS', 'AXP', 'V', 'MA', 'BLK'],
+    'Healthcare': ['JNJ', 'PFE', 'UNH', 'MRK', 'ABT', 'ABBV', 'TMO', 'BMY', 'LLY', 'AMGN'],
+}
+# Fallback generico se il settore non è gestito
+DEFAULT_SECTOR_STOCKS = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META']
+
 @stock_bp.route('/api/stocks_by_sector', methods=['GET'])
 def get_stocks_by_sector():
     """
@@ -367,39 +397,26 @@ def get_stocks_by_sector():
     limit = request.args.get('limit', 10, type=int)
     
     try:
-        if sector == 'Technology':
-            stocks = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'NVDA', 'INTC', 'CSCO', 'ADBE', 'CRM']
-        elif sector == 'Financial':
-            stocks = ['JPM', 'BAC', 'WFC', 'C', 'GS', 'MS', 'AXP', 'V', 'MA', 'BLK']
-        elif sector == 'Healthcare':
-            stocks = ['JNJ', 'PFE', 'UNH', 'MRK', 'ABT', 'ABBV', 'TMO', 'BMY', 'LLY', 'AMGN']
-        # Aggiungere altri settori se necessario
-        else:
-            # Fallback generico o errore se il settore non è gestito
-            stocks = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META'] 
-        
-        stocks = stocks[:limit]
+        stocks = SECTOR_STOCKS.get(sector, DEFAULT_SECTOR_STOCKS)[:limit]
         result = {}
         
-        for symbol in stocks:
-            try:
-                ticker = yf.Ticker(symbol)
-                info = ticker.info
-                hist = ticker.history(period="1d") # Coerenza
-                
-                if not hist.empty and 'longName' in info:
-                    last_close = float(hist['Close'].iloc[-1])
-                    prev_close = info.get('previousClose', last_close) # Usa previousClose
-                    change_percent = ((last_close - prev_close) / prev_close) * 100 if prev_close != 0 else 0
-                    
-                    result[symbol] = {
-                        'name': info.get('longName', symbol),
-                        'price': last_close,
-                        'change_percent': change_percent,
-                        'market_cap': info.get('marketCap', None)
-                    }
-            except Exception as e:
-                print(f"Errore nel recupero dell'azione {symbol} per settore: {e}")
+        try:
+            closes = download_closes(stocks, period="5d")
+        except Exception as e:
+            print(f"Errore nel recupero delle chiusure: {e}")
+            closes = pd.DataFrame()
+        records = metadata_store.get_many(stocks)
+        
+        quotes = change_table(closes, lookback=1)
+        for symbol, row in quotes.iterrows():
+            info = records.get(symbol)
+            if info:
+                result[symbol] = {
+                    'name': info.get('name', symbol),
+                    'price': float(row['price']),
+                    'change_percent': float(row['change_percent']),
+                    'market_cap': info.get('market_cap', None)
+                }
         
         return jsonify(result)
         
@@ -424,12 +441,11 @@ def search_stock():
     
     try:
         try:
-            ticker_obj = yf.Ticker(query)
-            info = ticker_obj.info
-            if info and info.get('longName'): # Controlla se sono state recuperate informazioni valide
+            info = metadata_store.get(query)
+            if info: # Controlla se sono state recuperate informazioni valide
                  return jsonify([{
                     'symbol': query.upper(), # Assicurati che il simbolo sia maiuscolo
-                    'name': info.get('longName', 'N/A'),
+                    'name': info.get('name', 'N/A'),
                     'exchange': info.get('exchange', 'N/A')
                 }])
             else:
@@ -465,55 +481,36 @@ def get_stock_batch():
         
     result = {}
     
-    # Utilizza yf.Tickers per un recupero batch più efficiente
-    tickers_data = yf.Tickers(symbol_list)
+    # Prezzi da un'unica chiamata batch, nomi dallo store dei metadati
+    try:
+        quotes = change_table(download_closes(symbol_list, period="5d"), lookback=1)
+    except Exception as e:
+        print(f"Errore nel recupero delle quotazioni: {e}")
+        quotes = change_table(pd.DataFrame())
+    records = metadata_store.get_many(symbol_list)
     
     for symbol in symbol_list:
-        try:
-            # Accedi ai dati del singolo ticker dall'oggetto Tickers
-            ticker_info = tickers_data.tickers[symbol].info
-            
-            if not ticker_info or not ticker_info.get('regularMarketPrice'): # Controlla se ci sono dati validi
-                print(f"Dati non sufficienti per {symbol}")
-                result[symbol] = {
-                    'symbol': symbol,
-                    'name': symbol, # Fallback al simbolo se il nome non è disponibile
-                    'current_price': None,
-                    'price_change_24h': None,
-                    'price_change_percentage_24h': None,
-                    'error': 'Dati non disponibili o incompleti'
-                }
-                continue
-
-            current_price = ticker_info.get('regularMarketPrice', ticker_info.get('currentPrice'))
-            previous_close = ticker_info.get('regularMarketPreviousClose', ticker_info.get('previousClose'))
-            
-            price_change = None
-            price_change_percentage = None
-
-            if current_price is not None and previous_close is not None:
-                price_change = current_price - previous_close
-                if previous_close != 0: # Evita divisione per zero
-                    price_change_percentage = (price_change / previous_close) * 100
-                else:
-                    price_change_percentage = 0 # O None, a seconda di come si vuole gestire
-            
+        info = records.get(symbol, {})
+        if symbol not in quotes.index: # Controlla se ci sono dati validi
+            print(f"Dati non sufficienti per {symbol}")
             result[symbol] = {
                 'symbol': symbol,
-                'current_price': current_price,
-                'price_change_24h': price_change,
-                'price_change_percentage_24h': price_change_percentage,
-                'name': ticker_info.get('shortName', ticker_info.get('longName', symbol))
-            }
-        except Exception as e:
-            print(f"Errore nel recupero dei dati per {symbol}: {e}")
-            result[symbol] = {
-                'symbol': symbol,
-                'name': symbol,
+                'name': info.get('short_name', symbol), # Fallback al simbolo se il nome non è disponibile
                 'current_price': None,
                 'price_change_24h': None,
                 'price_change_percentage_24h': None,
-                'error': str(e)
+                'error': 'Dati non disponibili o incompleti'
             }
+            continue
+
+        row = quotes.loc[symbol]
+        current_price = float(row['price'])
+        result[symbol] = {
+            'symbol': symbol,
+            'current_price': current_price,
+            'price_change_24h': current_price - float(row['prev_close']),
+            'price_change_percentage_24h': float(row['change_percent']),
+            'name': info.get('short_name', symbol)
+        }
             
     return jsonify(result)
\ No newline at end of file
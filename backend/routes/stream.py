@@ -0,0 +1,56 @@
+# routes/stream.py
+
+from flask import Blueprint, Response, jsonify, request
+
+from services.quote_feed import quote_channel, quote_feed
+from utils.pubsub import broker, sse_stream
+
+stream_bp = Blueprint('stream_bp', __name__)
+
+MAX_STREAM_SYMBOLS = 50
+
+
+def _symbol_list(param):
+    return [s.strip().upper() for s in request.args.get(param, '').split(',') if s.strip()]
+
+
+@stream_bp.route('/api/stream/quotes', methods=['GET'])
+def stream_quotes():
+    """
+    Server-Sent Events feed of price updates for a set of symbols.
+
+    Query Parameters:
+        stocks: Comma-separated list of stock symbols
+        cryptos: Comma-separated list of cryptocurrency symbols
+
+    Returns:
+        text/event-stream: a 'snapshot' event with the last known quotes, then
+        one 'quote' event per symbol whenever its price changes, carrying only
+        the changed fields
+    """
+    keys = [('stock', s) for s in _symbol_list('stocks')] + [('crypto', s) for s in _symbol_list('cryptos')]
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return jsonify({'error': 'No symbols provided'}), 400
+    if len(keys) > MAX_STREAM_SYMBOLS:
+        return jsonify({'error': f'At most {MAX_STREAM_SYMBOLS} symbols per stream'}), 400
+
+    channels = [quote_channel(asset_type, symbol) for asset_type, symbol in keys]
+    subscriber = None
+    for channel in channels:
+        subscriber = broker.subscribe(channel, subscriber)
+    snapshot = quote_feed.acquire(keys)
+
+    response = Response(
+        sse_stream(broker, channels, subscriber, initial=[('snapshot', list(snapshot.values()))]),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Eseguito anche se il client si disconnette prima del primo messaggio
+    def close():
+        for channel in channels:
+            broker.unsubscribe(channel, subscriber)
+        quote_feed.release(keys)
+
+    response.call_on_close(close)
+    return response
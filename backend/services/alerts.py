@@ -0,0 +1,428 @@
+# services/alerts.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+from config import ALERTS_DB_FILE, ALERTS_HISTORY_SIZE, ALERTS_POLL_INTERVAL, ALERTS_RELAY_INTERVAL
+from services.quotes import fetch_stock_quotes, fetch_crypto_quotes
+from utils.pubsub import broker
+
+ASSET_TYPES = ('stock', 'crypto')
+CONDITIONS = ('above', 'below')
+THRESHOLD_TYPES = ('absolute', 'percent')
+# Campi che definiscono un alert: se non cambiano, una risincronizzazione non lo tocca
+DEFINITION_FIELDS = ('symbol', 'asset_type', 'condition', 'threshold_type', 'price_target', 'percent')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    client_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    active INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (client_id, id)
+);
+CREATE INDEX IF NOT EXISTS alerts_active ON alerts (active);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_client ON events (client_id, seq);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def alert_channel(client_id):
+    """Pub/sub channel on which a client's triggered alerts are published."""
+    return f"alerts:{client_id}"
+
+
+def normalize_alert(client_id, data):
+    """
+    Validates an alert payload coming from the API.
+
+    An 'absolute' alert fires when the price crosses price_target. A
+    'percent' alert fires when the price moves by `percent` % above or below
+    reference_price; if reference_price is missing, the first price seen by
+    the scheduler is used.
+
+    Raises:
+        ValueError: if a field is missing or invalid
+    """
+    symbol = str(data.get('symbol', '')).strip().upper()
+    asset_type = data.get('asset_type', data.get('assetType'))
+    condition = data.get('condition')
+    threshold_type = data.get('threshold_type', 'absolute')
+
+    if not symbol:
+        raise ValueError("Campo 'symbol' mancante")
+    if asset_type not in ASSET_TYPES:
+        raise ValueError(f"'asset_type' deve essere uno tra: {', '.join(ASSET_TYPES)}")
+    if condition not in CONDITIONS:
+        raise ValueError(f"'condition' deve essere uno tra: {', '.join(CONDITIONS)}")
+    if threshold_type not in THRESHOLD_TYPES:
+        raise ValueError(f"'threshold_type' deve essere uno tra: {', '.join(THRESHOLD_TYPES)}")
+
+    alert = {
+        'id': str(data.get('id') or uuid.uuid4().hex),
+        'client_id': client_id,
+        'symbol': symbol,
+        'asset_type': asset_type,
+        'condition': condition,
+        'threshold_type': threshold_type,
+        'price_target': None,
+        'percent': None,
+        'reference_price': None,
+        'active': bool(data.get('active', True)),
+        'created_at': data.get('created_at') or datetime.now().isoformat()
+    }
+    try:
+        if threshold_type == 'absolute':
+            alert['price_target'] = float(data['price_target'])
+        else:
+            alert['percent'] = abs(float(data['percent']))
+            if data.get('reference_price') is not None:
+                alert['reference_price'] = float(data['reference_price'])
+    except (KeyError, TypeError, ValueError):
+        field = 'price_target' if threshold_type == 'absolute' else 'percent'
+        raise ValueError(f"Campo '{field}' mancante o non numerico")
+    return alert
+
+
+def alert_key(alert):
+    """Store key of an alert: ids are chosen by the clients, so they are only unique per client."""
+    return alert['client_id'], alert['id']
+
+
+def merge_server_state(stored, alert):
+    """
+    Keeps the state captured by the scheduler (reference price, trigger)
+    of an alert sent again by its client with an unchanged definition.
+    An alert whose definition changed starts over.
+    """
+    if stored is None or any(stored[field] != alert[field] for field in DEFINITION_FIELDS):
+        return alert
+    merged = dict(alert, created_at=stored['created_at'])
+    if alert['reference_price'] is None:
+        merged['reference_price'] = stored['reference_price']
+    if stored.get('triggered_at'):
+        # Già scattato: una sincronizzazione partita prima della notifica non deve riattivarlo
+        merged['active'] = False
+        merged['triggered_at'] = stored['triggered_at']
+    return merged
+
+
+class AlertStore:
+    """
+    Store of all registered alerts, keyed by (client_id, id), in an SQLite
+    database shared by every worker process serving the same DATA_DIR.
+
+    Triggered alerts are appended to an event log that doubles as each
+    client's history: the scheduler runs in one process only, and every
+    process relays the new events to its own SSE subscribers (AlertRelay).
+    """
+
+    def __init__(self, path, history_size):
+        self.path = path
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connection(self):
+        # Aperta alla prima richiesta, così importare il modulo non crea file
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(SCHEMA)
+            self._db = db
+        return self._db
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Write transaction that locks the database for the other processes
+        from the first read, so read-modify-write updates do not interleave.
+        """
+        with self._lock:
+            db = self._connection()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                yield db
+            except BaseException:
+                db.rollback()
+                raise
+            db.commit()
+
+    @staticmethod
+    def _upsert(db, alert):
+        db.execute("""
+            INSERT INTO alerts (client_id, id, active, data) VALUES (?, ?, ?, ?)
+            ON CONFLICT (client_id, id) DO UPDATE SET active = excluded.active, data = excluded.data
+        """, (alert['client_id'], alert['id'], int(alert['active']), json.dumps(alert)))
+
+    @staticmethod
+    def _get(db, client_id, alert_id):
+        row = db.execute('SELECT data FROM alerts WHERE client_id = ? AND id = ?', (client_id, alert_id)).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def add(self, alert):
+        with self._transaction() as db:
+            alert = merge_server_state(self._get(db, *alert_key(alert)), alert)
+            self._upsert(db, alert)
+        return alert
+
+    def replace(self, client_id, alerts):
+        """
+        Replaces every alert of client_id with the given list (used for
+        syncing), keeping the server state of the alerts already known.
+        """
+        with self._transaction() as db:
+            current = {row['id']: json.loads(row['data']) for row in
+                       db.execute('SELECT id, data FROM alerts WHERE client_id = ?', (client_id,))}
+            merged = {alert['id']: alert for alert in alerts}
+            merged = [merge_server_state(current.get(alert_id), alert) for alert_id, alert in merged.items()]
+            db.execute('DELETE FROM alerts WHERE client_id = ?', (client_id,))
+            for alert in merged:
+                self._upsert(db, alert)
+        return merged
+
+    def remove(self, client_id, alert_id):
+        with self._transaction() as db:
+            deleted = db.execute('DELETE FROM alerts WHERE client_id = ? AND id = ?', (client_id, alert_id)).rowcount
+        return deleted > 0
+
+    def _select(self, query, params=()):
+        with self._lock:
+            return [json.loads(row['data']) for row in self._connection().execute(query, params)]
+
+    def list(self, client_id):
+        return self._select('SELECT data FROM alerts WHERE client_id = ?', (client_id,))
+
+    def history(self, client_id):
+        return self._select('SELECT data FROM events WHERE client_id = ? ORDER BY seq', (client_id,))
+
+    def active(self):
+        return self._select('SELECT data FROM alerts WHERE active = 1')
+
+    def set_reference_prices(self, references):
+        """Stores the reference price of percent alerts seen for the first time."""
+        with self._transaction() as db:
+            for (client_id, alert_id), price in references.items():
+                stored = self._get(db, client_id, alert_id)
+                if stored is not None and stored['reference_price'] is None:
+                    stored['reference_price'] = price
+                    self._upsert(db, stored)
+
+    def mark_triggered(self, triggered):
+        """
+        Deactivates triggered alerts and appends them to the event log,
+        keeping the last history_size events of each client.
+
+        Args:
+            triggered: List of (alert, price) tuples
+
+        Returns:
+            List of trigger events (alert fields plus triggered_at/price_at_trigger)
+        """
+        events = []
+        now = datetime.now().isoformat()
+        with self._transaction() as db:
+            for alert, price in triggered:
+                stored = self._get(db, *alert_key(alert))
+                # Rimosso o già scattato (anche in un altro processo) dopo la lettura del tick
+                if stored is None or not stored['active']:
+                    continue
+                stored['active'] = False
+                stored['triggered_at'] = now
+                self._upsert(db, stored)
+                event = dict(stored, price_at_trigger=price)
+                db.execute('INSERT INTO events (client_id, data) VALUES (?, ?)',
+                           (stored['client_id'], json.dumps(event)))
+                db.execute("""
+                    DELETE FROM events WHERE client_id = ? AND seq NOT IN
+                        (SELECT seq FROM events WHERE client_id = ? ORDER BY seq DESC LIMIT ?)
+                """, (stored['client_id'], stored['client_id'], self.history_size))
+                events.append(event)
+        return events
+
+    def last_event(self):
+        """Sequence number of the newest trigger event (0 if there is none)."""
+        with self._lock:
+            return self._connection().execute('SELECT COALESCE(MAX(seq), 0) FROM events').fetchone()[0]
+
+    def events_since(self, seq):
+        """Trigger events newer than seq, as a list of (seq, event)."""
+        with self._lock:
+            rows = self._connection().execute('SELECT seq, data FROM events WHERE seq > ? ORDER BY seq',
+                                              (seq,)).fetchall()
+        return [(row['seq'], json.loads(row['data'])) for row in rows]
+
+    def set_last_run(self, value):
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('last_run', ?)", (value,))
+
+    def last_run(self):
+        """Time of the scheduler's last completed tick, whichever process ran it."""
+        with self._lock:
+            row = self._connection().execute("SELECT value FROM state WHERE key = 'last_run'").fetchone()
+        return row['value'] if row else None
+
+
+def evaluate_alerts(alerts, prices):
+    """
+    Evaluates all alerts against current prices in one vectorized pass.
+
+    Args:
+        alerts: List of alert dicts
+        prices: Dict mapping (asset_type, symbol) to the current price
+
+    Returns:
+        Tuple (triggered, references): list of (alert, price) that fired and a
+        dict (client_id, alert_id) -> price for percent alerts still lacking a reference
+    """
+    if not alerts:
+        return [], {}
+
+    price = np.array([prices.get((a['asset_type'], a['symbol']), np.nan) for a in alerts], dtype=float)
+    target = np.array([np.nan if a['price_target'] is None else a['price_target'] for a in alerts], dtype=float)
+    reference = np.array([np.nan if a['reference_price'] is None else a['reference_price'] for a in alerts], dtype=float)
+    percent = np.array([a['percent'] or 0.0 for a in alerts], dtype=float)
+    is_percent = np.array([a['threshold_type'] == 'percent' for a in alerts])
+    above = np.array([a['condition'] == 'above' for a in alerts])
+
+    move = np.where(above, 1 + percent / 100, 1 - percent / 100)
+    target = np.where(is_percent, reference * move, target)
+    has_price = ~np.isnan(price)
+    with np.errstate(invalid='ignore'):
+        hit = np.where(above, price >= target, price <= target) & has_price & ~np.isnan(target)
+
+    needs_reference = is_percent & np.isnan(reference) & has_price
+    triggered = [(alerts[i], float(price[i])) for i in np.flatnonzero(hit)]
+    references = {alert_key(alerts[i]): float(price[i]) for i in np.flatnonzero(needs_reference)}
+    return triggered, references
+
+
+class AlertEngine:
+    """
+    Single background scheduler evaluating every registered alert.
+
+    Each tick takes the union of watched symbols across all clients, fetches
+    each distinct symbol once (stocks and cryptos in one bulk call each),
+    evaluates all thresholds at once and records the triggered alerts in the
+    store, from which every process delivers them to the owning client.
+    Upstream cost therefore scales with the number of distinct symbols, not
+    with the number of connected users or worker processes: the engine runs
+    only in the process elected by start_background_jobs.
+    """
+
+    def __init__(self, store, interval):
+        self.store = store
+        self.interval = interval
+        self._thread = None
+        self._stop = threading.Event()
+
+    def tick(self):
+        alerts = self.store.active()
+        if not alerts:
+            return []
+
+        prices = {}
+        for asset_type, fetch in (('stock', fetch_stock_quotes), ('crypto', fetch_crypto_quotes)):
+            symbols = sorted({a['symbol'] for a in alerts if a['asset_type'] == asset_type})
+            try:
+                for symbol, quote in fetch(symbols).items():
+                    prices[(asset_type, symbol)] = quote['current_price']
+            except Exception as e:
+                print(f"Errore nel recupero dei prezzi {asset_type} per gli alert: {e}")
+
+        triggered, references = evaluate_alerts(alerts, prices)
+        if references:
+            self.store.set_reference_prices(references)
+        events = self.store.mark_triggered(triggered) if triggered else []
+        self.store.set_last_run(datetime.now().isoformat())
+        return events
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Errore nella valutazione degli alert: {e}")
+            self._stop.wait(max(0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='alert-engine', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+class AlertRelay:
+    """
+    Publishes on the local broker the trigger events recorded in the store
+    by the scheduler, which may run in another process. Started by the first
+    SSE subscriber of the process; only events newer than that are relayed.
+    """
+
+    def __init__(self, store, broker, interval):
+        self.store = store
+        self.broker = broker
+        self.interval = interval
+        self._seq = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def relay(self):
+        if self._seq is None:
+            self._seq = self.store.last_event()
+            return 0
+        delivered = 0
+        for seq, event in self.store.events_since(self._seq):
+            self._seq = seq
+            delivered += self.broker.publish(alert_channel(event['client_id']), 'alert', event)
+        return delivered
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.relay()
+            except Exception as e:
+                print(f"Errore nell'inoltro degli alert: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            # La posizione iniziale va letta prima di rispondere al primo iscritto
+            self._seq = self.store.last_event()
+            self._thread = threading.Thread(target=self._run, name='alert-relay', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+alert_store = AlertStore(ALERTS_DB_FILE, ALERTS_HISTORY_SIZE)
+alert_engine = AlertEngine(alert_store, ALERTS_POLL_INTERVAL)
+alert_relay = AlertRelay(alert_store, broker, ALERTS_RELAY_INTERVAL)
@@ -0,0 +1,196 @@
+# services/coin_index.py
+
+import json
+import os
+import threading
+import time
+
+from utils.singleflight import SingleFlight
+
+# Dopo una costruzione fallita l'indice vuoto non viene ricostruito prima di questi secondi
+BUILD_RETRY_SECONDS = 60
+
+
+class CoinIndexUnavailable(RuntimeError):
+    """The index is empty and cannot be built right now (CoinGecko down or rate limited)."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CoinIndex:
+    """
+    Local CoinGecko symbol -> coin id index.
+
+    Built from coins/list (every coin's id, symbol and name) plus the first
+    pages of coins/markets for market cap ranks, persisted to disk and
+    refreshed in the background once it is older than max_age seconds.
+
+    Many coins share a ticker symbol, so each symbol resolves to exactly one
+    coin with this rule:
+        1. the coin with the best (lowest) market cap rank;
+        2. among unranked coins, the one whose id equals its lower-cased name
+           (the canonical listing, e.g. 'bitcoin' over 'bitcoin-wrapped');
+        3. otherwise the lexicographically smallest id.
+    """
+
+    def __init__(self, path, fetch, max_age, rank_pages=4):
+        self.path = path
+        self.fetch = fetch
+        self.max_age = max_age
+        self.rank_pages = rank_pages
+        self.built_at = 0
+        self._by_symbol = {}
+        self._by_id = {}
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._failed_at = 0
+        self._refreshing = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._set(stored.get('coins', []), stored.get('built_at', 0))
+
+    def _set(self, coins, built_at):
+        by_id = {coin['id']: coin for coin in coins}
+        by_symbol = {}
+        for coin in sorted(coins, key=self._preference):
+            by_symbol.setdefault(coin['symbol'], coin)
+        with self._lock:
+            self._by_id = by_id
+            self._by_symbol = by_symbol
+            self.built_at = built_at
+
+    @staticmethod
+    def _preference(coin):
+        rank = coin.get('rank')
+        canonical = coin['id'] == coin.get('name', '').lower()
+        return (rank is None, rank or 0, not canonical, coin['id'])
+
+    def build(self):
+        """
+        Downloads the coin list and market cap ranks and rebuilds the index.
+        Concurrent callers share one build.
+
+        Raises:
+            RuntimeError: if CoinGecko does not return the coin list
+        """
+        try:
+            return self._flight.do('build', self._build)
+        except Exception:
+            self._failed_at = time.time()
+            raise
+
+    def _build(self):
+        response = self.fetch("coins/list")
+        if response.status_code != 200:
+            raise RuntimeError(f"coins/list ha restituito {response.status_code}")
+        coins = {
+            coin['id']: {'id': coin['id'], 'symbol': coin['symbol'].lower(), 'name': coin.get('name', '')}
+            for coin in response.json() if coin.get('id') and coin.get('symbol')
+        }
+
+        for page in range(1, self.rank_pages + 1):
+            markets = self.fetch("coins/markets", {
+                "vs_currency": "usd",
+                "order": "market_cap_desc",
+                "per_page": 250,
+                "page": page
+            })
+            if markets.status_code != 200:
+                print(f"Ranking CoinGecko non disponibile (pagina {page}): {markets.status_code}")
+                break
+            for coin in markets.json():
+                if coin.get('id') in coins and coin.get('market_cap_rank'):
+                    coins[coin['id']]['rank'] = coin['market_cap_rank']
+
+        coin_list = list(coins.values())
+        built_at = time.time()
+        self._set(coin_list, built_at)
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'built_at': built_at, 'coins': coin_list}, f)
+        os.replace(tmp_path, self.path)
+        return len(coin_list)
+
+    def refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.build()
+            except Exception as e:
+                print(f"Errore nell'aggiornamento dell'indice delle crypto: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name='coin-index-refresh', daemon=True).start()
+
+    def warm_up(self):
+        """Starts a background build at startup if the index is missing or stale."""
+        if not self._by_symbol or time.time() - self.built_at > self.max_age:
+            self.refresh_in_background()
+
+    def ensure_ready(self):
+        """
+        Builds the index synchronously if it is empty, or schedules a
+        background refresh if it is stale.
+
+        Raises:
+            CoinIndexUnavailable: if the index is empty and the build fails,
+                or failed less than BUILD_RETRY_SECONDS ago
+        """
+        if not self._by_symbol:
+            retry_after = BUILD_RETRY_SECONDS - (time.time() - self._failed_at)
+            if retry_after > 0:
+                raise CoinIndexUnavailable("Indice delle crypto non disponibile", int(retry_after) + 1)
+            try:
+                self.build()
+            except Exception as e:
+                raise CoinIndexUnavailable(f"Indice delle crypto non disponibile: {e}", BUILD_RETRY_SECONDS) from e
+        elif time.time() - self.built_at > self.max_age:
+            self.refresh_in_background()
+
+    def lookup(self, symbol):
+        """
+        Resolves a symbol (e.g. 'btc', 'ETHUSDT') or a coin id to its coin.
+
+        Returns:
+            Dict with 'id', 'symbol', 'name' (and 'rank' when known), or None
+
+        Raises:
+            CoinIndexUnavailable: see ensure_ready
+        """
+        self.ensure_ready()
+        key = symbol.lower()
+        coin = self._by_symbol.get(key)
+        if coin is None and key.endswith('usdt'):
+            coin = self._by_symbol.get(key[:-len('usdt')])
+        if coin is None:
+            coin = self._by_id.get(key)
+        return coin
+
+    def coins(self):
+        """The preferred coin of every symbol (no upstream call, may be empty)."""
+        with self._lock:
+            return list(self._by_symbol.values())
+
+    def stats(self):
+        return {
+            'coins': len(self._by_id),
+            'symbols': len(self._by_symbol),
+            'built_at': self.built_at,
+            'failed_at': self._failed_at or None
+        }
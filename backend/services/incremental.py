@@ -0,0 +1,378 @@
+# services/incremental.py
+
+import json
+import math
+import os
+import threading
+from collections import deque
+
+import pandas as pd
+
+from config import INDICATOR_STATE_DIR
+from services.timeseries_store import timeseries_store
+
+
+class RollingSum:
+    """Sum of the last `length` values, updated in O(1) per value."""
+
+    def __init__(self, length, window=(), total=0.0):
+        self.length = length
+        self.window = deque(window, maxlen=length)
+        self.total = total
+
+    def push(self, x):
+        if len(self.window) == self.length:
+            self.total -= self.window[0]
+        self.window.append(x)
+        self.total += x
+
+    def peek(self, x):
+        """Sum the window would have after push(x), or None if not yet full."""
+        if len(self.window) + 1 < self.length:
+            return None
+        evicted = self.window[0] if len(self.window) == self.length else 0.0
+        return self.total - evicted + x
+
+    def to_dict(self):
+        return {'length': self.length, 'window': list(self.window), 'total': self.total}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['length'], data['window'], data['total'])
+
+
+class Ema:
+    """EMA seeded with the SMA of the first `length` values (same as the indicator engine)."""
+
+    def __init__(self, length, count=0, value=0.0):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.count = count
+        self.value = value  # somma dei valori finché count < length, poi la EMA
+
+    def _next(self, x):
+        if self.count + 1 < self.length:
+            return None, self.value + x
+        if self.count + 1 == self.length:
+            seed = (self.value + x) / self.length
+            return seed, seed
+        ema = self.alpha * x + (1 - self.alpha) * self.value
+        return ema, ema
+
+    def push(self, x):
+        _, self.value = self._next(x)
+        self.count += 1
+
+    def peek(self, x):
+        return self._next(x)[0]
+
+    def to_dict(self):
+        return {'length': self.length, 'count': self.count, 'value': self.value}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['length'], data['count'], data['value'])
+
+
+class WilderAverage:
+    """
+    Wilder moving average (alpha = 1/length) in the bias-corrected form
+    pandas uses for ewm(adjust=True): numerator and denominator both decay
+    by (1 - alpha) per step, so each update is O(1).
+    """
+
+    def __init__(self, length, count=0, numerator=0.0, denominator=0.0):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        self.count = count
+        self.numerator = numerator
+        self.denominator = denominator
+
+    def _next(self, x):
+        return x + self.decay * self.numerator, 1.0 + self.decay * self.denominator
+
+    def push(self, x):
+        self.numerator, self.denominator = self._next(x)
+        self.count += 1
+
+    def peek(self, x):
+        if self.count + 1 < self.length:
+            return None
+        numerator, denominator = self._next(x)
+        return numerator / denominator
+
+    def to_dict(self):
+        return {'length': self.length, 'count': self.count,
+                'numerator': self.numerator, 'denominator': self.denominator}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['length'], data['count'], data['numerator'], data['denominator'])
+
+
+class Rsi:
+    """RSI with Wilder smoothing of gains and losses."""
+
+    def __init__(self, length, prev_close=None, gain=None, loss=None):
+        self.length = length
+        self.prev_close = prev_close
+        self.gain = gain or WilderAverage(length)
+        self.loss = loss or WilderAverage(length)
+
+    def push(self, close, volume=None):
+        if self.prev_close is not None:
+            change = close - self.prev_close
+            self.gain.push(max(change, 0.0))
+            self.loss.push(max(-change, 0.0))
+        self.prev_close = close
+
+    def peek(self, close, volume=None):
+        if self.prev_close is None:
+            return None
+        change = close - self.prev_close
+        gain = self.gain.peek(max(change, 0.0))
+        loss = self.loss.peek(max(-change, 0.0))
+        if gain is None or gain + loss == 0:
+            return None
+        return 100 * gain / (gain + loss)
+
+    def to_dict(self):
+        return {'length': self.length, 'prev_close': self.prev_close,
+                'gain': self.gain.to_dict(), 'loss': self.loss.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['length'], data['prev_close'],
+                   WilderAverage.from_dict(data['gain']), WilderAverage.from_dict(data['loss']))
+
+
+class Sma:
+    def __init__(self, length, closes=None):
+        self.length = length
+        self.closes = closes or RollingSum(length)
+
+    def push(self, close, volume=None):
+        self.closes.push(close)
+
+    def peek(self, close, volume=None):
+        total = self.closes.peek(close)
+        return None if total is None else total / self.length
+
+    def to_dict(self):
+        return {'length': self.length, 'closes': self.closes.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['length'], RollingSum.from_dict(data['closes']))
+
+
+class EmaIndicator:
+    def __init__(self, length, ema=None):
+        self.length = length
+        self.ema = ema or Ema(length)
+
+    def push(self, close, volume=None):
+        self.ema.push(close)
+
+    def peek(self, close, volume=None):
+        return self.ema.peek(close)
+
+    def to_dict(self):
+        return {'length': self.length, 'ema': self.ema.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['length'], Ema.from_dict(data['ema']))
+
+
+class RollingVwap:
+    """Rolling VWAP over `length` bars: sum(close * volume) / sum(volume)."""
+
+    def __init__(self, length, traded=None, volume=None):
+        self.length = length
+        self.traded = traded or RollingSum(length)
+        self.volume = volume or RollingSum(length)
+
+    def push(self, close, volume):
+        self.traded.push(close * volume)
+        self.volume.push(volume)
+
+    def peek(self, close, volume):
+        traded = self.traded.peek(close * volume)
+        total_volume = self.volume.peek(volume)
+        if traded is None or not total_volume:
+            return None
+        return traded / total_volume
+
+    def to_dict(self):
+        return {'length': self.length, 'traded': self.traded.to_dict(), 'volume': self.volume.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['length'], RollingSum.from_dict(data['traded']), RollingSum.from_dict(data['volume']))
+
+
+KINDS = {'sma': Sma, 'ema': EmaIndicator, 'rsi': Rsi, 'vwap': RollingVwap}
+
+# Colonne mantenute in modo incrementale (stessi nomi del motore degli indicatori)
+DEFAULT_STATES = (
+    ('RSI_14', 'rsi', 14),
+    ('SMA_50', 'sma', 50),
+    ('EMA_20', 'ema', 20),
+    ('VWAP_20', 'vwap', 20),
+    ('SMA_5', 'sma', 5),
+    ('SMA_10', 'sma', 10),
+)
+
+
+class SymbolIndicators:
+    """
+    Incremental indicator state of one symbol.
+
+    Every closed bar is pushed once into each state; the still-forming last
+    bar is kept aside as `pending` and only peeked at, so a live price can
+    be applied any number of times without corrupting the state. When a
+    newer bar shows up, the pending one is committed first.
+    """
+
+    def __init__(self, symbol, states=None, last_time=None, last_close=None, pending=None):
+        self.symbol = symbol
+        self.states = states or {name: KINDS[kind](length) for name, kind, length in DEFAULT_STATES}
+        self.last_time = last_time
+        self.last_close = last_close
+        self.pending = pending
+
+    def add_bar(self, time, close, volume):
+        """Adds or replaces the forming bar at `time` (ISO string)."""
+        if self.pending is not None and time > self.pending['time']:
+            for state in self.states.values():
+                state.push(self.pending['close'], self.pending['volume'])
+            self.last_time = self.pending['time']
+            self.last_close = self.pending['close']
+        self.pending = {'time': time, 'close': close, 'volume': volume}
+
+    def values(self, price=None):
+        """
+        Indicator values on the forming bar, optionally at a live price.
+
+        Returns:
+            Dict column -> value (None while a state is still warming up)
+        """
+        if self.pending is None:
+            return {name: None for name in self.states}
+        close = self.pending['close'] if price is None else price
+        return {name: state.peek(close, self.pending['volume']) for name, state in self.states.items()}
+
+    def to_dict(self):
+        return {
+            'symbol': self.symbol,
+            'last_time': self.last_time,
+            'last_close': self.last_close,
+            'pending': self.pending,
+            'states': {name: [type(state).__name__, state.to_dict()] for name, state in self.states.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        classes = {kind.__name__: kind for kind in KINDS.values()}
+        states = {name: classes[kind].from_dict(state) for name, (kind, state) in data['states'].items()}
+        return cls(data['symbol'], states, data['last_time'], data['last_close'], data['pending'])
+
+
+class IncrementalIndicators:
+    """
+    Per-symbol incremental indicators fed from the local OHLCV store.
+
+    The first sync replays the last year of daily bars once; after that only
+    bars newer than the last one seen are applied, so a refresh costs O(new
+    bars) regardless of the indicator lookbacks. States are persisted as
+    JSON under INDICATOR_STATE_DIR.
+    """
+
+    def __init__(self, root, history):
+        self.root = root
+        self.history = history
+        self._symbols = {}
+        self._lock = threading.Lock()
+
+    def _path(self, symbol):
+        return os.path.join(self.root, f"{symbol}.json")
+
+    def _load(self, symbol):
+        try:
+            with open(self._path(symbol)) as f:
+                return SymbolIndicators.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return SymbolIndicators(symbol)
+
+    def _save(self, indicators):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self._path(indicators.symbol)}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(indicators.to_dict(), f)
+        os.replace(tmp_path, self._path(indicators.symbol))
+
+    def _get(self, symbol):
+        indicators = self._symbols.get(symbol)
+        if indicators is None:
+            indicators = self._symbols[symbol] = self._load(symbol)
+        return indicators
+
+    def _is_adjusted(self, indicators, frame):
+        """True if the last committed close no longer matches the stored history (split/dividend)."""
+        if indicators.last_time is None:
+            return False
+        position = frame.index.searchsorted(pd.Timestamp(indicators.last_time, tz=frame.index.tz))
+        if position >= len(frame) or frame.index[position].strftime('%Y-%m-%d') != indicators.last_time:
+            return True
+        return not math.isclose(float(frame['Close'].iloc[position]), indicators.last_close, rel_tol=1e-6)
+
+    def sync(self, symbol):
+        """
+        Applies the stored bars newer than the state's last one. The state
+        is written to disk only when a bar was committed or the forming bar
+        changed, not on every request.
+        """
+        symbol = symbol.upper()
+        frame = self.history(symbol)
+        with self._lock:
+            indicators = self._get(symbol)
+            if frame.empty:
+                return indicators
+            saved = (indicators.last_time, indicators.pending)
+            if self._is_adjusted(indicators, frame):
+                indicators = self._symbols[symbol] = SymbolIndicators(symbol)
+                saved = None
+
+            # Solo le barre dalla barra in formazione in poi: O(barre nuove)
+            since = indicators.pending['time'] if indicators.pending else indicators.last_time
+            start = frame.index.searchsorted(pd.Timestamp(since, tz=frame.index.tz)) if since else 0
+            new = frame.iloc[start:]
+            if new.empty:
+                return indicators
+            closes = new['Close'].to_numpy(dtype=float).tolist()
+            volumes = new['Volume'].to_numpy(dtype=float).tolist()
+            for time, close, volume in zip(new.index.strftime('%Y-%m-%d'), closes, volumes):
+                if not math.isnan(close):
+                    indicators.add_bar(time, close, 0.0 if math.isnan(volume) else volume)
+            # add_bar sostituisce il dict pending: il confronto è per valore
+            if (indicators.last_time, indicators.pending) != saved:
+                self._save(indicators)
+            return indicators
+
+    def latest(self, symbol, price=None):
+        """
+        Current indicator values for a symbol, optionally at a live price.
+
+        Returns:
+            Tuple (values, pending bar) where values maps column -> value
+        """
+        indicators = self.sync(symbol)
+        with self._lock:
+            return indicators.values(price), dict(indicators.pending or {})
+
+
+incremental_indicators = IncrementalIndicators(
+    INDICATOR_STATE_DIR, lambda symbol: timeseries_store.history(symbol, '1y', '1d')
+)
+
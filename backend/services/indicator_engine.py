@@ -0,0 +1,463 @@
+# services/indicator_engine.py
+
+import numpy as np
+import pandas as pd
+
+# Righe del buffer OHLCV condiviso
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(5)
+OHLCV_SOURCE_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+MAX_LENGTH = 500
+
+
+def ohlcv_buffer(frames):
+    """
+    Stacks OHLCV frames into one float64 buffer of shape (5, symbols, bars).
+
+    Frames are aligned on the union of their indexes, so symbols with a
+    shorter history get leading NaNs (every kernel below skips them).
+
+    Args:
+        frames: A yfinance OHLCV DataFrame, or a list of them
+
+    Returns:
+        Tuple (buffer, index): buffer is (5, bars) for a single frame and
+        (5, symbols, bars) for a list; index is the shared DatetimeIndex
+    """
+    if isinstance(frames, pd.DataFrame):
+        buffer, index = ohlcv_buffer([frames])
+        return buffer[:, 0, :], index
+    index = frames[0].index
+    for frame in frames[1:]:
+        index = index.union(frame.index)
+    buffer = np.full((5, len(frames), len(index)), np.nan)
+    for i, frame in enumerate(frames):
+        aligned = frame.reindex(index)
+        for row, column in enumerate(OHLCV_SOURCE_COLUMNS):
+            if column in aligned.columns:
+                buffer[row, i] = aligned[column].to_numpy(dtype=float)
+    return buffer, index
+
+
+class Workspace:
+    """
+    Kernel results for one buffer, computed once and shared by every
+    indicator that needs them (e.g. MACD and EMA(12) reuse the same EMA).
+
+    All kernels operate on the last axis of arrays shaped (..., bars); the
+    rolling/exponential ones run column-wise through pandas in C, so the
+    cost does not grow with the number of symbols in Python.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self._results = {}
+
+    def source(self, row):
+        return self.buffer[row]
+
+    def _memo(self, key, compute):
+        if key not in self._results:
+            self._results[key] = compute()
+        return self._results[key]
+
+    @staticmethod
+    def _columnwise(x, fn):
+        flat = x.reshape(-1, x.shape[-1])
+        out = fn(pd.DataFrame(flat.T)).to_numpy(dtype=float).T
+        return out.reshape(x.shape)
+
+    def rolling(self, name, x, length, op, **kwargs):
+        return self._memo(('rolling', name, length, op),
+                          lambda: self._columnwise(x, lambda f: getattr(f.rolling(length, min_periods=length), op)(**kwargs)))
+
+    def sma(self, name, x, length):
+        return self.rolling(name, x, length, 'mean')
+
+    def ema(self, name, x, length):
+        """EMA seeded with the SMA of the first `length` values (as pandas_ta does)."""
+        def compute():
+            seed = self.sma(name, x, length)
+            valid = ~np.isnan(seed)
+            before_seed = np.cumsum(valid, axis=-1) == 0
+            seeded = np.where(before_seed, np.nan, x)
+            first = valid & (np.cumsum(valid, axis=-1) == 1)
+            seeded = np.where(first, seed, seeded)
+            return self._columnwise(seeded, lambda f: f.ewm(span=length, adjust=False).mean())
+        return self._memo(('ema', name, length), compute)
+
+    def rma(self, name, x, length):
+        """Wilder's moving average (alpha = 1/length)."""
+        return self._memo(('rma', name, length),
+                          lambda: self._columnwise(x, lambda f: f.ewm(alpha=1.0 / length, min_periods=length).mean()))
+
+    def diff(self, name, x):
+        def compute():
+            out = np.full(x.shape, np.nan)
+            out[..., 1:] = np.diff(x, axis=-1)
+            return out
+        return self._memo(('diff', name), compute)
+
+    def shift(self, name, x, periods):
+        def compute():
+            out = np.full(x.shape, np.nan)
+            out[..., periods:] = x[..., :-periods]
+            return out
+        return self._memo(('shift', name, periods), compute)
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator != 0, numerator / denominator, np.nan)
+
+
+# --- Indicatori: ognuno riceve il workspace e i parametri e restituisce
+# --- (serie nell'ordine di IndicatorSpec.outputs, serie usata dalle regole dei segnali)
+
+def _sma(ws, length):
+    close = ws.source(CLOSE)
+    sma = ws.sma('close', close, length)
+    return (sma,), _ratio(close, sma)
+
+
+def _ema(ws, length):
+    close = ws.source(CLOSE)
+    ema = ws.ema('close', close, length)
+    return (ema,), _ratio(close, ema)
+
+
+def _rsi(ws, length):
+    change = ws.diff('close', ws.source(CLOSE))
+    gain = ws.rma('gain', np.where(change > 0, change, np.where(np.isnan(change), np.nan, 0.0)), length)
+    loss = ws.rma('loss', np.where(change < 0, -change, np.where(np.isnan(change), np.nan, 0.0)), length)
+    rsi = 100 * _ratio(gain, gain + loss)
+    return (rsi,), rsi
+
+
+def _macd(ws, fast, slow, signal):
+    close = ws.source(CLOSE)
+    macd = ws.ema('close', close, fast) - ws.ema('close', close, slow)
+    signal_line = ws.ema(f"macd_{fast}_{slow}", macd, signal)
+    histogram = macd - signal_line
+    return (macd, signal_line, histogram), histogram
+
+
+def _bbands(ws, length, std):
+    close = ws.source(CLOSE)
+    middle = ws.sma('close', close, length)
+    deviation = ws.rolling('close', close, length, 'std', ddof=0)
+    lower = middle - std * deviation
+    upper = middle + std * deviation
+    percent = _ratio(close - lower, upper - lower)
+    return (lower, middle, upper, percent), percent
+
+
+def _atr(ws, length):
+    high, low, close = ws.source(HIGH), ws.source(LOW), ws.source(CLOSE)
+    prev_close = ws.shift('close', close, 1)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    true_range[..., 0] = np.nan
+    atr = ws.rma('true_range', true_range, length)
+    return (atr,), None
+
+
+def _stoch(ws, k, d, smooth_k):
+    high, low, close = ws.source(HIGH), ws.source(LOW), ws.source(CLOSE)
+    lowest = ws.rolling('low', low, k, 'min')
+    highest = ws.rolling('high', high, k, 'max')
+    raw = 100 * _ratio(close - lowest, highest - lowest)
+    stoch_k = ws.sma(f"stoch_{k}", raw, smooth_k)
+    stoch_d = ws.sma(f"stoch_{k}_{smooth_k}", stoch_k, d)
+    return (stoch_k, stoch_d), stoch_k
+
+
+def _obv(ws):
+    close, volume = ws.source(CLOSE), ws.source(VOLUME)
+    direction = np.nan_to_num(np.sign(ws.diff('close', close)))
+    direction[..., 0] = 1
+    obv = np.nancumsum(direction * volume, axis=-1)
+    obv[np.isnan(close)] = np.nan
+    return (obv,), None
+
+
+def _vwap(ws, length):
+    close, volume = ws.source(CLOSE), ws.source(VOLUME)
+    traded = ws.rolling('close_volume', close * volume, length, 'sum')
+    vwap = _ratio(traded, ws.rolling('volume', volume, length, 'sum'))
+    return (vwap,), _ratio(close, vwap)
+
+
+def _roc(ws, length):
+    close = ws.source(CLOSE)
+    roc = 100 * (_ratio(close, ws.shift('close', close, length)) - 1)
+    return (roc,), roc
+
+
+def _trend(ws, short, long):
+    close = ws.source(CLOSE)
+    trend = _ratio(ws.sma('close', close, short), ws.sma('close', close, long))
+    return (trend,), trend
+
+
+class IndicatorSpec:
+    """
+    Catalogue entry: parameter names/types/defaults, kernel, output column
+    templates (pandas_ta naming) and signal label/rules.
+    """
+
+    __slots__ = ('name', 'params', 'compute', 'outputs', 'label', 'rules')
+
+    def __init__(self, name, params, compute, outputs, label, rules=()):
+        self.name = name
+        self.params = params
+        self.compute = compute
+        self.outputs = outputs
+        self.label = label
+        self.rules = rules
+
+    def _format(self, template, values):
+        return template.format(**{param: v for (param, _, _), v in zip(self.params, values)})
+
+    def column_names(self, values):
+        return [self._format(template, values) for template in self.outputs]
+
+    def signal_label(self, values):
+        return self._format(self.label, values)
+
+    def warmup(self, values):
+        """Upper bound on the bars consumed before the first defined value."""
+        return int(sum(v for (param, kind, _), v in zip(self.params, values) if kind is int))
+
+
+# Regole dei segnali come tabelle di soglie: (operatore, soglia, segnale, forza),
+# valutate in ordine; per ogni indicatore vale la prima regola soddisfatta
+def _price_ratio_rules(band):
+    """Price above/below a level, 'Strong' beyond +/- band (as a fraction)."""
+    return (
+        ('>', 1 + band, 'Above', 'Strong'),
+        ('>', 1, 'Above', 'Moderate'),
+        ('<', 1 - band, 'Below', 'Strong'),
+        ('<', 1, 'Below', 'Moderate'),
+    )
+
+
+CATALOGUE = {spec.name: spec for spec in (
+    IndicatorSpec('sma', (('length', int, 50),), _sma, ('SMA_{length}',), 'SMA_{length}', _price_ratio_rules(0.05)),
+    IndicatorSpec('ema', (('length', int, 20),), _ema, ('EMA_{length}',), 'EMA_{length}', _price_ratio_rules(0.03)),
+    IndicatorSpec('rsi', (('length', int, 14),), _rsi, ('RSI_{length}',), 'RSI', (
+        ('<', 30, 'Oversold', 'Strong'),
+        ('<', 40, 'Oversold', 'Moderate'),
+        ('>', 70, 'Overbought', 'Strong'),
+        ('>', 60, 'Overbought', 'Moderate'),
+    )),
+    IndicatorSpec('macd', (('fast', int, 12), ('slow', int, 26), ('signal', int, 9)), _macd,
+                  ('MACD_{fast}_{slow}_{signal}', 'MACDs_{fast}_{slow}_{signal}', 'MACDh_{fast}_{slow}_{signal}'), 'MACD', (
+        ('>', 0, 'Bullish', 'Moderate'),
+        ('<', 0, 'Bearish', 'Moderate'),
+    )),
+    IndicatorSpec('bbands', (('length', int, 20), ('std', float, 2.0)), _bbands,
+                  ('BBL_{length}_{std}', 'BBM_{length}_{std}', 'BBU_{length}_{std}', 'BBP_{length}_{std}'), 'BBANDS', (
+        ('>', 1, 'Above upper band', 'Strong'),
+        ('<', 0, 'Below lower band', 'Strong'),
+    )),
+    IndicatorSpec('atr', (('length', int, 14),), _atr, ('ATR_{length}',), 'ATR'),
+    IndicatorSpec('stoch', (('k', int, 14), ('d', int, 3), ('smooth_k', int, 3)), _stoch,
+                  ('STOCHk_{k}_{d}_{smooth_k}', 'STOCHd_{k}_{d}_{smooth_k}'), 'STOCH', (
+        ('<', 20, 'Oversold', 'Strong'),
+        ('>', 80, 'Overbought', 'Strong'),
+    )),
+    IndicatorSpec('obv', (), _obv, ('OBV',), 'OBV'),
+    IndicatorSpec('vwap', (('length', int, 20),), _vwap, ('VWAP_{length}',), 'VWAP', _price_ratio_rules(0.02)),
+    IndicatorSpec('roc', (('length', int, 10),), _roc, ('ROC_{length}',), 'ROC', (
+        ('>', 5, 'Bullish', 'Strong'),
+        ('>', 0, 'Bullish', 'Moderate'),
+        ('<', -5, 'Bearish', 'Strong'),
+        ('<', 0, 'Bearish', 'Moderate'),
+    )),
+    IndicatorSpec('trend', (('short', int, 5), ('long', int, 10)), _trend, ('TREND_{short}_{long}',), 'Trend', (
+        ('>', 1.02, 'Bullish', 'Strong'),
+        ('>', 1, 'Bullish', 'Moderate'),
+        ('<', 0.98, 'Bearish', 'Strong'),
+        ('<', 1, 'Bearish', 'Moderate'),
+    )),
+)}
+
+
+def _parse_values(spec, raw):
+    if len(raw) > len(spec.params):
+        raise ValueError(f"'{spec.name}' accepts at most {len(spec.params)} parameters")
+    values = []
+    for i, (param, kind, default) in enumerate(spec.params):
+        if i >= len(raw) or raw[i] == '':
+            values.append(default)
+            continue
+        try:
+            value = kind(raw[i])
+        except ValueError:
+            raise ValueError(f"Invalid value for {spec.name}.{param}: {raw[i]}")
+        if value <= 0 or (kind is int and value > MAX_LENGTH):
+            raise ValueError(f"{spec.name}.{param} must be between 1 and {MAX_LENGTH}")
+        values.append(value)
+    return tuple(values)
+
+
+def parse_indicators(text):
+    """
+    Parses a request like 'rsi:14,macd:12:26:9,bbands:20:2.5'.
+
+    Parameters are positional in catalogue order; missing ones use the
+    defaults. Duplicate requests are collapsed.
+
+    Returns:
+        List of (IndicatorSpec, tuple of parameter values)
+
+    Raises:
+        ValueError: on unknown indicators or invalid parameters
+    """
+    requests = []
+    for item in (part.strip() for part in text.split(',')):
+        if not item:
+            continue
+        name, *raw = item.lower().split(':')
+        spec = CATALOGUE.get(name)
+        if spec is None:
+            raise ValueError(f"Unknown indicator '{name}', available: {', '.join(sorted(CATALOGUE))}")
+        request = (spec, _parse_values(spec, raw))
+        if request not in requests:
+            requests.append(request)
+    if not requests:
+        raise ValueError("No indicators requested")
+    return requests
+
+
+# Prefisso della colonna (es. 'MACDh') -> indicatore che la produce
+COLUMN_PREFIXES = {
+    template.split('_')[0].upper(): spec
+    for spec in CATALOGUE.values() for template in spec.outputs
+}
+
+
+def resolve_column(name):
+    """
+    Maps an output column name to the request that produces it, e.g.
+    'SMA_50' -> sma(50), 'RSI' -> rsi(14), 'MACDh_5_35_5' -> macd(5, 35, 5).
+
+    Returns:
+        Tuple (request, canonical column name)
+
+    Raises:
+        ValueError: if the name does not belong to any indicator
+    """
+    prefix, *raw = name.split('_')
+    spec = COLUMN_PREFIXES.get(prefix.upper())
+    if spec is None:
+        raise ValueError(f"Unknown column '{name}'")
+    values = _parse_values(spec, raw)
+    for template, column in zip(spec.outputs, spec.column_names(values)):
+        if template.split('_')[0].upper() == prefix.upper():
+            return (spec, values), column
+
+
+# Periodo più corto che copre il riscaldamento richiesto: (periodo, sedute approssimative)
+HISTORY_PERIODS = (('60d', 40), ('6mo', 120), ('1y', 250), ('2y', 500), ('5y', 1250))
+
+
+def history_period(requests, points=1):
+    """Shortest yfinance period giving `points` defined values for every request."""
+    needed = max(spec.warmup(values) for spec, values in requests) + points
+    for period, sessions in HISTORY_PERIODS:
+        if sessions >= needed:
+            return period
+    return HISTORY_PERIODS[-1][0]
+
+
+def buffer_from_fields(fields, symbols):
+    """
+    Builds a (5, symbols, bars) buffer from per-field frames (date x symbol),
+    as returned by a multi-symbol yf.download.
+
+    Args:
+        fields: Dict mapping 'Open', 'High', 'Low', 'Close', 'Volume' to DataFrames
+        symbols: Column order of the buffer
+    """
+    index = fields['Close'].index
+    buffer = np.full((5, len(symbols), len(index)), np.nan)
+    for row, column in enumerate(OHLCV_SOURCE_COLUMNS):
+        if column in fields:
+            buffer[row] = fields[column].reindex(index=index, columns=symbols).to_numpy(dtype=float).T
+    return buffer
+
+
+def compute_indicators(buffer, requests):
+    """
+    Computes every requested indicator in one pass over a shared buffer.
+
+    Args:
+        buffer: OHLCV buffer from ohlcv_buffer, shape (5, ..., bars)
+        requests: Output of parse_indicators
+
+    Returns:
+        Tuple (columns, features): columns maps output names to arrays shaped
+        (..., bars); features holds, per request, the series its signal
+        rules are evaluated on (None when the indicator has no rules)
+    """
+    workspace = Workspace(buffer)
+    columns = {}
+    features = []
+    for spec, values in requests:
+        outputs, feature = spec.compute(workspace, *values)
+        columns.update(zip(spec.column_names(values), outputs))
+        features.append(feature if spec.rules else None)
+    return columns, features
+
+
+def evaluate_signals(requests, features):
+    """
+    Evaluates the signal rule tables on the last bar of every feature.
+
+    All rules of all requested indicators are compared at once as a
+    (rules, symbols) matrix; the first matching rule of each indicator wins.
+
+    Returns:
+        Tuple (rule_rows, matches): rule_rows lists (label, signal, strength)
+        per rule; matches is an int array (indicators, ...) with the index in
+        rule_rows of the matching rule, or -1 when no rule matched
+    """
+    rule_rows, owners, ops, thresholds, last_values = [], [], [], [], []
+    for i, ((spec, values), feature) in enumerate(zip(requests, features)):
+        if feature is None:
+            continue
+        label = spec.signal_label(values)
+        for op, threshold, signal, strength in spec.rules:
+            rule_rows.append((label, signal, strength))
+            owners.append(i)
+            ops.append(op == '>')
+            thresholds.append(threshold)
+            last_values.append(feature[..., -1])
+
+    shape = np.shape(last_values[0]) if last_values else ()
+    matches = np.full((len(requests),) + shape, -1, dtype=int)
+    if not rule_rows:
+        return rule_rows, matches
+
+    value = np.array(last_values, dtype=float)
+    threshold = np.array(thresholds, dtype=float).reshape((-1,) + (1,) * len(shape))
+    greater = np.array(ops).reshape(threshold.shape)
+    with np.errstate(invalid='ignore'):
+        hit = np.where(greater, value > threshold, value < threshold) & ~np.isnan(value)
+
+    # Le regole di ogni indicatore sono contigue: la prima soddisfatta è il minimo del blocco
+    positions = np.arange(len(rule_rows)).reshape(threshold.shape)
+    candidate = np.where(hit, positions, len(rule_rows))
+    indicators, block_starts = np.unique(owners, return_index=True)
+    first = np.minimum.reduceat(candidate, block_starts, axis=0)
+    matches[indicators] = np.where(first < len(rule_rows), first, -1)
+    return rule_rows, matches
+
+
+def signal_list(rule_rows, matches):
+    """Signals of a single symbol as [{'indicator', 'signal', 'strength'}] in request order."""
+    return [
+        {'indicator': rule_rows[m][0], 'signal': rule_rows[m][1], 'strength': rule_rows[m][2]}
+        for m in np.atleast_1d(matches).tolist() if m >= 0
+    ]
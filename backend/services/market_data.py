@@ -0,0 +1,89 @@
+# services/market_data.py
+
+import yfinance as yf
+
+from services.news_store import news_store
+from utils.cache import cache
+from utils.metrics import upstream_call
+
+INTRADAY_INTERVALS = ('1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h')
+STATEMENTS = ('financials', 'balance_sheet', 'cashflow')
+
+
+def get_history(symbol, period=None, interval='1d', **kwargs):
+    """
+    Cached equivalent of yf.Ticker(symbol).history(...).
+
+    Intraday bars use the short 'history' TTL, daily and longer bars the
+    'history_daily' one. A copy is returned so callers can add columns
+    without mutating the cached frame.
+
+    Args:
+        symbol: Ticker symbol
+        period: yfinance period string (e.g. '1d', '5y')
+        interval: yfinance interval string (default: '1d')
+        **kwargs: Any other argument accepted by Ticker.history (start, end, ...)
+
+    Returns:
+        pandas DataFrame with the OHLCV history
+    """
+    symbol = symbol.upper()
+    data_class = 'history' if interval in INTRADAY_INTERVALS else 'history_daily'
+    key = ('yf.history', symbol, period, interval, tuple(sorted(kwargs.items())))
+
+    def load():
+        with upstream_call('yfinance', 'history'):
+            return yf.Ticker(symbol).history(period=period, interval=interval, **kwargs)
+
+    data = cache.get_or_load(data_class, key, load, should_cache=lambda df: not df.empty)
+    return data.copy()
+
+
+def get_statement(symbol, name):
+    """
+    Cached equivalent of yf.Ticker(symbol).financials/.balance_sheet/.cashflow.
+
+    Args:
+        symbol: Ticker symbol
+        name: One of 'financials', 'balance_sheet', 'cashflow'
+
+    Returns:
+        pandas DataFrame with the requested statement
+    """
+    if name not in STATEMENTS:
+        raise ValueError(f"Unknown statement: {name}")
+    symbol = symbol.upper()
+
+    def load():
+        with upstream_call('yfinance', name):
+            return getattr(yf.Ticker(symbol), name)
+
+    return cache.get_or_load('financials', ('yf.statement', symbol, name), load,
+                             should_cache=lambda df: df is not None and not df.empty)
+
+
+def get_ticker_news(symbol):
+    """
+    Cached equivalent of yf.Ticker(symbol).news.
+
+    Every fetched item is also added to the local news store, tagged with
+    the symbol, so it can be found by the news search.
+
+    Args:
+        symbol: Ticker symbol
+
+    Returns:
+        List of news items as returned by yfinance
+    """
+    symbol = symbol.upper()
+
+    def load():
+        with upstream_call('yfinance', 'news'):
+            items = yf.Ticker(symbol).news or []
+        try:
+            news_store.add_ticker_news(symbol, items)
+        except Exception as e:
+            print(f"Errore nel salvataggio delle notizie di {symbol}: {e}")
+        return items
+
+    return cache.get_or_load('ticker_news', ('yf.news', symbol), load, should_cache=bool)
@@ -0,0 +1,312 @@
+# services/metadata.py
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import yfinance as yf
+
+try:
+    import fcntl
+except ImportError:  # fcntl non esiste su Windows: lì si assume un solo processo
+    fcntl = None
+
+from config import METADATA_FILE, METADATA_MAX_AGE, METADATA_MISSING_TTL, METADATA_REFRESH_HOUR
+from utils.fanout import executor
+from utils.metrics import upstream_call
+from utils.singleflight import SingleFlight
+
+NEW_YORK = ZoneInfo('America/New_York')
+
+# Campo del record -> chiavi di ticker.info (vince la prima presente)
+RECORD_FIELDS = {
+    'name': ('longName', 'shortName'),
+    'short_name': ('shortName', 'longName'),
+    'exchange': ('exchange',),
+    'currency': ('currency',),
+    'sector': ('sector',),
+    'industry': ('industry',),
+    'country': ('country',),
+    'market_cap': ('marketCap',),
+    'previous_close': ('regularMarketPreviousClose', 'previousClose'),
+    'pe_ratio': ('trailingPE',),
+    'dividend_yield': ('dividendYield',),
+    'beta': ('beta',),
+    'target_high_price': ('targetHighPrice',),
+    'target_low_price': ('targetLowPrice',),
+    'target_mean_price': ('targetMeanPrice',),
+    'recommendation': ('recommendationKey',),
+    'logo_url': ('logo_url',),
+    'website': ('website',),
+    'business_summary': ('longBusinessSummary',),
+}
+
+
+def compact_record(info):
+    """
+    Keeps the reference fields of a yfinance info dict (a few hundred bytes
+    instead of the full scrape). Returns None if the ticker has no name,
+    i.e. yfinance does not know it.
+    """
+    record = {}
+    for field, keys in RECORD_FIELDS.items():
+        for key in keys:
+            if info.get(key) is not None:
+                record[field] = info[key]
+                break
+    return record if 'name' in record else None
+
+
+class MetadataStore:
+    """
+    Slow-changing ticker reference data (name, exchange, sector, market cap,
+    previous close, ...) kept apart from live quotes.
+
+    Records are compact, persisted as one JSON file shared by the worker
+    processes and served from memory; a file written by another process is
+    merged in (the most recently scraped record wins) when its mtime changes.
+    A symbol is scraped from yfinance only on its first request (unknown
+    symbols are remembered for missing_ttl seconds) and then by the nightly
+    refresh, so `ticker.info` runs about once per symbol per day. Records
+    older than max_age are still served and refreshed in the background.
+    """
+
+    def __init__(self, path, fetch_info, max_age, missing_ttl, refresh_hour):
+        self.path = path
+        self.fetch_info = fetch_info
+        self.max_age = max_age
+        self.missing_ttl = missing_ttl
+        self.refresh_hour = refresh_hour
+        self.version = 0
+        self.scrapes = 0
+        self._records = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._refreshing = set()
+        self._thread = None
+        self._stop = threading.Event()
+        self._loaded_mtime = 0
+        self._reload_if_changed()
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _merge(self, records):
+        """Adopts the records newer than the ones in memory."""
+        with self._lock:
+            changed = False
+            for symbol, record in records.items():
+                current = self._records.get(symbol)
+                if current is None or record.get('updated_at', 0) > current.get('updated_at', 0):
+                    self._records[symbol] = record
+                    changed = True
+            if changed:
+                self.version += 1
+
+    def _reload_if_changed(self):
+        # Il leader (warm-up, aggiornamento notturno) scrive il file dagli altri processi
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime > self._loaded_mtime:
+            self._loaded_mtime = mtime
+            self._merge(self._read())
+
+    def _save(self):
+        with self._save_lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(f"{self.path}.lock", 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                # Il file può contenere record più recenti scritti da un altro processo
+                self._merge(self._read())
+                with self._lock:
+                    payload = json.dumps(self._records)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    f.write(payload)
+                os.replace(tmp_path, self.path)
+                self._loaded_mtime = os.path.getmtime(self.path)
+
+    def _scrape(self, symbol):
+        """Fetches and stores one symbol (concurrent callers share the scrape)."""
+        def load():
+            record = compact_record(self.fetch_info(symbol) or {})
+            with self._lock:
+                self.scrapes += 1
+            return record
+
+        record = self._flight.do(symbol, load)
+        stored = dict(record or {'missing': True})
+        stored['updated_at'] = time.time()
+        with self._lock:
+            self._records[symbol] = stored
+            self.version += 1
+        return stored
+
+    def _is_expired(self, stored, now):
+        ttl = self.missing_ttl if stored.get('missing') else self.max_age
+        return now - stored['updated_at'] > ttl
+
+    def _refresh_in_background(self, symbols):
+        with self._lock:
+            symbols = [s for s in symbols if s not in self._refreshing]
+            self._refreshing.update(symbols)
+        if not symbols:
+            return
+
+        def run():
+            try:
+                for symbol in symbols:
+                    try:
+                        self._scrape(symbol)
+                    except Exception as e:
+                        print(f"Errore nell'aggiornamento dei metadati di {symbol}: {e}")
+                self._save()
+            finally:
+                with self._lock:
+                    self._refreshing.difference_update(symbols)
+
+        threading.Thread(target=run, name='metadata-refresh', daemon=True).start()
+
+    @staticmethod
+    def _public(stored):
+        if stored is None or stored.get('missing'):
+            return None
+        return {key: value for key, value in stored.items() if key != 'updated_at'}
+
+    def peek_many(self, symbols):
+        """Stored records only, without any upstream call."""
+        self._reload_if_changed()
+        with self._lock:
+            stored = {symbol.upper(): self._records.get(symbol.upper()) for symbol in symbols}
+        return {symbol: record for symbol, record in
+                ((symbol, self._public(value)) for symbol, value in stored.items()) if record is not None}
+
+    def get_many(self, symbols, parallel=True):
+        """
+        Reference records for many symbols; missing ones are scraped in
+        parallel, expired ones are served and refreshed in the background.
+
+        Args:
+            symbols: Ticker symbols
+            parallel: False scrapes the missing symbols inline, one at a time,
+                      for callers already running inside a 'yfinance' fan-out
+
+        Returns:
+            Dict symbol -> record (symbols unknown to yfinance are omitted)
+        """
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        now = time.time()
+        self._reload_if_changed()
+        with self._lock:
+            stored = {symbol: self._records.get(symbol) for symbol in symbols}
+
+        missing = [symbol for symbol, value in stored.items() if value is None]
+        expired = [symbol for symbol, value in stored.items() if value is not None and self._is_expired(value, now)]
+        if missing:
+            if parallel:
+                scraped, errors = executor.map('yfinance', self._scrape, missing)
+            else:
+                scraped, errors = {}, {}
+                for symbol in missing:
+                    try:
+                        scraped[symbol] = self._scrape(symbol)
+                    except Exception as e:
+                        errors[symbol] = e
+            for symbol, error in errors.items():
+                print(f"Metadati non disponibili per {symbol}: {error}")
+            stored.update(scraped)
+            if scraped:
+                self._save()
+        if expired:
+            self._refresh_in_background(expired)
+
+        return {symbol: record for symbol, record in
+                ((symbol, self._public(value)) for symbol, value in stored.items()) if record is not None}
+
+    def get(self, symbol):
+        """
+        Reference record of one symbol, or None if yfinance does not know it.
+
+        A missing record is scraped inline (still shared through the single
+        flight): callers such as the /api/stock_data sections already hold a
+        'yfinance' slot, and waiting for a second one could deadlock the pool.
+        """
+        return self.get_many([symbol], parallel=False).get(symbol.upper())
+
+    def warm_up(self, symbols):
+        """Scrapes in the background the given symbols that have no record yet."""
+        self._reload_if_changed()
+        with self._lock:
+            missing = [s.upper() for s in symbols if s.upper() not in self._records]
+        self._refresh_in_background(missing)
+
+    def refresh_all(self):
+        """Re-scrapes every stored symbol, one at a time (nightly job)."""
+        self._reload_if_changed()
+        with self._lock:
+            symbols = list(self._records)
+        for symbol in symbols:
+            if self._stop.is_set():
+                break
+            try:
+                self._scrape(symbol)
+            except Exception as e:
+                print(f"Errore nell'aggiornamento dei metadati di {symbol}: {e}")
+        self._save()
+        return len(symbols)
+
+    def _seconds_until_refresh(self):
+        now = datetime.now(tz=NEW_YORK)
+        run_at = now.replace(hour=self.refresh_hour, minute=0, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        return (run_at - now).total_seconds()
+
+    def _run(self):
+        while not self._stop.wait(self._seconds_until_refresh()):
+            try:
+                count = self.refresh_all()
+                print(f"Metadati aggiornati per {count} simboli")
+            except Exception as e:
+                print(f"Errore nell'aggiornamento notturno dei metadati: {e}")
+
+    def start(self):
+        """Starts the nightly refresh (at refresh_hour, New York time)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='metadata-nightly', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'symbols': len(self._records),
+                'missing': sum(1 for record in self._records.values() if record.get('missing')),
+                'scrapes': self.scrapes,
+                'version': self.version
+            }
+
+
+def _fetch_info(symbol):
+    with upstream_call('yfinance', 'info'):
+        return yf.Ticker(symbol).info
+
+
+metadata_store = MetadataStore(
+    METADATA_FILE, _fetch_info, METADATA_MAX_AGE, METADATA_MISSING_TTL, METADATA_REFRESH_HOUR
+)
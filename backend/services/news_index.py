@@ -0,0 +1,248 @@
+# services/news_index.py
+
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from services.search_index import tokenize
+
+# Parametri BM25 classici: saturazione della frequenza e normalizzazione per lunghezza
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Il titolo conta come se comparisse due volte
+TITLE_WEIGHT = 2
+
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have', 'in', 'is', 'it', 'its',
+    'of', 'on', 'or', 's', 'that', 'the', 'this', 'to', 'was', 'were', 'will', 'with',
+))
+
+# Parole in maiuscolo che coincidono con un simbolo ma quasi mai lo indicano
+AMBIGUOUS_SYMBOLS = frozenset((
+    'A', 'AI', 'ALL', 'ARE', 'AT', 'BE', 'C', 'CEO', 'DO', 'F', 'FOR', 'GO', 'IT', 'NEW', 'NOW', 'ON', 'ONE',
+    'OR', 'SO', 'T', 'US', 'V',
+))
+UPPERCASE_WORD = re.compile(r'(?<![\w$])\$?[A-Z][A-Z0-9.-]*[A-Z0-9]\b|\$[A-Z]\b')
+
+# Suffissi societari tolti dai nomi prima di cercarli nel testo
+CORPORATE_WORDS = frozenset((
+    'ag', 'class', 'co', 'company', 'corp', 'corporation', 'group', 'holding', 'holdings', 'inc',
+    'incorporated', 'limited', 'ltd', 'nv', 'plc', 'sa', 'se', 'the',
+))
+# Prime parole di nomi composti troppo generiche per identificare da sole la società
+GENERIC_WORDS = frozenset((
+    'advanced', 'american', 'bank', 'first', 'general', 'global', 'home', 'international', 'national',
+    'morgan', 'united',
+))
+# Solo le crypto più capitalizzate vengono riconosciute per nome
+COIN_TAG_MAX_RANK = 100
+
+
+def analyze(text):
+    """Search terms of a text: lower-cased words without stopwords, plural 's' stripped."""
+    terms = []
+    for token in tokenize(text or ''):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def name_aliases(name):
+    """
+    Word sequences that identify a company or coin name in a text, as
+    (full name, first word or None): 'Exxon Mobil Corporation' ->
+    (('exxon', 'mobil'), ('exxon',)). Returns None for an empty name.
+    """
+    words = tuple(word for word in tokenize(name or '') if word not in CORPORATE_WORDS)
+    if not words:
+        return None
+    short = words[:1] if len(words) > 1 and len(words[0]) >= 4 and words[0] not in GENERIC_WORDS else None
+    return words, short
+
+
+class NewsIndex:
+    """
+    In-memory BM25 full-text index over the articles of the local news
+    store (NewsAPI feeds and yfinance ticker news).
+
+    Titles and descriptions are tokenized into an inverted index (term ->
+    [(article, term frequency)]), with the title counted twice. Each
+    article is tagged with stock and coin symbols: the tickers it was
+    fetched for, cashtags and upper-case symbols of the known universe, and
+    company or coin names found in the text. Tags are indexed as terms too,
+    so 'aapl' also finds articles that only say 'Apple'.
+
+    The index is rebuilt from the store when its content (as recorded in
+    the database, so articles ingested by another process count too), the
+    ticker metadata or the coin index change, in the background and at most
+    once every rebuild_interval seconds, so searches never call an upstream.
+    """
+
+    def __init__(self, store, metadata, coin_index, stock_symbols, rebuild_interval=30):
+        self.store = store
+        self.metadata = metadata
+        self.coin_index = coin_index
+        self.stock_symbols = list(dict.fromkeys(s.upper() for s in stock_symbols))
+        self.rebuild_interval = rebuild_interval
+        self._source_version = None
+        self._rebuilt_at = 0
+        self._articles = []      # articoli, dal più recente
+        self._postings = {}      # termine -> [(id articolo, frequenza)]
+        self._lengths = []       # numero di termini per articolo
+        self._average_length = 0
+        self._by_symbol = {}     # simbolo -> [id articolo], dal più recente
+        self._lock = threading.Lock()
+
+    def _version(self):
+        return (self.store.version, self.metadata.version, self.coin_index.built_at)
+
+    def _taggers(self):
+        """Known symbols and name aliases (word tuple -> symbols) of stocks and top coins."""
+        symbols = set(self.stock_symbols)
+        names = [(symbol, record.get('short_name') or record.get('name'))
+                 for symbol, record in self.metadata.peek_many(self.stock_symbols).items()]
+        for coin in self.coin_index.coins():
+            if coin.get('rank') is not None and coin['rank'] <= COIN_TAG_MAX_RANK:
+                symbols.add(coin['symbol'].upper())
+                names.append((coin['symbol'].upper(), coin.get('name')))
+
+        full, short = defaultdict(set), defaultdict(set)
+        for symbol, name in names:
+            aliases = name_aliases(name)
+            if aliases is None:
+                continue
+            full[aliases[0]].add(symbol)
+            if aliases[1] is not None:
+                short[aliases[1]].add(symbol)
+        # La sola prima parola vale se non è il nome di altro ('bitcoin' di 'Bitcoin Cash') e non è condivisa
+        aliases = dict(full)
+        aliases.update((alias, owners) for alias, owners in short.items() if alias not in full and len(owners) == 1)
+        return symbols - AMBIGUOUS_SYMBOLS, aliases
+
+    @staticmethod
+    def _tags(text, words, symbols, aliases, longest):
+        tags = set()
+        for match in UPPERCASE_WORD.findall(text):
+            candidate = match.lstrip('$')
+            if match.startswith('$') or candidate in symbols:
+                tags.add(candidate)
+        # Vince il nome più lungo: 'bitcoin cash' non è anche 'bitcoin'
+        i = 0
+        while i < len(words):
+            for size in range(min(longest, len(words) - i), 0, -1):
+                owners = aliases.get(tuple(words[i:i + size]))
+                if owners:
+                    tags.update(owners)
+                    i += size
+                    break
+            else:
+                i += 1
+        return tags
+
+    def _rebuild(self):
+        version = self._version()
+        articles = self.store.all_articles()
+        symbols, aliases = self._taggers()
+        longest = max((len(alias) for alias in aliases), default=0)
+
+        postings = defaultdict(list)
+        lengths = []
+        by_symbol = defaultdict(list)
+        for doc, article in enumerate(articles):
+            text = f"{article['title']} {article.get('description') or ''}"
+            tags = set(article['symbols']) | self._tags(text, tokenize(text), symbols, aliases, longest)
+            article['symbols'] = sorted(tags)
+            terms = analyze(article['title']) * TITLE_WEIGHT + analyze(article.get('description'))
+            for tag in tags:
+                terms.extend(analyze(tag))
+            for term, count in Counter(terms).items():
+                postings[term].append((doc, count))
+            lengths.append(len(terms))
+            for tag in tags:
+                by_symbol[tag].append(doc)
+
+        with self._lock:
+            self._articles = articles
+            self._postings = dict(postings)
+            self._lengths = lengths
+            self._average_length = sum(lengths) / len(lengths) if lengths else 0
+            self._by_symbol = dict(by_symbol)
+            self._source_version = version
+
+    def _ensure_index(self):
+        if self._source_version == self._version():
+            return
+        if self._source_version is None:
+            self._rebuild()
+        elif time.time() - self._rebuilt_at > self.rebuild_interval:
+            # L'indice precedente resta in uso finché quello nuovo non è pronto
+            self._rebuilt_at = time.time()
+            threading.Thread(target=self._rebuild, name='news-index-rebuild', daemon=True).start()
+
+    def _score(self, terms, candidates):
+        """BM25 score of every candidate article matching at least one term."""
+        count = len(self._articles)
+        scores = defaultdict(float)
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, frequency in postings:
+                if candidates is not None and doc not in candidates:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[doc] / self._average_length)
+                scores[doc] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return scores
+
+    def search(self, query='', symbol=None, page=1, page_size=20):
+        """
+        Ranked full-text search, optionally restricted to a symbol.
+
+        Without a query the symbol's articles are returned newest first;
+        with one, by BM25 score (ties go to the newest article).
+
+        Args:
+            query: Free text, e.g. 'bitcoin etf', 'apple earnings'
+            symbol: Optional stock or coin symbol the articles must be tagged with
+            page: 1-based page number
+            page_size: Articles per page
+
+        Returns:
+            Tuple (list of articles with their symbols and score, total matching articles)
+        """
+        terms = analyze(query)
+        self._ensure_index()
+        with self._lock:
+            articles = self._articles
+            candidates = None
+            if symbol:
+                candidates = self._by_symbol.get(symbol.upper(), [])
+            if terms:
+                scores = self._score(terms, set(candidates) if candidates is not None else None)
+                total = len(scores)
+                ranked = heapq.nsmallest(page * page_size, scores.items(), key=lambda item: (-item[1], item[0]))
+            else:
+                docs = candidates if candidates is not None else range(len(articles))
+                total = len(docs)
+                ranked = [(doc, None) for doc in docs[:page * page_size]]
+
+        results = []
+        for doc, score in ranked[(page - 1) * page_size:]:
+            result = dict(articles[doc])
+            result['score'] = round(score, 3) if score is not None else None
+            results.append(result)
+        return results, total
+
+    def stats(self):
+        return {
+            'articles': len(self._articles),
+            'terms': len(self._postings),
+            'symbols': len(self._by_symbol)
+        }
@@ -0,0 +1,532 @@
+# services/news_store.py
+
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import (NEWS_API_KEY, NEWS_DB_FILE, NEWS_POLL_INTERVAL, NEWS_RETENTION_DAYS,
+                    NEWSAPI_DAILY_QUOTA)
+from utils.http_client import newsapi_client
+from utils.singleflight import SingleFlight
+
+NEWSAPI_EVERYTHING_URL = 'https://newsapi.org/v2/everything'
+
+# Argomento -> query NewsAPI che lo alimenta e finestra (giorni) servita dagli endpoint
+TOPICS = {
+    'economy': {
+        'params': {'q': 'economy'},
+        'window_days': None,
+    },
+    'finance': {
+        'params': {'q': '(finance OR economy OR "financial markets") AND (stocks OR investing)', 'language': 'en'},
+        'window_days': 7,
+    },
+    'markets': {
+        'params': {'q': '(stock market OR "wall street" OR "stock exchange" OR "stock trading" OR nasdaq '
+                        'OR dow OR "S&P 500")', 'language': 'en'},
+        'window_days': 4,
+    },
+    'crypto': {
+        'params': {'q': '(cryptocurrency OR bitcoin OR ethereum OR "crypto market" OR blockchain)', 'language': 'en'},
+        'window_days': 5,
+    },
+}
+
+# Un articolo appartiene all'argomento della query che l'ha restituito e a ogni
+# argomento le cui parole chiave compaiono nel titolo o nella descrizione
+TOPIC_KEYWORDS = {
+    'economy': re.compile(r'\b(econom\w*|inflation|gdp|recession|unemployment|jobs report|interest rates?|'
+                          r'central bank|federal reserve|the fed|tariffs?)\b', re.IGNORECASE),
+    'finance': re.compile(r'\b(financ\w*|invest\w*|earnings|dividends?|banks?|bonds?|portfolio)\b', re.IGNORECASE),
+    'markets': re.compile(r'(\b(stock market|wall street|stock exchange|nasdaq|dow jones|equities|stocks?|shares)\b'
+                          r'|s&p 500)', re.IGNORECASE),
+    'crypto': re.compile(r'\b(crypto\w*|bitcoin|ethereum|blockchain|btc|stablecoins?|defi|altcoins?)\b',
+                         re.IGNORECASE),
+}
+
+# Parametri di tracciamento tolti dall'URL prima della deduplicazione
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|guccounter|cmpid|ncid|fbclid|gclid)$', re.IGNORECASE)
+
+# NewsAPI sostituisce così gli articoli rimossi dall'editore
+REMOVED_TITLE = '[Removed]'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    url TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    content TEXT,
+    url_to_image TEXT,
+    author TEXT,
+    source TEXT NOT NULL,
+    published_at TEXT NOT NULL,
+    ingested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS article_topics (
+    topic TEXT NOT NULL,
+    published_at TEXT NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (topic, published_at, url)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS article_topics_url ON article_topics (url);
+CREATE TABLE IF NOT EXISTS article_symbols (
+    url TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    PRIMARY KEY (url, symbol)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS feeds (
+    topic TEXT PRIMARY KEY,
+    attempted_at REAL,
+    succeeded_at REAL,
+    newest TEXT,
+    articles INTEGER NOT NULL DEFAULT 0,
+    gap_from TEXT,
+    gap_to TEXT,
+    filled_gap INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS revision (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    value INTEGER NOT NULL
+);
+"""
+
+# Senza alcun articolo salvato, una query fallita viene ritentata dopo questi secondi
+EMPTY_RETRY_SECONDS = 60
+
+# Articoli per query (massimo consentito da NewsAPI)
+PAGE_SIZE = 100
+
+
+def canonical_url(url):
+    """Article URL without fragment and tracking parameters (the deduplication key)."""
+    parts = urlsplit(url.strip())
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                       if not TRACKING_PARAMS.match(k)])
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ''))
+
+
+def classify(article, feed_topic):
+    """Topics of an article: the feed it came from plus every keyword match."""
+    text = f"{article.get('title') or ''} {article.get('description') or ''}"
+    return {feed_topic} | {topic for topic, pattern in TOPIC_KEYWORDS.items() if pattern.search(text)}
+
+
+def ticker_article(item):
+    """
+    NewsAPI-shaped article from a yfinance news item (both the flat format
+    and the one nested under 'content'), or None if it has no title or link.
+    """
+    content = item.get('content') or {}
+    if content:
+        link = (content.get('canonicalUrl') or content.get('clickThroughUrl') or {}).get('url')
+        published = content.get('pubDate')
+        source = (content.get('provider') or {}).get('displayName')
+        image = (content.get('thumbnail') or {}).get('originalUrl')
+        description = content.get('summary') or content.get('description')
+    else:
+        link = item.get('link')
+        timestamp = item.get('providerPublishTime')
+        published = datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp else None
+        source = item.get('publisher')
+        image = None
+        description = None
+    title = content.get('title') or item.get('title')
+    if not title or not link:
+        return None
+    return {
+        'title': title,
+        'description': description,
+        'url': link,
+        'urlToImage': image,
+        'source': {'id': None, 'name': source or 'Unknown'},
+        'publishedAt': published,
+        'related_symbols': item.get('relatedTickers') or [],
+    }
+
+
+def _iso(timestamp):
+    return timestamp.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _published_at(value):
+    """NewsAPI publishedAt normalized to 'YYYY-MM-DDTHH:MM:SSZ' (sortable as text), or None."""
+    try:
+        return _iso(datetime.fromisoformat(value.replace('Z', '+00:00')))
+    except (AttributeError, ValueError):
+        return None
+
+
+class NewsStore:
+    """
+    Local, deduplicated store of NewsAPI articles in SQLite.
+
+    A poller runs each topic's NewsAPI query on a schedule that fits the
+    daily request quota, asking only for articles newer than the last stored
+    one. Articles are keyed by canonical URL, so the same story returned by
+    several queries (or polls) is stored once, and are classified into
+    topics; endpoints page through a topic with an indexed query instead of
+    calling NewsAPI. News fetched from yfinance for a ticker is stored too,
+    tagged with its symbols, so that the search index covers it. Articles
+    older than retention_days are pruned.
+
+    Without the poller (start() not called) a topic is ingested on demand,
+    at most once per poll interval: synchronously the first time, in the
+    background afterwards.
+    """
+
+    def __init__(self, path, fetch, topics, poll_interval, daily_quota, retention_days):
+        self.path = path
+        self.fetch = fetch
+        self.topics = topics
+        # Intervallo effettivo: mai più query al giorno di quante ne conceda la quota
+        self.poll_interval = max(poll_interval, math.ceil(86400 * len(topics) / daily_quota))
+        self.retention_days = retention_days
+        self.ingests = 0
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._refreshing = set()
+        self._thread = None
+        self._stop = threading.Event()
+        self._db = None
+
+    def _connection(self):
+        # Aperta alla prima richiesta, così importare il modulo non crea file
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(SCHEMA)
+            self._db = db
+        return self._db
+
+    @property
+    def version(self):
+        """Revision of the stored articles, bumped by every write of any process."""
+        with self._lock:
+            row = self._connection().execute('SELECT value FROM revision WHERE id = 0').fetchone()
+        return row['value'] if row else 0
+
+    def _feed(self, topic):
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT attempted_at, succeeded_at FROM feeds WHERE topic = ?', (topic,)).fetchone()
+        return (row['attempted_at'], row['succeeded_at']) if row else (None, None)
+
+    def _query(self, topic):
+        """
+        Parameters of the next query of a topic, and whether it back-fills
+        the gap left by a truncated one instead of asking for the newest
+        articles (from the newest stored one, within the topic window).
+        """
+        window = self.topics[topic]['window_days']
+        floor = _iso(datetime.now(timezone.utc) - timedelta(days=window or self.retention_days))
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT newest, gap_from, gap_to, filled_gap FROM feeds WHERE topic = ?', (topic,)).fetchone()
+        params = {**self.topics[topic]['params'], 'sortBy': 'publishedAt', 'pageSize': PAGE_SIZE}
+        # Un buco ancora aperto si riempie a query alterne, così la quota resta quella prevista
+        if row and row['gap_to'] and row['gap_to'] > floor and not row['filled_gap']:
+            return {**params, 'from': max(row['gap_from'], floor), 'to': row['gap_to']}, True
+        return {**params, 'from': max(row['newest'] or floor, floor) if row else floor}, False
+
+    @staticmethod
+    def _row(article, ingested_at):
+        """Row of the articles table for a NewsAPI-shaped article, or None if it is unusable."""
+        published_at = _published_at(article.get('publishedAt'))
+        if not article.get('url') or not article.get('title') or article['title'] == REMOVED_TITLE \
+                or published_at is None:
+            return None
+        return (canonical_url(article['url']), article['title'], article.get('description'), article.get('content'),
+                article.get('urlToImage'), article.get('author'),
+                json.dumps(article.get('source') or {'name': 'Unknown'}), published_at, ingested_at)
+
+    def _write(self, db, rows, topic_rows, symbol_rows):
+        """Upserts articles with their topics and symbols, then prunes the expired ones (lock held)."""
+        cutoff = _iso(datetime.now(timezone.utc) - timedelta(days=self.retention_days))
+        db.executemany("""
+            INSERT INTO articles (url, title, description, content, url_to_image, author, source,
+                                  published_at, ingested_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (url) DO UPDATE SET
+                title = excluded.title, description = COALESCE(excluded.description, articles.description),
+                content = COALESCE(excluded.content, articles.content),
+                url_to_image = COALESCE(excluded.url_to_image, articles.url_to_image),
+                author = COALESCE(excluded.author, articles.author)
+        """, rows)
+        # Un articolo già salvato mantiene la sua data: le righe per argomento devono usarla
+        db.executemany("""
+            INSERT OR IGNORE INTO article_topics (topic, published_at, url)
+            SELECT ?, published_at, url FROM articles WHERE url = ?
+        """, topic_rows)
+        db.executemany('INSERT OR IGNORE INTO article_symbols (url, symbol) VALUES (?, ?)', symbol_rows)
+        db.execute('DELETE FROM article_topics WHERE published_at < ?', (cutoff,))
+        db.execute('DELETE FROM article_symbols WHERE url IN (SELECT url FROM articles WHERE published_at < ?)',
+                   (cutoff,))
+        pruned = db.execute('DELETE FROM articles WHERE published_at < ?', (cutoff,)).rowcount
+        if rows or symbol_rows or pruned:
+            db.execute('INSERT INTO revision (id, value) VALUES (0, 1) '
+                       'ON CONFLICT (id) DO UPDATE SET value = value + 1')
+
+    def add_ticker_news(self, symbol, items):
+        """
+        Stores the yfinance news of a ticker, tagged with the ticker and its
+        related tickers. They are searchable but not part of any topic feed.
+
+        Returns:
+            Number of articles stored
+        """
+        now = time.time()
+        rows, symbol_rows = [], []
+        for item in items:
+            article = ticker_article(item)
+            row = self._row(article, now) if article is not None else None
+            if row is None:
+                continue
+            rows.append(row)
+            symbol_rows.extend((row[0], tagged.upper()) for tagged in {symbol, *article['related_symbols']})
+        if rows:
+            with self._lock:
+                db = self._connection()
+                with db:
+                    self._write(db, rows, [], symbol_rows)
+        return len(rows)
+
+    def all_articles(self):
+        """
+        Every stored article with its explicit symbol tags, newest first
+        (used to build the search index).
+        """
+        with self._lock:
+            rows = self._connection().execute("""
+                SELECT a.url, a.title, a.description, a.url_to_image, a.source, a.published_at,
+                       (SELECT GROUP_CONCAT(symbol) FROM article_symbols s WHERE s.url = a.url) AS symbols
+                FROM articles a
+                ORDER BY a.published_at DESC, a.url
+            """).fetchall()
+        return [{
+            'title': row['title'],
+            'description': row['description'],
+            'url': row['url'],
+            'urlToImage': row['url_to_image'],
+            'source': json.loads(row['source']),
+            'publishedAt': row['published_at'],
+            'symbols': row['symbols'].split(',') if row['symbols'] else [],
+        } for row in rows]
+
+    def _ingest(self, topic):
+        """
+        One NewsAPI query for a topic. Results come newest first and are
+        capped at PAGE_SIZE: when more articles matched, the time range
+        between the query's lower bound and the oldest article returned is
+        recorded as the feed's gap and back-filled by the next query, so a
+        busy period is never skipped (a new gap is merged with a pending one).
+        """
+        attempted_at = time.time()
+        params, filling = self._query(topic)
+        try:
+            data = self.fetch(params)
+            if data.get('status') != 'ok':
+                raise RuntimeError(data.get('message') or 'NewsAPI error')
+        except Exception:
+            with self._lock:
+                db = self._connection()
+                db.execute('INSERT INTO feeds (topic, attempted_at) VALUES (?, ?) '
+                           'ON CONFLICT (topic) DO UPDATE SET attempted_at = excluded.attempted_at',
+                           (topic, attempted_at))
+                db.commit()
+            raise
+
+        articles = data.get('articles', [])
+        rows, topic_rows, newest = [], [], None
+        for article in articles:
+            row = self._row(article, attempted_at)
+            if row is None:
+                continue
+            url, published_at = row[0], row[7]
+            newest = max(newest or published_at, published_at)
+            rows.append(row)
+            topic_rows.extend((name, url) for name in classify(article, topic))
+
+        # Troncata: restano da leggere gli articoli tra il limite inferiore e il più vecchio ricevuto
+        oldest = min((row[7] for row in rows), default=None)
+        truncated = data.get('totalResults', 0) > len(articles) and oldest is not None
+
+        with self._lock:
+            db = self._connection()
+            with db:
+                self._write(db, rows, topic_rows, [])
+                db.execute("""
+                    INSERT INTO feeds (topic, attempted_at, succeeded_at, newest, articles) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (topic) DO UPDATE SET attempted_at = excluded.attempted_at,
+                        succeeded_at = excluded.succeeded_at, articles = excluded.articles,
+                        newest = MAX(COALESCE(feeds.newest, ''), COALESCE(excluded.newest, ''))
+                """, (topic, attempted_at, attempted_at, newest, len(rows)))
+                gap = db.execute('SELECT gap_from, gap_to FROM feeds WHERE topic = ?', (topic,)).fetchone()
+                if filling:
+                    # Il buco si restringe verso il basso; se non avanza (o è chiuso) viene abbandonato
+                    gap_to = oldest if truncated and oldest < gap['gap_to'] else None
+                    gap_from = gap['gap_from'] if gap_to else None
+                elif truncated:
+                    gap_from = min(gap['gap_from'] or params['from'], params['from'])
+                    gap_to = max(gap['gap_to'] or oldest, oldest)
+                else:
+                    gap_from, gap_to = gap['gap_from'], gap['gap_to']
+                db.execute('UPDATE feeds SET gap_from = ?, gap_to = ?, filled_gap = ? WHERE topic = ?',
+                           (gap_from, gap_to, int(filling), topic))
+            self.ingests += 1
+        return len(rows)
+
+    def ingest(self, topic):
+        """
+        Runs the NewsAPI query of a topic and stores the new articles
+        (concurrent callers share the request).
+
+        Returns:
+            Number of articles returned by NewsAPI
+        """
+        return self._flight.do(topic, lambda: self._ingest(topic))
+
+    def _refresh_in_background(self, topic):
+        with self._lock:
+            if topic in self._refreshing:
+                return
+            self._refreshing.add(topic)
+
+        def run():
+            try:
+                self.ingest(topic)
+            except Exception as e:
+                print(f"Errore nell'aggiornamento delle notizie '{topic}': {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(topic)
+
+        threading.Thread(target=run, name='news-refresh', daemon=True).start()
+
+    def ensure_fresh(self, topic):
+        """
+        Makes sure a topic has been ingested: the first request waits for the
+        query; later ones never do. Without the poller, a stale topic is
+        refreshed in the background.
+
+        Raises:
+            Exception: if the first ingestion of the topic fails
+        """
+        attempted_at, succeeded_at = self._feed(topic)
+        now = time.time()
+        if succeeded_at is None:
+            if attempted_at is None or now - attempted_at > EMPTY_RETRY_SECONDS:
+                self.ingest(topic)
+        elif not self.running() and now - attempted_at > self.poll_interval:
+            self._refresh_in_background(topic)
+
+    def page(self, topic, page=1, page_size=15):
+        """
+        One page of a topic's articles, newest first, within the topic window.
+
+        Returns:
+            Tuple (list of NewsAPI-shaped article dicts, total matching articles)
+        """
+        window = self.topics[topic]['window_days']
+        since = _iso(datetime.now(timezone.utc) - timedelta(days=window)) if window else ''
+        with self._lock:
+            db = self._connection()
+            total = db.execute('SELECT COUNT(*) FROM article_topics WHERE topic = ? AND published_at >= ?',
+                               (topic, since)).fetchone()[0]
+            rows = db.execute("""
+                SELECT a.* FROM article_topics t JOIN articles a ON a.url = t.url
+                WHERE t.topic = ? AND t.published_at >= ?
+                ORDER BY t.published_at DESC, t.url
+                LIMIT ? OFFSET ?
+            """, (topic, since, page_size, (page - 1) * page_size)).fetchall()
+        return [self._article(row) for row in rows], total
+
+    @staticmethod
+    def _article(row):
+        return {
+            'title': row['title'],
+            'description': row['description'],
+            'content': row['content'],
+            'url': row['url'],
+            'urlToImage': row['url_to_image'],
+            'author': row['author'],
+            'source': json.loads(row['source']),
+            'publishedAt': row['published_at'],
+        }
+
+    def poll(self):
+        """Ingests every topic whose last query is older than the poll interval."""
+        now = time.time()
+        for topic in self.topics:
+            if self._stop.is_set():
+                break
+            attempted_at, _ = self._feed(topic)
+            if attempted_at is not None and now - attempted_at < self.poll_interval:
+                continue
+            try:
+                count = self.ingest(topic)
+                print(f"Notizie '{topic}': {count} articoli da NewsAPI")
+            except Exception as e:
+                print(f"Errore nell'aggiornamento delle notizie '{topic}': {e}")
+
+    def _seconds_until_poll(self):
+        now = time.time()
+        due = [attempted_at + self.poll_interval - now
+               for attempted_at, _ in (self._feed(topic) for topic in self.topics) if attempted_at is not None]
+        if len(due) < len(self.topics):
+            return 0
+        return max(1, min(due))
+
+    def _run(self):
+        # Gli orari dell'ultima query sono salvati: un riavvio non consuma quota
+        while not self._stop.wait(self._seconds_until_poll()):
+            self.poll()
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Starts the scheduled NewsAPI poller."""
+        if self.running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='news-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            db = self._connection()
+            articles = db.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+            topics = {row['topic']: row['count'] for row in db.execute(
+                'SELECT topic, COUNT(*) AS count FROM article_topics GROUP BY topic')}
+            feeds = {row['topic']: {'age': round(time.time() - row['succeeded_at'], 1) if row['succeeded_at'] else None,
+                                    'last_articles': row['articles'],
+                                    'gap': [row['gap_from'], row['gap_to']] if row['gap_to'] else None}
+                     for row in db.execute('SELECT * FROM feeds')}
+        return {
+            'articles': articles,
+            'topics': topics,
+            'feeds': feeds,
+            'poll_interval': self.poll_interval,
+            'ingests': self.ingests,
+            'polling': self.running()
+        }
+
+
+def _fetch_everything(params):
+    response = newsapi_client.get(NEWSAPI_EVERYTHING_URL, params={**params, 'apiKey': NEWS_API_KEY})
+    return response.json()
+
+
+news_store = NewsStore(NEWS_DB_FILE, _fetch_everything, TOPICS, NEWS_POLL_INTERVAL, NEWSAPI_DAILY_QUOTA,
+                       NEWS_RETENTION_DAYS)
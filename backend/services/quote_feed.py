@@ -0,0 +1,139 @@
+# services/quote_feed.py
+
+import threading
+import time
+from datetime import datetime
+
+from config import QUOTE_FEED_INTERVAL
+from services.incremental import incremental_indicators
+from services.quotes import fetch_stock_quotes, fetch_crypto_quotes
+from utils.pubsub import broker
+
+# Indicatori pubblicati insieme alle quotazioni azionarie
+STREAMED_INDICATORS = ('RSI_14', 'SMA_50', 'EMA_20', 'VWAP_20')
+
+
+def fetch_stock_quotes_with_indicators(symbols):
+    """
+    Stock quotes with the incremental indicators evaluated at the live price
+    (O(1) per symbol once each state is warm).
+    """
+    quotes = fetch_stock_quotes(symbols)
+    for symbol, quote in quotes.items():
+        try:
+            values, _ = incremental_indicators.latest(symbol, quote['current_price'])
+        except Exception as e:
+            print(f"Errore negli indicatori incrementali di {symbol}: {e}")
+            continue
+        quote['indicators'] = {
+            name: None if values[name] is None else round(values[name], 2) for name in STREAMED_INDICATORS
+        }
+    return quotes
+
+
+FETCHERS = {
+    'stock': fetch_stock_quotes_with_indicators,
+    'crypto': fetch_crypto_quotes,
+}
+
+
+def quote_channel(asset_type, symbol):
+    """Pub/sub channel carrying the updates of one symbol."""
+    return f"quotes:{asset_type}:{symbol}"
+
+
+class QuoteFeed:
+    """
+    Shared background refresher for streamed quotes.
+
+    Clients subscribe to a set of symbols; the feed keeps a reference count
+    per symbol and, on each tick, fetches every subscribed symbol once (one
+    bulk call per asset type) no matter how many clients watch it. Only the
+    fields that changed since the previous tick are published.
+    """
+
+    def __init__(self, broker, interval):
+        self.broker = broker
+        self.interval = interval
+        self._refcounts = {}
+        self._last = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def acquire(self, keys):
+        """
+        Registers interest in (asset_type, symbol) keys and returns the last
+        known quote for each of them (used as the initial snapshot).
+        """
+        with self._lock:
+            for key in keys:
+                self._refcounts[key] = self._refcounts.get(key, 0) + 1
+            snapshot = {key: self._last[key] for key in keys if key in self._last}
+            missing = len(snapshot) < len(keys)
+        self._ensure_running()
+        if missing:
+            self._wakeup.set()
+        return snapshot
+
+    def release(self, keys):
+        with self._lock:
+            for key in keys:
+                count = self._refcounts.get(key, 0) - 1
+                if count > 0:
+                    self._refcounts[key] = count
+                else:
+                    self._refcounts.pop(key, None)
+                    self._last.pop(key, None)
+
+    def tick(self):
+        with self._lock:
+            keys = list(self._refcounts)
+        if not keys:
+            return 0
+
+        published = 0
+        for asset_type, fetch in FETCHERS.items():
+            symbols = sorted(symbol for kind, symbol in keys if kind == asset_type)
+            if not symbols:
+                continue
+            try:
+                quotes = fetch(symbols)
+            except Exception as e:
+                print(f"Errore nell'aggiornamento del feed {asset_type}: {e}")
+                continue
+
+            for symbol, quote in quotes.items():
+                key = (asset_type, symbol)
+                with self._lock:
+                    if key not in self._refcounts:
+                        continue
+                    previous = self._last.get(key, {})
+                    delta = {field: value for field, value in quote.items() if previous.get(field) != value}
+                    self._last[key] = dict(previous, **quote, symbol=symbol, asset_type=asset_type)
+                if delta:
+                    delta.update(symbol=symbol, asset_type=asset_type,
+                                 timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                    self.broker.publish(quote_channel(asset_type, symbol), 'quote', delta)
+                    published += 1
+        return published
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Errore nel feed delle quotazioni: {e}")
+            self._wakeup.wait(max(0, self.interval - (time.monotonic() - started)))
+            self._wakeup.clear()
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='quote-feed', daemon=True)
+            self._thread.start()
+
+
+quote_feed = QuoteFeed(broker, QUOTE_FEED_INTERVAL)
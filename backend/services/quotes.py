@@ -0,0 +1,172 @@
+# services/quotes.py
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from routes.crypto import resolve_coin_ids, fetch_coin_markets
+from utils.cache import cache
+from utils.metrics import upstream_call
+
+
+def download_closes(symbols, period='5d'):
+    """
+    Fetches daily closes for many symbols with a single yf.download call.
+
+    Args:
+        symbols: Iterable of ticker symbols
+        period: yfinance period string covering the closes needed (default: '5d')
+
+    Returns:
+        pandas DataFrame indexed by date with one column per symbol (NaN where
+        a market did not trade on that date)
+    """
+    symbols = sorted({s.upper() for s in symbols})
+    if not symbols:
+        return pd.DataFrame()
+
+    def load():
+        with upstream_call('yfinance', 'download'):
+            data = yf.download(symbols, period=period, interval='1d', auto_adjust=True,
+                               group_by='column', progress=False, threads=True)
+        if data.empty:
+            return pd.DataFrame(columns=symbols)
+        if isinstance(data.columns, pd.MultiIndex):
+            closes = data['Close']
+        else:
+            closes = data[['Close']].rename(columns={'Close': symbols[0]})
+        return closes.reindex(columns=symbols)
+
+    closes = cache.get_or_load('quote', ('yf.download', tuple(symbols), period), load,
+                               should_cache=lambda df: not df.empty)
+    return closes.copy()
+
+
+def download_ohlcv(symbols, period='6mo'):
+    """
+    Fetches daily OHLCV bars for many symbols with a single yf.download call.
+
+    Args:
+        symbols: Iterable of ticker symbols
+        period: yfinance period string (default: '6mo')
+
+    Returns:
+        Dict mapping 'Open', 'High', 'Low', 'Close', 'Volume' to DataFrames
+        indexed by date with one column per symbol (empty dict if no data)
+    """
+    symbols = sorted({s.upper() for s in symbols})
+    if not symbols:
+        return {}
+
+    def load():
+        with upstream_call('yfinance', 'download'):
+            data = yf.download(symbols, period=period, interval='1d', auto_adjust=True,
+                               group_by='column', progress=False, threads=True)
+        if data.empty:
+            return {}
+        if not isinstance(data.columns, pd.MultiIndex):
+            data.columns = pd.MultiIndex.from_product([data.columns, symbols[:1]])
+        fields = data.columns.get_level_values(0).unique()
+        return {field: data[field].reindex(columns=symbols) for field in fields}
+
+    fields = cache.get_or_load('history_daily', ('yf.download.ohlcv', tuple(symbols), period), load,
+                               should_cache=bool)
+    return {field: frame.copy() for field, frame in fields.items()}
+
+
+def change_table(closes, lookback=1):
+    """
+    Computes last price and percent change for every column of a closes frame.
+
+    The previous close is taken `lookback` valid sessions before the last
+    valid one (or the first valid session when there are fewer), so symbols
+    trading on different calendars are handled without per-symbol loops.
+
+    Args:
+        closes: DataFrame as returned by download_closes
+        lookback: Number of sessions to look back (1 = previous close)
+
+    Returns:
+        DataFrame indexed by symbol with 'price', 'prev_close' and
+        'change_percent' columns; symbols with no data are dropped
+    """
+    if closes.empty:
+        return pd.DataFrame(columns=['price', 'prev_close', 'change_percent'])
+
+    values = closes.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    rows = values.shape[0]
+
+    # Sposta i valori validi in fondo mantenendo l'ordine temporale
+    order = np.argsort(valid, axis=0, kind='stable')
+    packed = np.take_along_axis(values, order, axis=0)
+    n_valid = valid.sum(axis=0)
+
+    last = packed[-1]
+    prev_index = np.maximum(rows - 1 - lookback, rows - np.maximum(n_valid, 1))
+    prev = packed[prev_index, np.arange(values.shape[1])]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.where(prev != 0, (last - prev) / prev * 100, 0.0)
+
+    table = pd.DataFrame({'price': last, 'prev_close': prev, 'change_percent': change}, index=closes.columns)
+    return table[n_valid > 0]
+
+
+def breadth(table):
+    """
+    Counts advancing, declining and unchanged symbols in a change table.
+
+    Returns:
+        Dict with 'total_stocks', 'advancing', 'declining' and 'unchanged'
+    """
+    change = table['change_percent'].to_numpy(dtype=float)
+    return {
+        'total_stocks': int(change.size),
+        'advancing': int((change > 0).sum()),
+        'declining': int((change < 0).sum()),
+        'unchanged': int((change == 0).sum())
+    }
+
+
+def fetch_stock_quotes(symbols):
+    """
+    Latest price and daily change for stock symbols via one batched download.
+
+    Returns:
+        Dict symbol -> {'current_price', 'price_change_percentage_24h'}
+    """
+    if not symbols:
+        return {}
+    table = change_table(download_closes(symbols, period='5d'))
+    return {
+        symbol: {'current_price': float(row['price']), 'price_change_percentage_24h': float(row['change_percent'])}
+        for symbol, row in table.iterrows()
+    }
+
+
+def fetch_crypto_quotes(symbols):
+    """
+    Latest price and 24h change for crypto symbols via one coins/markets request.
+
+    Returns:
+        Dict symbol -> {'current_price', 'price_change_percentage_24h'}
+    """
+    if not symbols:
+        return {}
+    resolved = resolve_coin_ids(symbols)
+    if not resolved:
+        return {}
+    response = fetch_coin_markets([info['id'] for info in resolved.values()])
+    if response.status_code != 200:
+        raise RuntimeError(f"coins/markets ha restituito {response.status_code}")
+    by_id = {coin['id']: coin for coin in response.json()}
+    quotes = {}
+    for symbol, info in resolved.items():
+        coin = by_id.get(info['id'])
+        if coin is not None and coin.get('current_price') is not None:
+            quotes[symbol] = {
+                'current_price': coin['current_price'],
+                'price_change_percentage_24h': coin.get('price_change_percentage_24h')
+            }
+    return quotes
@@ -0,0 +1,227 @@
+# services/search_index.py
+
+import bisect
+import heapq
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+STOCK_FIELDS = ('exchange', 'sector', 'industry', 'country')
+
+# Punteggi per tipo di corrispondenza (a parità vince la capitalizzazione)
+SCORE_EXACT_SYMBOL = 1000
+SCORE_SYMBOL_PREFIX = 800
+SCORE_NAME_PREFIX = 650
+SCORE_EXACT_WORD = 600
+SCORE_WORD_PREFIX = 500
+SCORE_FUZZY = 300
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def trigrams(term):
+    padded = f"^{term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """
+    Edit distance between a and b counting an adjacent transposition as one
+    edit ('appel' -> 'apple'), or limit + 1 once it exceeds limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def stock_record(symbol, metadata):
+    """Search record from a ticker metadata record (or just the symbol)."""
+    record = {'type': 'stock', 'symbol': symbol, 'name': metadata.get('name') or symbol}
+    for field in STOCK_FIELDS:
+        if metadata.get(field):
+            record[field] = metadata[field]
+    return record
+
+
+def coin_record(coin):
+    record = {'type': 'crypto', 'symbol': coin['symbol'].upper(), 'id': coin['id'], 'name': coin.get('name') or coin['id']}
+    if coin.get('rank'):
+        record['market_cap_rank'] = coin['rank']
+    return record
+
+
+class SearchIndex:
+    """
+    In-memory typeahead index over stock and coin metadata.
+
+    Symbols and name words are kept in a sorted term list (prefix lookups by
+    bisection, like walking a trie) and in a trigram inverted index used for
+    typo-tolerant matching when the query is not a prefix of anything.
+    Results carry the metadata stored in the index, so a search never calls
+    an upstream.
+
+    Stock records come from the ticker metadata store for the configured
+    universe; coins come from the local CoinGecko coin index (one coin per
+    symbol, the same one /api/crypto_data resolves to). When either source
+    changes the index is rebuilt in the background, at most once every
+    rebuild_interval seconds.
+    """
+
+    def __init__(self, stock_symbols, metadata, coin_index, rebuild_interval=60):
+        self.stock_symbols = list(dict.fromkeys(s.upper() for s in stock_symbols))
+        self.metadata = metadata
+        self.coin_index = coin_index
+        self.rebuild_interval = rebuild_interval
+        self._source_version = None
+        self._rebuilt_at = 0
+        self._records = []
+        self._terms = []         # termini ordinati, per le ricerche per prefisso
+        self._postings = {}      # termine -> [(id record, campo)]
+        self._grams = {}         # trigramma -> [termine]
+        self._lock = threading.Lock()
+
+    def _version(self):
+        return (self.coin_index.built_at, self.metadata.version)
+
+    def _rebuild(self):
+        version = self._version()
+        stocks = self.metadata.peek_many(self.stock_symbols)
+        records = [stock_record(symbol, stocks.get(symbol, {})) for symbol in self.stock_symbols]
+        records.extend(coin_record(coin) for coin in self.coin_index.coins())
+
+        postings = defaultdict(list)
+        for doc, record in enumerate(records):
+            postings[record['symbol'].lower()].append((doc, 'symbol'))
+            for word in set(tokenize(record['name'])):
+                postings[word].append((doc, 'name'))
+        grams = defaultdict(list)
+        for term in postings:
+            for gram in trigrams(term):
+                grams[gram].append(term)
+
+        with self._lock:
+            self._records = records
+            self._terms = sorted(postings)
+            self._postings = dict(postings)
+            self._grams = dict(grams)
+            self._source_version = version
+
+    def warm_up(self):
+        """Fetches in the background the metadata of universe stocks not stored yet."""
+        self.metadata.warm_up(self.stock_symbols)
+
+    def _ensure_index(self):
+        if self._source_version == self._version():
+            return
+        if not self._records:
+            self._rebuild()
+        elif time.time() - self._rebuilt_at > self.rebuild_interval:
+            # L'indice precedente resta in uso finché quello nuovo non è pronto
+            self._rebuilt_at = time.time()
+            threading.Thread(target=self._rebuild, name='search-index-rebuild', daemon=True).start()
+
+    def _score_token(self, token, records):
+        """Best score per record for one query token (exact, prefix, then fuzzy)."""
+        scores = {}
+
+        def add(doc, score):
+            if score > scores.get(doc, 0):
+                scores[doc] = score
+
+        position = bisect.bisect_left(self._terms, token)
+        while position < len(self._terms) and self._terms[position].startswith(token):
+            term = self._terms[position]
+            position += 1
+            exact = term == token
+            for doc, field in self._postings[term]:
+                if field == 'symbol':
+                    add(doc, SCORE_EXACT_SYMBOL if exact else SCORE_SYMBOL_PREFIX - (len(term) - len(token)))
+                elif records[doc]['name'].lower().startswith(token):
+                    add(doc, SCORE_NAME_PREFIX)
+                else:
+                    add(doc, SCORE_EXACT_WORD if exact else SCORE_WORD_PREFIX)
+
+        # Tolleranza agli errori di battitura solo se i prefissi non bastano
+        if len(scores) < 10 and len(token) >= 3:
+            limit = 1 if len(token) <= 5 else 2
+            query_grams = trigrams(token)
+            shared = Counter(term for gram in query_grams for term in self._grams.get(gram, ()))
+            for term, count in shared.items():
+                if count < len(query_grams) - 3 * limit:
+                    continue
+                distance = min(edit_distance(token, term, limit), edit_distance(token, term[:len(token)], limit))
+                if distance <= limit:
+                    for doc, _ in self._postings[term]:
+                        add(doc, SCORE_FUZZY - 100 * distance)
+        return scores
+
+    def _match(self, tokens, records):
+        totals = None
+        for token in tokens:
+            scores = self._score_token(token, records)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {doc: totals[doc] + score for doc, score in scores.items() if doc in totals}
+            if not totals:
+                return {}
+        return totals
+
+    @staticmethod
+    def _popularity(record):
+        if record['type'] == 'stock':
+            return 50
+        rank = record.get('market_cap_rank')
+        return 0 if rank is None else 50 - min(rank, 5000) / 100
+
+    def search(self, query, limit=10, kind=None):
+        """
+        Ranked prefix and typo-tolerant search.
+
+        Every query word must match a symbol or name word; the last one may
+        be incomplete. Ties are broken by popularity (universe stocks, then
+        coins by market cap rank).
+
+        Args:
+            query: Free text, e.g. 'aapl', 'bitc', 'micro soft'
+            limit: Maximum number of results
+            kind: Optional 'stock' or 'crypto' filter
+
+        Returns:
+            List of records (type, symbol, name and metadata) best first
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        self._ensure_index()
+        with self._lock:
+            records = self._records
+            totals = self._match(tokens, records)
+            if not totals and len(tokens) > 1:
+                # 'micro soft' -> 'microsoft'
+                totals = self._match([''.join(tokens)], records)
+
+        candidates = ((doc, score) for doc, score in totals.items() if kind is None or records[doc]['type'] == kind)
+        best = heapq.nlargest(limit, candidates, key=lambda item: (item[1] + self._popularity(records[item[0]]), -item[0]))
+        return [dict(records[doc]) for doc, _ in best]
+
+    def stats(self):
+        return {
+            'records': len(self._records),
+            'terms': len(self._terms)
+        }
@@ -0,0 +1,214 @@
+# services/snapshots.py
+
+import functools
+import os
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from flask import Response, current_app, request
+
+from config import SNAPSHOTS_DIR, SNAPSHOT_INTERVALS, SNAPSHOT_MAX_AGE
+
+NEW_YORK = ZoneInfo('America/New_York')
+
+
+def us_market_open(now=None):
+    """True during regular NYSE/Nasdaq hours (Mon-Fri 9:30-16:00 New York time)."""
+    now = (now or datetime.now(tz=NEW_YORK)).astimezone(NEW_YORK)
+    if now.weekday() >= 5:
+        return False
+    minutes = now.hour * 60 + now.minute
+    return 9 * 60 + 30 <= minutes < 16 * 60
+
+
+class Snapshot:
+    """A materialized response body with the time it was computed."""
+
+    __slots__ = ('body', 'mimetype', 'updated_at')
+
+    def __init__(self, body, mimetype, updated_at):
+        self.body = body
+        self.mimetype = mimetype
+        self.updated_at = updated_at
+
+
+class SnapshotJob:
+    __slots__ = ('name', 'view', 'schedule', 'next_run')
+
+    def __init__(self, name, view, schedule):
+        self.name = name
+        self.view = view
+        self.schedule = schedule
+        self.next_run = 0.0
+
+
+class SnapshotScheduler:
+    """
+    Background pre-computation of dashboard aggregates.
+
+    Views registered with `materialize` are re-run on a fixed cadence per
+    schedule ('equity' slows down outside US market hours, 'crypto' runs
+    around the clock). The latest successful JSON body is kept in
+    memory and on disk, and parameter-less requests are answered from it
+    directly; if no recent snapshot exists the view runs inline and its
+    result becomes the snapshot.
+    """
+
+    def __init__(self, root, intervals, max_age):
+        self.root = root
+        self.intervals = intervals
+        self.max_age = max_age
+        self.app = None
+        self._jobs = {}
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def interval(self, schedule):
+        if schedule == 'equity' and not us_market_open():
+            return self.intervals['equity_closed']
+        return self.intervals[schedule]
+
+    def _path(self, name):
+        return os.path.join(self.root, f"{name}.json")
+
+    def _load(self, name):
+        path = self._path(name)
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+            return Snapshot(body, 'application/json', os.path.getmtime(path))
+        except OSError:
+            return None
+
+    def _save(self, name, snapshot):
+        with self._lock:
+            self._snapshots[name] = snapshot
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self._path(name)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(snapshot.body)
+        os.replace(tmp_path, self._path(name))
+        os.utime(self._path(name), (snapshot.updated_at, snapshot.updated_at))
+
+    def _running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def latest(self, name):
+        with self._lock:
+            snapshot = self._snapshots.get(name)
+        if snapshot is None or not self._running():
+            # Senza scheduler in questo processo gli snapshot li ricalcola il leader su disco
+            try:
+                updated_at = os.path.getmtime(self._path(name))
+            except OSError:
+                updated_at = None
+            if updated_at is not None and (snapshot is None or updated_at > snapshot.updated_at):
+                loaded = self._load(name)
+                if loaded is not None:
+                    with self._lock:
+                        self._snapshots[name] = loaded
+                    snapshot = loaded
+        return snapshot
+
+    def _capture(self, name, rv):
+        """Stores a view's return value as the snapshot if it is a 200 JSON response."""
+        response = current_app.make_response(rv)
+        if response.status_code == 200 and response.is_json:
+            self._save(name, Snapshot(response.get_data(), response.mimetype, time.time()))
+            self._set_max_age(response, self._jobs[name])
+        return response
+
+    def _set_max_age(self, response, job):
+        """
+        Lets HTTP clients cache the body until the next scheduled recomputation
+        (clients subtract the Age header from max-age).
+        """
+        response.cache_control.public = True
+        response.cache_control.max_age = self.interval(job.schedule)
+
+    def refresh(self, name):
+        job = self._jobs[name]
+        with self.app.test_request_context():
+            self._capture(name, job.view())
+
+    def _serve(self, snapshot, job):
+        response = Response(snapshot.body, mimetype=snapshot.mimetype)
+        age = max(0, int(time.time() - snapshot.updated_at))
+        response.headers['X-Snapshot-Updated'] = datetime.fromtimestamp(snapshot.updated_at).strftime('%Y-%m-%d %H:%M:%S')
+        response.headers['Age'] = str(age)
+        self._set_max_age(response, job)
+        return response
+
+    def materialize(self, name, schedule):
+        """
+        Decorator registering a parameter-less view for pre-computation.
+
+        Args:
+            name: Unique snapshot name (also the file name on disk)
+            schedule: Key of config.SNAPSHOT_INTERVALS ('equity', 'crypto')
+        """
+        def decorator(view):
+            self._jobs[name] = SnapshotJob(name, view, schedule)
+
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                # Attivo solo con l'app collegata (attach/start), e solo per le richieste senza parametri
+                if self.app is not None and not request.args:
+                    snapshot = self.latest(name)
+                    if snapshot is not None and time.time() - snapshot.updated_at < self.max_age:
+                        return self._serve(snapshot, self._jobs[name])
+                    return self._capture(name, view(*args, **kwargs))
+                return view(*args, **kwargs)
+
+            return wrapper
+        return decorator
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for job in list(self._jobs.values()):
+                if self._stop.is_set() or now < job.next_run:
+                    continue
+                try:
+                    self.refresh(job.name)
+                except Exception as e:
+                    print(f"Errore nell'aggiornamento dello snapshot {job.name}: {e}")
+                job.next_run = time.monotonic() + self.interval(job.schedule)
+            self._stop.wait(1)
+
+    def attach(self, app):
+        """
+        Serves parameter-less requests from the snapshots without running the
+        scheduler (workers that are not the leader read the leader's files).
+        """
+        self.app = app
+
+    def start(self, app):
+        self.attach(app)
+        if self._running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='snapshot-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        now = time.time()
+        stats = {}
+        for name, job in self._jobs.items():
+            snapshot = self.latest(name)
+            stats[name] = {
+                'schedule': job.schedule,
+                'interval': self.interval(job.schedule),
+                'age': round(now - snapshot.updated_at, 1) if snapshot is not None else None
+            }
+        return stats
+
+
+snapshots = SnapshotScheduler(SNAPSHOTS_DIR, SNAPSHOT_INTERVALS, SNAPSHOT_MAX_AGE)
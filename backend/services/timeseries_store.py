@@ -0,0 +1,199 @@
+# services/timeseries_store.py
+
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from config import TIMESERIES_DIR, TIMESERIES_OVERLAP_BARS
+from services.market_data import INTRADAY_INTERVALS, get_history
+from utils.cache import cache
+from utils.metrics import upstream_call
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:  # pyarrow è opzionale: senza, le serie vengono salvate in pickle
+    pyarrow = None
+
+# Storico massimo che Yahoo concede per ogni intervallo intraday
+INTRADAY_MAX_PERIOD = {
+    '1m': '7d',
+    '2m': '60d',
+    '5m': '60d',
+    '15m': '60d',
+    '30m': '60d',
+    '90m': '60d',
+    '60m': '730d',
+    '1h': '730d',
+}
+
+PERIOD_PATTERN = re.compile(r'^(\d+)(d|mo|y)$')
+
+
+def _period_offset(period):
+    """Maps a yfinance period string to a pandas offset (None for 'max'/'ytd')."""
+    match = PERIOD_PATTERN.match(period)
+    if not match:
+        return None
+    n, unit = int(match.group(1)), match.group(2)
+    if unit == 'd':
+        return pd.Timedelta(days=n)
+    if unit == 'mo':
+        return pd.DateOffset(months=n)
+    return pd.DateOffset(years=n)
+
+
+def is_supported_period(period):
+    return period in ('max', 'ytd') or PERIOD_PATTERN.match(period or '') is not None
+
+
+def slice_period(frame, period):
+    """
+    Returns the bars of `frame` that a yfinance request for `period` would
+    return, anchored on the last stored bar.
+
+    '1d' and '5d' count trading sessions (as Yahoo does for short ranges);
+    longer periods are calendar offsets from the last bar.
+    """
+    if frame.empty or period == 'max':
+        return frame
+    last = frame.index[-1]
+    if period == 'ytd':
+        return frame[frame.index >= last.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)]
+    if period in ('1d', '5d'):
+        sessions = frame.index.normalize()
+        first_session = sessions.unique()[-int(period[:-1]):][0]
+        return frame[sessions >= first_session]
+    return frame[frame.index > last - _period_offset(period)]
+
+
+class TimeSeriesStore:
+    """
+    On-disk OHLCV store, one file per (symbol, interval).
+
+    The first request for a series downloads the longest history Yahoo
+    offers for the interval; later syncs only download the bars from the
+    last few stored ones onwards and merge them in (the overlap refreshes the
+    still-forming last bar). If the overlapping closes no longer match, a
+    split or dividend has re-adjusted the history and the series is
+    downloaded again in full.
+
+    Files are Parquet when pyarrow is installed, pickle otherwise.
+    """
+
+    def __init__(self, root, overlap=TIMESERIES_OVERLAP_BARS):
+        self.root = root
+        self.overlap = overlap
+        self.extension = 'parquet' if pyarrow is not None else 'pkl'
+
+    def _path(self, symbol, interval):
+        return os.path.join(self.root, interval, f"{symbol}.{self.extension}")
+
+    def _read(self, symbol, interval):
+        path = self._path(symbol, interval)
+        if not os.path.exists(path):
+            return None
+        try:
+            if pyarrow is not None:
+                return pd.read_parquet(path)
+            return pd.read_pickle(path)
+        except Exception as e:
+            print(f"Serie locale illeggibile {path}: {e}")
+            return None
+
+    def _write(self, symbol, interval, frame):
+        path = self._path(symbol, interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if pyarrow is not None:
+            frame.to_parquet(tmp_path)
+        else:
+            frame.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _download(symbol, interval, **kwargs):
+        with upstream_call('yfinance', 'history'):
+            return yf.Ticker(symbol).history(interval=interval, **kwargs)
+
+    def _full(self, symbol, interval):
+        return self._download(symbol, interval, period=INTRADAY_MAX_PERIOD.get(interval, 'max'))
+
+    def _tail_start(self, local, interval):
+        """Start date of the incremental download, or None if a full one is needed."""
+        if len(local) <= self.overlap:
+            return None
+        start = local.index[-1 - self.overlap]
+        max_period = INTRADAY_MAX_PERIOD.get(interval)
+        if max_period is not None and start < pd.Timestamp.now(tz=start.tz) - _period_offset(max_period):
+            return None
+        return start
+
+    def _adjusted_since(self, local, tail):
+        # Confronta le chiusure sovrapposte, esclusa l'ultima barra locale ancora in formazione
+        overlap = local.index[:-1].intersection(tail.index)
+        if overlap.empty:
+            return False
+        stored = local.loc[overlap, 'Close'].to_numpy(dtype=float)
+        fresh = tail.loc[overlap, 'Close'].to_numpy(dtype=float)
+        return not np.allclose(stored, fresh, rtol=1e-6, equal_nan=True)
+
+    def sync(self, symbol, interval):
+        """
+        Brings the stored series up to date and returns it.
+
+        Returns:
+            pandas DataFrame with the full stored history (may be empty)
+        """
+        local = self._read(symbol, interval)
+        start = self._tail_start(local, interval) if local is not None and not local.empty else None
+
+        if start is None:
+            frame = self._full(symbol, interval)
+        else:
+            tail = self._download(symbol, interval, start=start.strftime('%Y-%m-%d'))
+            if tail.empty:
+                return local
+            if self._adjusted_since(local, tail):
+                frame = self._full(symbol, interval)
+            else:
+                frame = pd.concat([local, tail])
+                frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+
+        if frame.empty:
+            return local if local is not None else frame
+
+        max_period = INTRADAY_MAX_PERIOD.get(interval)
+        if max_period is not None:
+            frame = frame[frame.index > frame.index[-1] - _period_offset(max_period)]
+        self._write(symbol, interval, frame)
+        return frame
+
+    def history(self, symbol, period, interval='1d'):
+        """
+        Drop-in replacement for get_history(symbol, period, interval) served
+        from the local store.
+
+        Periods that the store cannot slice fall back to a direct download.
+
+        Returns:
+            pandas DataFrame with the OHLCV history for the requested period
+        """
+        if not is_supported_period(period):
+            return get_history(symbol, period=period, interval=interval)
+
+        symbol = symbol.upper()
+        data_class = 'history' if interval in INTRADAY_INTERVALS else 'history_daily'
+        # La TTL della cache decide ogni quanto chiedere a Yahoo le barre nuove
+        frame = cache.get_or_load(data_class, ('ts.sync', symbol, interval),
+                                  lambda: self.sync(symbol, interval),
+                                  should_cache=lambda df: df is not None and not df.empty)
+        if frame is None:
+            return pd.DataFrame()
+        return slice_period(frame, period).copy()
+
+
+timeseries_store = TimeSeriesStore(TIMESERIES_DIR)
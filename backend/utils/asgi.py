@@ -0,0 +1,229 @@
+# utils/asgi.py
+
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.exceptions import HTTPException
+
+_END = object()
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI http scope and its (fully read) body."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1')
+        value = value.decode('latin-1')
+        if name == 'content-length':
+            continue
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+            continue
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _encode_headers(headers):
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+class AsgiAdapter:
+    """
+    Serves the Flask app under an ASGI server (uvicorn).
+
+    Endpoints listed in native_views are served by coroutines that wait on
+    upstreams without holding a thread; they run in a Flask request context,
+    so request, jsonify and the after_request hooks (CORS, ETag,
+    compression) behave as in the synchronous views.
+
+    Every other request goes through a WSGI bridge: the Flask view runs in a
+    bounded thread pool (wsgi_threads), which caps how many blocking calls
+    (yfinance, pandas) run at once instead of letting them pile up on the
+    event loop. Streamed responses (SSE) are iterated in a separate pool, so
+    long-lived streams cannot starve ordinary requests, and are closed when
+    the client disconnects (once the pending chunk, at most a heartbeat
+    away, has been produced).
+    """
+
+    def __init__(self, flask_app, native_views=None, wsgi_threads=64, stream_threads=256, on_startup=None,
+                 on_shutdown=None):
+        self.flask_app = flask_app
+        self.native_views = dict(native_views or {})
+        self.on_startup = on_startup
+        self.on_shutdown = on_shutdown
+        self._wsgi_pool = ThreadPoolExecutor(max_workers=wsgi_threads, thread_name_prefix='asgi-wsgi')
+        self._stream_pool = ThreadPoolExecutor(max_workers=stream_threads, thread_name_prefix='asgi-stream')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise RuntimeError(f"Tipo di connessione ASGI non supportato: {scope['type']}")
+
+        body = await self._read_body(receive)
+        environ = build_environ(scope, body)
+        native = self._match_native(environ)
+        if native is not None:
+            view, view_args = native
+            await self._call_native(view, view_args, environ, send)
+        else:
+            await self._call_wsgi(environ, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if self.on_startup is not None:
+                    await self.on_startup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.on_shutdown is not None:
+                    await self.on_shutdown()
+                self._wsgi_pool.shutdown(wait=False, cancel_futures=True)
+                self._stream_pool.shutdown(wait=False, cancel_futures=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    def _match_native(self, environ):
+        if not self.native_views:
+            return None
+        adapter = self.flask_app.url_map.bind_to_environ(environ)
+        try:
+            endpoint, view_args = adapter.match()
+        except HTTPException:
+            return None
+        view = self.native_views.get(endpoint)
+        return None if view is None else (view, view_args)
+
+    async def _call_native(self, view, view_args, environ, send):
+        app = self.flask_app
+        # Il contesto vive nelle contextvars del task: resta valido attraverso gli await
+        with app.request_context(environ):
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = await view(**view_args)
+                response = app.process_response(app.make_response(rv))
+            except Exception as e:
+                response = app.make_response(app.handle_exception(e))
+            # Intestazioni e corpo come in WSGI (niente corpo per HEAD, 204 e 304)
+            app_iter, status, headers = response.get_wsgi_response(environ)
+            body = b''.join(app_iter)
+        await self._send_buffered(send, int(status.split(' ', 1)[0]), headers, body)
+
+    @staticmethod
+    async def _send_buffered(send, status, headers, body):
+        await send({'type': 'http.response.start', 'status': status, 'headers': _encode_headers(headers)})
+        await send({'type': 'http.response.body', 'body': body})
+
+    def _run_wsgi(self, environ):
+        """
+        Runs the Flask app in a bridge thread. Buffered responses are read
+        here; streamed ones are returned as an iterator.
+
+        Returns:
+            Tuple (status, headers, body, iterator); exactly one of body and
+            iterator is None
+        """
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = headers
+
+        app_iter = self.flask_app.wsgi_app(environ, start_response)
+        header_names = {name.lower() for name, _ in started['headers']}
+        if 'content-length' not in header_names and started['status'] not in (204, 304):
+            return started['status'], started['headers'], None, app_iter
+        try:
+            body = b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        return started['status'], started['headers'], body, None
+
+    async def _call_wsgi(self, environ, receive, send):
+        loop = asyncio.get_running_loop()
+        status, headers, body, app_iter = await loop.run_in_executor(self._wsgi_pool, self._run_wsgi, environ)
+        if app_iter is None:
+            await self._send_buffered(send, status, headers, body)
+            return
+        await send({'type': 'http.response.start', 'status': status, 'headers': _encode_headers(headers)})
+        await self._stream(app_iter, receive, send)
+
+    async def _stream(self, app_iter, receive, send):
+        loop = asyncio.get_running_loop()
+        iterator = iter(app_iter)
+        disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+        pending = None
+        try:
+            while True:
+                pending = loop.run_in_executor(self._stream_pool, next, iterator, _END)
+                await asyncio.wait({pending, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not pending.done():
+                    break
+                chunk = pending.result()
+                pending = None
+                if chunk is _END:
+                    await send({'type': 'http.response.body', 'body': b''})
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            disconnected.cancel()
+            self._close_iterator(app_iter, pending)
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    def _close_iterator(self, app_iter, pending):
+        """Closes app_iter (running call_on_close callbacks) once no next() is running on it."""
+        if not hasattr(app_iter, 'close'):
+            return
+        if pending is None or pending.done():
+            self._stream_pool.submit(app_iter.close)
+        else:
+            # Un generatore non può essere chiuso mentre è in esecuzione in un altro thread
+            pending.add_done_callback(lambda _: self._stream_pool.submit(app_iter.close))
@@ -0,0 +1,378 @@
+# utils/cache.py
+
+import asyncio
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import CACHE_BACKEND, CACHE_DIR, CACHE_MAX_BYTES, CACHE_TTLS
+from utils.metrics import observe_cache, registry
+from utils.singleflight import SingleFlight
+
+DEFAULT_TTL = (60, 300)
+
+
+def estimate_size(value):
+    """
+    Approximate memory footprint of a cached value, without serializing it.
+
+    Values may declare it (`cache_size`, e.g. the body length of an upstream
+    response); pandas objects report their buffers; JSON-like containers are
+    walked. Used only for the LRU budget, so it need not be exact.
+    """
+    size = getattr(value, 'cache_size', None)
+    if size is not None:
+        return size
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    memory_usage = getattr(value, 'memory_usage', None)
+    if callable(memory_usage):
+        # DataFrame/Series: solo i buffer, senza la scansione 'deep' delle colonne di oggetti
+        usage = memory_usage(index=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    return sys.getsizeof(value)
+
+
+class CacheEntry:
+    """A cached value together with its freshness deadlines."""
+
+    __slots__ = ('value', 'size', 'fresh_until', 'stale_until')
+
+    def __init__(self, value, size, fresh_until, stale_until):
+        self.value = value
+        self.size = size
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class MemoryBackend:
+    """
+    In-process LRU store bounded by the total (approximate) size of its values.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.size
+            self._entries[key] = entry
+            self.current_bytes += entry.size
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.size
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.current_bytes -= entry.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskBackend:
+    """
+    Pickle-per-key store in a local directory. Several worker processes can
+    point at the same directory to share upstream responses.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{digest}.pkl")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                stored_key, entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if stored_key != key:
+            return None
+        if entry.stale_until < time.time():
+            self.delete(key)
+            return None
+        return entry
+
+    def set(self, key, entry):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((key, entry), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError) as e:
+            print(f"Cache su disco non scrivibile per {key}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+class UpstreamCache:
+    """
+    Read-through cache for upstream calls with per data class TTLs and
+    stale-while-revalidate.
+
+    Values younger than the "fresh" TTL are returned directly. Values older
+    than that but still within the "stale" TTL are returned immediately while
+    a background worker reloads them, so a hot key never waits on upstream
+    latency. Anything older is a miss and is loaded synchronously.
+    """
+
+    def __init__(self, memory, disk=None, ttls=None, refresh_workers=4):
+        self.memory = memory
+        self.disk = disk
+        self.ttls = ttls or {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._async_flights = {}
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='cache-refresh')
+
+    def _lookup(self, key):
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.set(key, entry)
+        return entry
+
+    def _store(self, data_class, key, value):
+        fresh_ttl, stale_ttl = self.ttls.get(data_class, DEFAULT_TTL)
+        now = time.time()
+        entry = CacheEntry(value, estimate_size(value), now + fresh_ttl, now + max(fresh_ttl, stale_ttl))
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry)
+        return entry
+
+    def _refresh(self, data_class, key, loader, should_cache):
+        try:
+            self._flight.do(key, lambda: self._load(data_class, key, loader, should_cache))
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            with self._lock:
+                self.refresh_errors += 1
+            print(f"Errore nella rivalidazione della cache per {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _schedule_refresh(self, data_class, key, loader, should_cache):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._refresher.submit(self._refresh, data_class, key, loader, should_cache)
+
+    def get_or_load(self, data_class, key, loader, should_cache=None):
+        """
+        Returns the cached value for key, calling loader() on a miss.
+
+        Args:
+            data_class: Name of the TTL class in config.CACHE_TTLS
+            key: Hashable cache key (normalized upstream call)
+            loader: Zero-argument callable performing the upstream call
+            should_cache: Optional predicate; values for which it returns False
+                          (e.g. error responses) are returned but not stored
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        key = (data_class,) + tuple(key) if isinstance(key, tuple) else (data_class, key)
+        entry = self._lookup(key)
+        now = time.time()
+
+        if entry is not None and now < entry.fresh_until:
+            with self._lock:
+                self.hits += 1
+            observe_cache(data_class, 'hit')
+            return entry.value
+
+        if entry is not None and now < entry.stale_until:
+            with self._lock:
+                self.stale_hits += 1
+            observe_cache(data_class, 'stale')
+            self._schedule_refresh(data_class, key, loader, should_cache)
+            return entry.value
+
+        with self._lock:
+            self.misses += 1
+        observe_cache(data_class, 'miss')
+        # Le richieste concorrenti per la stessa chiave condividono un solo caricamento
+        return self._flight.do(key, lambda: self._load(data_class, key, loader, should_cache))
+
+    def _load(self, data_class, key, loader, should_cache):
+        value = loader()
+        if should_cache is None or should_cache(value):
+            self._store(data_class, key, value)
+        return value
+
+    async def _aload(self, data_class, key, loader, should_cache):
+        value = await loader()
+        if should_cache is None or should_cache(value):
+            self._store(data_class, key, value)
+        return value
+
+    def _async_flight(self, data_class, key, loader, should_cache):
+        """The in-flight load task for key on the running loop, started if needed."""
+        task = self._async_flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._aload(data_class, key, loader, should_cache))
+            self._async_flights[key] = task
+            task.add_done_callback(lambda _: self._async_flights.pop(key, None))
+        else:
+            with self._lock:
+                self._flight.shared += 1
+        return task
+
+    def _async_refresh_done(self, key, task):
+        with self._lock:
+            self._refreshing.discard(key)
+            if task.cancelled() or task.exception() is not None:
+                self.refresh_errors += 1
+            else:
+                self.refreshes += 1
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Errore nella rivalidazione della cache per {key}: {task.exception()}")
+
+    async def aget_or_load(self, data_class, key, loader, should_cache=None):
+        """
+        get_or_load() for the ASGI mode: loader is a zero-argument coroutine
+        function. Stale values are refreshed by a task on the running loop and
+        concurrent misses for the same key await a single load.
+        """
+        key = (data_class,) + tuple(key) if isinstance(key, tuple) else (data_class, key)
+        entry = self._lookup(key)
+        now = time.time()
+
+        if entry is not None and now < entry.fresh_until:
+            with self._lock:
+                self.hits += 1
+            observe_cache(data_class, 'hit')
+            return entry.value
+
+        if entry is not None and now < entry.stale_until:
+            with self._lock:
+                self.stale_hits += 1
+                scheduled = key not in self._refreshing
+                self._refreshing.add(key)
+            observe_cache(data_class, 'stale')
+            if scheduled:
+                task = self._async_flight(data_class, key, loader, should_cache)
+                task.add_done_callback(lambda task: self._async_refresh_done(key, task))
+            return entry.value
+
+        with self._lock:
+            self.misses += 1
+        observe_cache(data_class, 'miss')
+        # shield: se una richiesta viene annullata, il caricamento condiviso prosegue per le altre
+        return await asyncio.shield(self._async_flight(data_class, key, loader, should_cache))
+
+    def invalidate(self, data_class, key):
+        key = (data_class,) + tuple(key) if isinstance(key, tuple) else (data_class, key)
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        """Returns hit/miss/eviction counters and the current memory footprint."""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'backend': 'disk' if self.disk is not None else 'memory',
+            'entries': len(self.memory),
+            'bytes': self.memory.current_bytes,
+            'max_bytes': self.memory.max_bytes,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'evictions': self.memory.evictions,
+            'refreshes': self.refreshes,
+            'refresh_errors': self.refresh_errors,
+            'refreshing': len(self._refreshing),
+            'coalesced': self._flight.shared,
+            'hit_ratio': round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+        }
+
+
+def create_cache():
+    """Builds the process-wide cache from the settings in config.py."""
+    disk = DiskBackend(CACHE_DIR) if CACHE_BACKEND == 'disk' else None
+    return UpstreamCache(MemoryBackend(CACHE_MAX_BYTES), disk=disk, ttls=CACHE_TTLS)
+
+
+cache = create_cache()
+
+
+@registry.register_collector
+def _cache_metrics():
+    stats = cache.stats()
+    yield 'cache_memory_bytes', 'gauge', 'Size of the in-memory cache', [({}, stats['bytes'])]
+    yield 'cache_memory_entries', 'gauge', 'Entries in the in-memory cache', [({}, stats['entries'])]
+    yield 'cache_evictions_total', 'counter', 'Entries evicted from the in-memory cache', [({}, stats['evictions'])]
+    yield 'cache_refreshes_total', 'counter', 'Background revalidations by outcome', [
+        ({'result': 'ok'}, stats['refreshes']), ({'result': 'error'}, stats['refresh_errors'])]
+    yield 'cache_coalesced_total', 'counter', 'Loads shared with a concurrent identical call', [({}, stats['coalesced'])]
+    yield 'cache_hit_ratio', 'gauge', 'Share of lookups served from cache (fresh or stale)', [({}, stats['hit_ratio'])]
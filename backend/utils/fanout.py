@@ -0,0 +1,80 @@
+# utils/fanout.py
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from config import FETCH_MAX_WORKERS, FETCH_TIMEOUT, UPSTREAM_CONCURRENCY
+
+
+class FetchExecutor:
+    """
+    Shared thread pool for fanning out independent upstream calls.
+
+    Every upstream (yfinance, CoinGecko, NewsAPI) has its own concurrency
+    limit so a wide fan-out does not trip rate limits, and every call has a
+    deadline so one slow symbol cannot hold the whole response hostage.
+    """
+
+    def __init__(self, max_workers, limits, default_timeout):
+        self.default_timeout = default_timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fanout')
+        self._limits = {name: threading.BoundedSemaphore(limit) for name, limit in limits.items()}
+        self._default_limit = threading.BoundedSemaphore(max_workers)
+
+    def _run(self, semaphore, deadline, fn):
+        if not semaphore.acquire(timeout=max(0, deadline - time.monotonic())):
+            raise TimeoutError("Deadline superata in attesa di uno slot upstream")
+        try:
+            return fn()
+        finally:
+            semaphore.release()
+
+    def fetch_all(self, upstream, calls, timeout=None):
+        """
+        Runs the given calls concurrently and waits for all of them.
+
+        Args:
+            upstream: Upstream name used to pick the concurrency limit
+            calls: Dict mapping a result key to a zero-argument callable
+            timeout: Per-call deadline in seconds, measured from submission
+
+        Returns:
+            Tuple (results, errors): dicts keyed like calls, holding either the
+            return value or the exception raised (TimeoutError if the call did
+            not finish before its deadline)
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        semaphore = self._limits.get(upstream, self._default_limit)
+
+        # Ogni chiamata gira nel contesto del chiamante (tempi della richiesta per Server-Timing)
+        futures = {self._pool.submit(contextvars.copy_context().run, self._run, semaphore, deadline, fn): key
+                   for key, fn in calls.items()}
+        done, not_done = wait(futures, timeout=max(0, deadline - time.monotonic()))
+
+        results = {}
+        errors = {}
+        for future in done:
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                errors[key] = e
+        for future in not_done:
+            future.cancel()
+            errors[futures[future]] = TimeoutError(f"Timeout dopo {timeout}s")
+        return results, errors
+
+    def map(self, upstream, fn, items, timeout=None):
+        """
+        Applies fn to every item concurrently; shorthand for fetch_all.
+
+        Returns:
+            Tuple (results, errors) keyed by item
+        """
+        return self.fetch_all(upstream, {item: (lambda item=item: fn(item)) for item in items}, timeout)
+
+
+executor = FetchExecutor(FETCH_MAX_WORKERS, UPSTREAM_CONCURRENCY, FETCH_TIMEOUT)
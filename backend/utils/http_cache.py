@@ -0,0 +1,84 @@
+# utils/http_cache.py
+
+import gzip
+import hashlib
+
+from flask import request
+
+from config import HTTP_COMPRESSION_LEVEL, HTTP_COMPRESSION_MIN_SIZE, HTTP_MAX_AGE
+
+try:
+    import brotli
+except ImportError:  # brotli è opzionale: senza, si comprime solo con gzip
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain', 'text/html')
+
+
+def _accepted_encodings():
+    accepted = request.accept_encodings
+    return {encoding for encoding in ('br', 'gzip') if accepted[encoding] > 0}
+
+
+def compress(body, encodings):
+    """
+    Compresses body with the best encoding the client accepts.
+
+    Returns:
+        Tuple (encoding, compressed body), or (None, body) if neither
+        brotli nor gzip can be used
+    """
+    if 'br' in encodings and brotli is not None:
+        return 'br', brotli.compress(body, quality=min(HTTP_COMPRESSION_LEVEL, 11))
+    if 'gzip' in encodings:
+        return 'gzip', gzip.compress(body, compresslevel=HTTP_COMPRESSION_LEVEL, mtime=0)
+    return None, body
+
+
+def _apply_cache_control(response):
+    """Sets max-age from HTTP_MAX_AGE unless the view (or a snapshot) already did."""
+    if response.headers.get('Cache-Control'):
+        return
+    max_age = HTTP_MAX_AGE.get(request.endpoint)
+    if max_age:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        # Nessuna cadenza nota: il client può tenere la copia ma deve rivalidarla (ETag)
+        response.cache_control.no_cache = True
+
+
+def process_response(response):
+    """
+    after_request hook: content-hash ETag with If-None-Match -> 304,
+    Cache-Control from the data's refresh cadence, then gzip/brotli for
+    large bodies.
+
+    Only successful GET responses with a buffered body are touched; event
+    streams and error responses pass through unchanged.
+    """
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+        return response
+    if response.is_streamed or response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return response
+
+    body = response.get_data()
+    # ETag debole: identifica il contenuto indipendentemente dalla codifica di trasporto
+    response.set_etag(hashlib.blake2b(body, digest_size=16).hexdigest(), weak=True)
+    _apply_cache_control(response)
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if len(body) < HTTP_COMPRESSION_MIN_SIZE or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    encoding, compressed = compress(body, _accepted_encodings())
+    if encoding is not None and len(compressed) < len(body):
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    app.after_request(process_response)
@@ -0,0 +1,298 @@
+# utils/http_client.py
+
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # httpx serve solo alla modalità asincrona (asgi.py)
+    httpx = None
+
+from config import (
+    UPSTREAM_RATE_LIMITS, UPSTREAM_CONCURRENCY, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT,
+    HTTP_MAX_RETRIES, HTTP_BACKOFF_BASE, HTTP_BACKOFF_MAX, HTTP_MAX_QUEUE_WAIT
+)
+from utils.metrics import observe_upstream, registry
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RateLimitExceeded(RuntimeError):
+    """Raised when no request slot frees up within the queue wait limit."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, at most `capacity`
+    stored. A 429 from the upstream pauses the whole bucket, so every thread
+    backs off together instead of each one hitting the limit on its own.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self):
+        """Takes a token if one is available; otherwise returns the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self._blocked_until and self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+
+    def acquire(self, timeout):
+        """
+        Takes one token, waiting up to `timeout` seconds for it.
+
+        Returns:
+            True if a token was taken, False if the wait would exceed the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self._take()
+            if not wait:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, timeout):
+        """acquire() for coroutines: waits on the event loop instead of the thread."""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self._take()
+            if not wait:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """Blocks the bucket for `seconds` and empties it."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+def _retry_after(response):
+    """Seconds requested by a Retry-After header (delta or HTTP date), or None."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _operation(url):
+    return urlsplit(url).path.rstrip('/').rsplit('/', 1)[-1] or 'root'
+
+
+class UpstreamClient:
+    """
+    HTTP client for one upstream API.
+
+    Keeps a pooled keep-alive session, rate limits outgoing requests with a
+    token bucket, applies connect/read timeouts to every request and retries
+    429/5xx responses and network errors with jittered exponential backoff.
+    The last response is returned as-is once retries are exhausted, so
+    callers keep handling status codes as before.
+    """
+
+    def __init__(self, name, rate_per_minute, burst, pool_size,
+                 timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), max_retries=HTTP_MAX_RETRIES,
+                 backoff_base=HTTP_BACKOFF_BASE, backoff_max=HTTP_BACKOFF_MAX,
+                 max_queue_wait=HTTP_MAX_QUEUE_WAIT):
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_queue_wait = max_queue_wait
+        self.bucket = TokenBucket(rate_per_minute / 60.0, burst)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._stats = {'requests': 0, 'retries': 0, 'throttled': 0, 'rejected': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _backoff(self, attempt):
+        # Full jitter: evita che i thread in attesa riprovino tutti nello stesso istante
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def get(self, url, params=None, operation=None, **kwargs):
+        """
+        Sends a GET request through the rate limiter with retries.
+
+        `operation` labels the call in the metrics (default: the last path
+        segment of the URL).
+
+        Raises:
+            RateLimitExceeded: if no token is available within max_queue_wait
+            requests.RequestException: if the last attempt fails at network level
+        """
+        operation = operation or _operation(url)
+        for attempt in range(self.max_retries + 1):
+            if not self.bucket.acquire(self.max_queue_wait):
+                self._count('rejected')
+                raise RateLimitExceeded(f"Limite di richieste verso {self.name} raggiunto")
+            self._count('requests')
+
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                observe_upstream(self.name, operation, type(e).__name__, time.perf_counter() - started)
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                observe_upstream(self.name, operation, response.status_code, time.perf_counter() - started)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+                retry_after = _retry_after(response)
+                if response.status_code == 429:
+                    self._count('throttled')
+                    self.bucket.pause(retry_after if retry_after is not None else self._backoff(attempt))
+                # Un Retry-After più lungo del backoff massimo non si aspetta in linea:
+                # il chiamante riceve il 429 (e la cache serve il dato stale)
+                if retry_after is not None and retry_after > self.backoff_max:
+                    return response
+                delay = max(retry_after or 0, self._backoff(attempt))
+                response.close()
+
+            self._count('retries')
+            time.sleep(delay)
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+
+class AsyncUpstreamClient:
+    """
+    Async twin of an UpstreamClient for the ASGI serving mode, on httpx.
+
+    Shares the sync client's token bucket and counters, so rate limits and
+    stats hold across both serving modes, and applies the same timeouts and
+    retry/backoff policy without blocking a thread while waiting.
+    """
+
+    def __init__(self, client, pool_size):
+        self.client = client
+        self.session = httpx.AsyncClient(
+            timeout=httpx.Timeout(client.timeout[1], connect=client.timeout[0]),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+
+    async def get(self, url, params=None, operation=None, **kwargs):
+        """
+        Sends a GET request through the shared rate limiter with retries.
+
+        Raises:
+            RateLimitExceeded: if no token is available within max_queue_wait
+            httpx.TransportError: if the last attempt fails at network level
+        """
+        client = self.client
+        operation = operation or _operation(url)
+        for attempt in range(client.max_retries + 1):
+            if not await client.bucket.acquire_async(client.max_queue_wait):
+                client._count('rejected')
+                raise RateLimitExceeded(f"Limite di richieste verso {client.name} raggiunto")
+            client._count('requests')
+
+            started = time.perf_counter()
+            try:
+                response = await self.session.get(url, params=params, **kwargs)
+            except httpx.TransportError as e:
+                observe_upstream(client.name, operation, type(e).__name__, time.perf_counter() - started)
+                if attempt == client.max_retries:
+                    raise
+                delay = client._backoff(attempt)
+            else:
+                observe_upstream(client.name, operation, response.status_code, time.perf_counter() - started)
+                if response.status_code not in RETRY_STATUSES or attempt == client.max_retries:
+                    return response
+                retry_after = _retry_after(response)
+                if response.status_code == 429:
+                    client._count('throttled')
+                    client.bucket.pause(retry_after if retry_after is not None else client._backoff(attempt))
+                if retry_after is not None and retry_after > client.backoff_max:
+                    return response
+                delay = max(retry_after or 0, client._backoff(attempt))
+
+            client._count('retries')
+            await asyncio.sleep(delay)
+
+
+def _create_client(name):
+    rate_per_minute, burst = UPSTREAM_RATE_LIMITS[name]
+    return UpstreamClient(name, rate_per_minute, burst, pool_size=max(UPSTREAM_CONCURRENCY.get(name, 4), 4))
+
+
+coingecko_client = _create_client('coingecko')
+newsapi_client = _create_client('newsapi')
+
+_async_clients = {}
+
+
+def async_client(client):
+    """
+    The AsyncUpstreamClient sharing `client`'s limits, created on first use.
+
+    Raises:
+        RuntimeError: if httpx is not installed
+    """
+    if httpx is None:
+        raise RuntimeError("httpx non è installato: la modalità asincrona non è disponibile")
+    if client.name not in _async_clients:
+        _async_clients[client.name] = AsyncUpstreamClient(client, pool_size=max(UPSTREAM_CONCURRENCY.get(client.name, 4), 4))
+    return _async_clients[client.name]
+
+
+async def close_async_clients():
+    """Closes the httpx connection pools (ASGI lifespan shutdown)."""
+    while _async_clients:
+        _, client = _async_clients.popitem()
+        await client.session.aclose()
+
+
+def stats():
+    return {client.name: client.stats() for client in (coingecko_client, newsapi_client)}
+
+
+@registry.register_collector
+def _client_metrics():
+    clients = stats()
+    yield 'upstream_client_events_total', 'counter', 'Rate limiter and retry events per upstream client', [
+        ({'upstream': name, 'event': event}, count)
+        for name, counters in clients.items() for event, count in counters.items()]
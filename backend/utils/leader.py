@@ -0,0 +1,50 @@
+# utils/leader.py
+
+import os
+
+try:
+    import fcntl
+except ImportError:  # fcntl non esiste su Windows: lì si assume un solo processo
+    fcntl = None
+
+
+class LeaderLock:
+    """
+    Elects the one process that runs the background jobs (schedulers,
+    pollers, warm-ups) when several workers serve the same DATA_DIR.
+
+    mode 'auto' takes an exclusive, non-blocking lock on a file: the first
+    worker to call acquire() becomes the leader and stays so until it exits
+    (the OS releases the lock, and a worker started later can take over).
+    'true' always leads, 'false' never does.
+    """
+
+    def __init__(self, path, mode='auto'):
+        self.path = path
+        self.mode = mode
+        self.is_leader = False
+        self._file = None
+
+    def acquire(self):
+        """Tries to become the leader; returns True if this process is (or already was) it."""
+        if self.is_leader or self.mode == 'false':
+            return self.is_leader
+        if self.mode == 'true' or fcntl is None:
+            self.is_leader = True
+            return True
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        lock_file = open(self.path, 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        # Il file resta aperto per tutta la vita del processo: chiuderlo rilascerebbe il lock
+        self._file = lock_file
+        self.is_leader = True
+        return True
@@ -0,0 +1,283 @@
+# utils/metrics.py
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+from config import METRICS_LATENCY_BUCKETS, SERVER_TIMING_ENABLED
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """Monotonic counter with labels (values only go up)."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class Histogram(_Metric):
+    """Latency histogram with cumulative buckets, as Prometheus expects."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=METRICS_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # conteggi per bucket, poi somma e numero di osservazioni
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+        for key, counts in sorted(values.items()):
+            labels = tuple(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket", labels + (('le', _format_value(float(bound))),), count
+            yield f"{self.name}_bucket", labels + (('le', '+Inf'),), counts[-1]
+            yield f"{self.name}_sum", labels, counts[-2]
+            yield f"{self.name}_count", labels, counts[-1]
+
+
+class Registry:
+    """
+    The process' metrics, rendered in the Prometheus text format.
+
+    Counters and histograms are updated where the work happens; collectors
+    are called at scrape time for values other modules already keep (cache
+    size, client counters) and return (name, kind, documentation, samples)
+    tuples, samples being (labels dict, value) pairs.
+
+    Values are per process: with several gunicorn workers each one exposes
+    its own, like the in-memory cache.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=METRICS_LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        self._collectors.append(collector)
+        return collector
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"Errore nella raccolta delle metriche: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Time to produce the response, by route', ('endpoint', 'method', 'status'))
+UPSTREAM_DURATION = registry.histogram(
+    'upstream_request_duration_seconds', 'Duration of upstream calls (one per HTTP attempt)', ('upstream', 'operation'))
+UPSTREAM_REQUESTS = registry.counter(
+    'upstream_requests_total', 'Upstream calls by outcome: HTTP status, ok or exception name',
+    ('upstream', 'operation', 'status'))
+CACHE_REQUESTS = registry.counter(
+    'cache_requests_total', 'Upstream cache lookups by data class and result (hit, stale, miss)',
+    ('data_class', 'result'))
+SERIALIZATION_DURATION = registry.histogram(
+    'serialization_duration_seconds', 'Time spent turning DataFrames into lists (frame) and encoding JSON (json)',
+    ('endpoint', 'stage'))
+
+
+class RequestTimings:
+    """
+    Per-request totals by phase, for the Server-Timing header. Durations of
+    calls made in parallel (fan-out) add up, so a phase can exceed the total.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            total, count = self.phases.get(phase, (0.0, 0))
+            self.phases[phase] = (total + seconds, count + 1)
+
+    def header(self):
+        with self._lock:
+            phases = dict(self.phases)
+        entries = [f'{phase};dur={total * 1000:.1f};desc="{count}x"' for phase, (total, count) in sorted(phases.items())]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ', '.join(entries)
+
+
+# Tempi della richiesta in corso; FetchExecutor copia il contesto nei thread del fan-out
+_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def record_phase(phase, seconds):
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+def observe_upstream(upstream, operation, status, seconds):
+    UPSTREAM_REQUESTS.inc(upstream=upstream, operation=operation, status=status)
+    UPSTREAM_DURATION.observe(seconds, upstream=upstream, operation=operation)
+    record_phase(upstream, seconds)
+
+
+@contextmanager
+def upstream_call(upstream, operation):
+    """
+    Times a call to a library-backed upstream (yfinance) and counts it as
+    'ok' or by the name of the exception it raised.
+    """
+    started = time.perf_counter()
+    status = 'ok'
+    try:
+        yield
+    except Exception as e:
+        status = type(e).__name__
+        raise
+    finally:
+        observe_upstream(upstream, operation, status, time.perf_counter() - started)
+
+
+def observe_cache(data_class, result):
+    CACHE_REQUESTS.inc(data_class=data_class, result=result)
+    record_phase(f"cache-{result}", 0.0)
+
+
+@contextmanager
+def serialization(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        SERIALIZATION_DURATION.observe(seconds, endpoint=_endpoint(), stage=stage)
+        record_phase(f"serialize-{stage}", seconds)
+
+
+def _endpoint():
+    if not has_request_context():  # job in background
+        return 'background'
+    return request.endpoint or 'unmatched'
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, timing the encoding done by jsonify()."""
+
+    def response(self, *args, **kwargs):
+        with serialization('json'):
+            return super().response(*args, **kwargs)
+
+
+def _before_request():
+    g.request_timings = RequestTimings()
+    _timings.set(g.request_timings)
+
+
+def _after_request(response):
+    timings = g.get('request_timings')
+    if timings is None:
+        return response
+    REQUEST_DURATION.observe(time.perf_counter() - timings.started,
+                             endpoint=_endpoint(), method=request.method, status=response.status_code)
+    if SERVER_TIMING_ENABLED:
+        response.headers['Server-Timing'] = timings.header()
+    return response
+
+
+def _teardown_request(exc):
+    _timings.set(None)
+
+
+def init_app(app):
+    """
+    Instruments the app: route latency, JSON encoding time and, if enabled,
+    the Server-Timing header. Register it before the other after_request
+    hooks so the measured latency includes them (Flask runs them in
+    reverse order).
+    """
+    app.json = TimedJSONProvider(app)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,98 @@
+# utils/pubsub.py
+
+import json
+import queue
+import threading
+
+from config import SSE_HEARTBEAT_SECONDS
+
+
+class Broker:
+    """
+    Minimal in-process publish/subscribe hub used to push events to
+    Server-Sent Events clients.
+    """
+
+    def __init__(self, max_queue_size=100):
+        self.max_queue_size = max_queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel, subscriber=None):
+        """
+        Returns a queue that receives every message published on channel.
+        Passing an existing subscriber queue attaches it to one more channel.
+        """
+        if subscriber is None:
+            subscriber = queue.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def publish(self, channel, event, data):
+        """
+        Delivers (event, data) to every subscriber of channel. Slow clients
+        whose queue is full miss the message rather than blocking publishers.
+
+        Returns:
+            Number of subscribers the message was delivered to
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        delivered = 0
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event, data))
+                delivered += 1
+            except queue.Full:
+                pass
+        return delivered
+
+    def channels(self):
+        with self._lock:
+            return list(self._subscribers)
+
+
+def format_sse(event, data):
+    """Formats one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def sse_stream(broker, channels, subscriber, initial=None):
+    """
+    Generator yielding SSE messages for a subscriber until the client
+    disconnects, with periodic heartbeat comments to keep proxies from
+    closing idle connections.
+
+    Args:
+        broker: Broker the subscriber belongs to
+        channels: Channel name (or list of names) to unsubscribe on disconnect
+        subscriber: Queue returned by broker.subscribe
+        initial: Optional list of (event, data) sent right after connecting
+    """
+    if isinstance(channels, str):
+        channels = [channels]
+    try:
+        for event, data in initial or []:
+            yield format_sse(event, data)
+        while True:
+            try:
+                event, data = subscriber.get(timeout=SSE_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ": heartbeat\n\n"
+                continue
+            yield format_sse(event, data)
+    finally:
+        for channel in channels:
+            broker.unsubscribe(channel, subscriber)
+
+
+broker = Broker()
@@ -0,0 +1,120 @@
+# utils/resample.py
+
+import numpy as np
+import pandas as pd
+
+# Risoluzioni candidate per le candele, dalla più fine alla più grossa
+# (in ore anche oltre il giorno, così i bucket restano allineati all'epoch UTC)
+BUCKET_RESOLUTIONS = (
+    ('5min', 5 * 60), ('15min', 15 * 60), ('30min', 30 * 60),
+    ('1h', 3600), ('2h', 2 * 3600), ('4h', 4 * 3600), ('6h', 6 * 3600), ('12h', 12 * 3600),
+    ('24h', 86400), ('48h', 2 * 86400), ('72h', 3 * 86400), ('168h', 7 * 86400), ('336h', 14 * 86400),
+)
+
+
+def ticks_to_series(ticks):
+    """
+    Converts CoinGecko [[timestamp_ms, value], ...] pairs to a float Series
+    indexed by UTC time (duplicates keep the last value).
+    """
+    if not ticks:
+        return pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+    values = np.asarray(ticks, dtype=float)
+    index = pd.to_datetime(values[:, 0].astype(np.int64), unit='ms')
+    series = pd.Series(values[:, 1], index=index)
+    return series[~series.index.duplicated(keep='last')].sort_index()
+
+
+def bucket_rule(start, end, points):
+    """Finest resolution that covers [start, end] in at most `points` buckets."""
+    span = (end - start).total_seconds()
+    for rule, seconds in BUCKET_RESOLUTIONS:
+        if span / seconds < points:
+            return rule
+    return f"{int(np.ceil(span / points / 86400)) * 24}h"
+
+
+def resample_ohlcv(prices, volumes, points):
+    """
+    Aggregates raw price ticks into OHLC candles at the finest standard
+    resolution yielding at most `points` candles.
+
+    CoinGecko's `total_volumes` is a rolling 24h volume sampled with the
+    prices, so each candle takes the last volume sample inside the bucket
+    (matched by timestamp, not by list position) rather than a sum.
+
+    Args:
+        prices: [[timestamp_ms, price], ...]
+        volumes: [[timestamp_ms, volume], ...]
+        points: Maximum number of candles
+
+    Returns:
+        DataFrame indexed by bucket start with Open, High, Low, Close, Volume;
+        empty buckets (gaps in the upstream data) are dropped
+    """
+    price = ticks_to_series(prices)
+    if price.empty:
+        return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'], index=price.index, dtype=float)
+    rule = bucket_rule(price.index[0], price.index[-1], points)
+    candles = price.resample(rule, origin='epoch').ohlc().rename(columns=str.capitalize)
+    candles['Volume'] = ticks_to_series(volumes).resample(rule, origin='epoch').last().reindex(candles.index)
+    return candles.dropna(subset=['Close'])
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets selection for line charts.
+
+    Keeps the first and last points and, in each of `threshold - 2` equal
+    buckets, the point forming the largest triangle with the previously kept
+    point and the average of the next bucket, which preserves peaks and
+    troughs far better than taking every n-th point.
+
+    Args:
+        x, y: 1-D arrays of equal length (x increasing)
+        threshold: Number of points to keep
+
+    Returns:
+        Sorted integer array of the selected positions
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Confini dei bucket interni (il primo e l'ultimo punto sono fissi)
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        following = slice(end, edges[bucket + 2]) if bucket + 2 < len(edges) else slice(n - 1, n)
+        avg_x, avg_y = x[following].mean(), y[following].mean()
+        # Area (doppia) dei triangoli con vertici nel punto precedente e nella media successiva
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def lttb_series(prices, volumes, points):
+    """
+    LTTB-downsampled price line with the volume sample at each kept point.
+
+    Returns:
+        DataFrame indexed by tick time with Close and Volume
+    """
+    price = ticks_to_series(prices)
+    if price.empty:
+        return pd.DataFrame(columns=['Close', 'Volume'], index=price.index, dtype=float)
+    keep = lttb_indices(price.index.asi8, price.to_numpy(), points)
+    line = price.iloc[keep].to_frame('Close')
+    # Volume allineato per timestamp (il campione più recente non successivo al punto)
+    volume = ticks_to_series(volumes)
+    line['Volume'] = volume.reindex(line.index, method='ffill') if not volume.empty else np.nan
+    return line
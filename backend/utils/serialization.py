@@ -0,0 +1,109 @@
+# utils/serialization.py
+
+import json
+
+import numpy as np
+from flask import Response
+
+from utils.metrics import serialization
+
+try:
+    import orjson
+except ImportError:  # orjson è opzionale: senza, si usa il modulo json della libreria standard
+    orjson = None
+
+INTRADAY_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+DAILY_TIMESTAMP_FORMAT = '%Y-%m-%d'
+
+# (chiave JSON, colonna del DataFrame, tipo)
+OHLCV_FIELDS = (
+    ('open', 'Open', float),
+    ('high', 'High', float),
+    ('low', 'Low', float),
+    ('close', 'Close', float),
+    ('volume', 'Volume', int),
+)
+
+
+def column_to_list(series, kind=float):
+    """
+    Converts a numeric column to a JSON-ready list in one pass, NaN -> None.
+
+    Args:
+        series: pandas Series or NumPy array
+        kind: float or int
+
+    Returns:
+        List of Python floats/ints (None where the value is missing)
+    """
+    values = np.asarray(series, dtype=float)
+    mask = np.isnan(values)
+    if kind is int:
+        result = np.where(mask, 0, values).astype(np.int64).tolist()
+    else:
+        result = values.tolist()
+    for i in np.flatnonzero(mask).tolist():
+        result[i] = None
+    return result
+
+
+def _ohlcv_columns(data, timestamp_format):
+    columns = {'timestamp': data.index.strftime(timestamp_format).tolist()}
+    for key, column, kind in OHLCV_FIELDS:
+        columns[key] = column_to_list(data[column], kind) if column in data.columns else [None] * len(data)
+    if 'VWAP' in data.columns:
+        columns['vwap'] = column_to_list(data['VWAP'])
+    return columns
+
+
+def frame_to_records(data, timestamp_format):
+    """
+    Serializes an OHLCV(+VWAP) DataFrame to a list of row dicts, column-wise.
+
+    Produces the same shape as the previous iterrows loop: one dict per bar,
+    with 'vwap' present only on bars where it is defined.
+    """
+    with serialization('frame'):
+        columns = _ohlcv_columns(data, timestamp_format)
+        keys = ['timestamp'] + [key for key, _, _ in OHLCV_FIELDS]
+        records = [dict(zip(keys, row)) for row in zip(*(columns[key] for key in keys))]
+        if 'vwap' in columns:
+            for record, vwap in zip(records, columns['vwap']):
+                if vwap is not None:
+                    record['vwap'] = vwap
+    return records
+
+
+def frame_to_columns(data, timestamp_format):
+    """
+    Serializes an OHLCV(+VWAP) DataFrame to parallel arrays (columnar shape).
+
+    Returns:
+        Dict mapping 'timestamp', 'open', 'high', 'low', 'close', 'volume'
+        (and 'vwap' when available) to lists of equal length
+    """
+    with serialization('frame'):
+        return _ohlcv_columns(data, timestamp_format)
+
+
+def dumps(payload):
+    """Encodes payload to compact JSON bytes, with orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    """
+    Builds a JSON Flask response through the fast encoder.
+
+    Args:
+        payload: JSON-serializable object
+        status: HTTP status code
+
+    Returns:
+        flask.Response with mimetype application/json
+    """
+    with serialization('json'):
+        body = dumps(payload)
+    return Response(body, status=status, mimetype='application/json')
@@ -1,4 +1,8 @@
-from app import app
+from app import app, start_background_jobs
+
+# Con gunicorn ogni worker importa questo modulo: i job partono solo nel leader.
+# Non usare --preload, altrimenti il lock resterebbe al master e i thread non sopravvivono al fork
+start_background_jobs(app)
 
 if __name__ == "__main__":
-    app.run()
\ No newline at end of file
+    app.run()
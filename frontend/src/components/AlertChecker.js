@@ -7,102 +7,58 @@ const AlertChecker = () => {
       Notification.requestPermission();
     }
     
-    // Funzione per controllare tutti gli alert attivi
-    const checkAlerts = async () => {
+    const API_URL = 'https://market-analytics-dashboard.onrender.com/api';
+    
+    // Identificativo stabile del browser, usato dal server per associare gli alert
+    let clientId = localStorage.getItem('alertClientId');
+    if (!clientId) {
+      clientId = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+      localStorage.setItem('alertClientId', clientId);
+    }
+    
+    // Sincronizza gli alert attivi con il server, che li valuta per tutti gli utenti
+    const syncAlerts = async () => {
       const alerts = JSON.parse(localStorage.getItem('priceAlerts') || '[]');
-      
-      // Filtra solo gli alert attivi
       const activeAlerts = alerts.filter(alert => alert.active);
       
-      if (activeAlerts.length === 0) return;
-      
-      // Raggruppa gli alert per tipo
-      const cryptoAlerts = activeAlerts.filter(a => a.assetType === 'crypto');
-      const stockAlerts = activeAlerts.filter(a => a.assetType === 'stock');
-      
-      // Controlla gli alert crypto
-      if (cryptoAlerts.length > 0) {
-        const cryptoSymbols = [...new Set(cryptoAlerts.map(a => a.symbol))];
-        try {
-          const response = await fetch(`https://market-analytics-dashboard.onrender.com/api/crypto_batch?symbols=${cryptoSymbols.join(',')}`);
-          console.log('response', response.url);
-          if (!response.ok) {
-            console.error('Errore nel recupero dei prezzi crypto:', response.status);
-            return;
-          }
-          
-          const data = await response.json();
-          
-          cryptoAlerts.forEach(alert => {
-            const currentPrice = data[alert.symbol]?.current_price;
-            
-            if (currentPrice !== undefined) {
-              checkAlertCondition(alert, currentPrice);
-            }
-          });
-        } catch (err) {
-          console.error('Errore nel controllo degli alert crypto:', err);
-        }
-      }
-      
-      // Controlla gli alert stock
-      if (stockAlerts.length > 0) {
-        const stockSymbols = [...new Set(stockAlerts.map(a => a.symbol))];
-        try {
-          const response = await fetch(`https://market-analytics-dashboard.onrender.com/api/stock_batch?symbols=${stockSymbols.join(',')}`);
-          
-          if (!response.ok) {
-            console.error('Errore nel recupero dei prezzi stock:', response.status);
-            return;
-          }
-          
-          const data = await response.json();
-          
-          stockAlerts.forEach(alert => {
-            const stockData = data[alert.symbol];
-            const currentPrice = stockData?.price;
-            
-            if (currentPrice !== undefined) {
-              checkAlertCondition(alert, currentPrice);
-            }
-          });
-        } catch (err) {
-          console.error('Errore nel controllo degli alert stock:', err);
-        }
+      try {
+        await fetch(`${API_URL}/alerts?client_id=${clientId}`, {
+          method: 'PUT',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ alerts: activeAlerts })
+        });
+      } catch (err) {
+        console.error('Errore nella sincronizzazione degli alert:', err);
       }
     };
     
-    // Funzione per verificare se un alert deve essere attivato
-    const checkAlertCondition = (alert, currentPrice) => {
-      let isTriggered = false;
+    // Gestisce un alert attivato lato server
+    const handleTriggeredAlert = (event) => {
+      const triggered = JSON.parse(event.data);
+      const alerts = JSON.parse(localStorage.getItem('priceAlerts') || '[]');
+      const alert = alerts.find(a => a.id === triggered.id);
       
-      if (alert.condition === "above" && currentPrice >= alert.price_target) {
-        isTriggered = true;
-      } else if (alert.condition === "below" && currentPrice <= alert.price_target) {
-        isTriggered = true;
-      }
+      if (!alert || !alert.active) return;
       
-      if (isTriggered) {
-        // Mostra notifica
-        showNotification(alert, currentPrice);
-        console.log(`Alert ${alert.symbol} attivato!`);
-        
-        // Disattiva l'alert
-        const alerts = JSON.parse(localStorage.getItem('priceAlerts') || '[]');
-        const updatedAlerts = alerts.map(a => 
-          a.id === alert.id ? {...a, active: false} : a
-        );
-        localStorage.setItem('priceAlerts', JSON.stringify(updatedAlerts));
-        
-        // Salva nella cronologia degli alert attivati
-        const history = JSON.parse(localStorage.getItem('alertHistory') || '[]');
-        history.push({
-          ...alert,
-          triggered_at: new Date().toISOString(),
-          price_at_trigger: currentPrice
-        });
-        localStorage.setItem('alertHistory', JSON.stringify(history));
-      }
+      // Mostra notifica
+      showNotification(alert, triggered.price_at_trigger);
+      console.log(`Alert ${alert.symbol} attivato!`);
+      
+      // Disattiva l'alert
+      const updatedAlerts = alerts.map(a => 
+        a.id === alert.id ? {...a, active: false} : a
+      );
+      localStorage.setItem('priceAlerts', JSON.stringify(updatedAlerts));
+      
+      // Salva nella cronologia degli alert attivati
+      const history = JSON.parse(localStorage.getItem('alertHistory') || '[]');
+      history.push({
+        ...alert,
+        triggered_at: triggered.triggered_at,
+        price_at_trigger: triggered.price_at_trigger
+      });
+      localStorage.setItem('alertHistory', JSON.stringify(history));
+      window.dispatchEvent(new Event('priceAlertsChanged'));
     };
     
     // Funzione per mostrare la notifica
@@ -116,14 +72,19 @@ const AlertChecker = () => {
       }
     };
     
-    // Esegui il controllo ogni 60 secondi
-    const intervalId = setInterval(checkAlerts, 30000);
+    // Ricevi gli alert attivati tramite Server-Sent Events invece di interrogare i prezzi
+    const eventSource = new EventSource(`${API_URL}/alerts/stream?client_id=${clientId}`);
+    eventSource.addEventListener('alert', handleTriggeredAlert);
     
-    // Esegui il controllo anche all'avvio
-    checkAlerts();
+    // Risincronizza quando l'utente crea, modifica o elimina un alert
+    window.addEventListener('priceAlertsChanged', syncAlerts);
+    syncAlerts();
     
-    // Pulisci l'intervallo quando il componente viene smontato
-    return () => clearInterval(intervalId);
+    // Chiudi lo stream quando il componente viene smontato
+    return () => {
+      eventSource.close();
+      window.removeEventListener('priceAlertsChanged', syncAlerts);
+    };
   }, []);
   
   return null; // Questo componente non renderizza nulla
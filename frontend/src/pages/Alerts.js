@@ -68,6 +68,7 @@ const Alerts = () => {
     const updatedAlerts = [...alerts, alert];
     setAlerts(updatedAlerts);
     localStorage.setItem('priceAlerts', JSON.stringify(updatedAlerts));
+    window.dispatchEvent(new Event('priceAlertsChanged'));
     
     // Reset form
     setNewAlert({
@@ -83,6 +84,7 @@ const Alerts = () => {
     const updatedAlerts = alerts.filter(alert => alert.id !== id);
     setAlerts(updatedAlerts);
     localStorage.setItem('priceAlerts', JSON.stringify(updatedAlerts));
+    window.dispatchEvent(new Event('priceAlertsChanged'));
   };
   
   // Funzione per eliminare un alert dalla cronologia
@@ -37,16 +37,17 @@ const StockDetails = () => {
     navigate('/stocks');
   };
 
+  // Company profile and financials only depend on the symbol
   useEffect(() => {
-    const fetchStockData = async () => {
+    const fetchCompanyData = async () => {
       setLoading(true);
       try {
-        const response = await fetch(`https://market-analytics-dashboard.onrender.com/api/stock_data/${symbol}?period=${timeframe}`);
+        const response = await fetch(`https://market-analytics-dashboard.onrender.com/api/stock_data/${symbol}?include=company,financials`);
         if (!response.ok) {
           throw new Error('Failed to fetch stock data');
         }
         const data = await response.json();
-        setStockData(data);
+        setStockData(prev => ({ ...prev, company: data.company }));
         setError(null);
       } catch (err) {
         console.error('Error fetching stock data:', err);
@@ -56,7 +57,26 @@ const StockDetails = () => {
       }
     };
 
-    fetchStockData();
+    fetchCompanyData();
+  }, [symbol]);
+
+  // Switching timeframe only refetches the price history
+  useEffect(() => {
+    const fetchHistoricalData = async () => {
+      try {
+        const response = await fetch(`https://market-analytics-dashboard.onrender.com/api/stock_data/${symbol}?period=${timeframe}&include=history`);
+        if (!response.ok) {
+          throw new Error('Failed to fetch stock history');
+        }
+        const data = await response.json();
+        setStockData(prev => ({ ...prev, historical_data: data.historical_data }));
+      } catch (err) {
+        console.error('Error fetching stock history:', err);
+        setStockData(prev => ({ ...prev, historical_data: [] }));
+      }
+    };
+
+    fetchHistoricalData();
   }, [symbol, timeframe]);
 
   useEffect(() => {
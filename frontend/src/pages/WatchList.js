@@ -20,6 +20,28 @@ const WatchList = () => {
     fetchData();
   }, [watchlist]);
   
+  // Live price updates: the server pushes only the fields that changed
+  useEffect(() => {
+    if (watchlist.stocks.length === 0 && watchlist.crypto.length === 0) return;
+    
+    const params = new URLSearchParams({
+      stocks: watchlist.stocks.join(','),
+      cryptos: watchlist.crypto.join(',')
+    });
+    const eventSource = new EventSource(`https://market-analytics-dashboard.onrender.com/api/stream/quotes?${params}`);
+    
+    const applyUpdate = (update) => {
+      const { symbol, asset_type, timestamp, ...fields } = update;
+      const setter = asset_type === 'crypto' ? setCryptoData : setStocksData;
+      setter(prev => ({ ...prev, [symbol]: { ...prev[symbol], ...fields } }));
+    };
+    
+    eventSource.addEventListener('snapshot', (event) => JSON.parse(event.data).forEach(applyUpdate));
+    eventSource.addEventListener('quote', (event) => applyUpdate(JSON.parse(event.data)));
+    
+    return () => eventSource.close();
+  }, [watchlist]);
+  
   const fetchData = async () => {
     setLoading(true);
     